@@ -65,11 +65,14 @@ __author__ = 'ekopalypse'
 from .win_helper import (
     SWP_NOSIZE,
     DIALOGPROC, DialogBoxIndirectParam, LPNMHDR,
+    CreateDialogIndirectParam, ShowWindow, DestroyWindow, PostMessage, PostQuitMessage,
+    GetMessage, TranslateMessage, DispatchMessage, IsDialogMessage,
     GetDlgItem, EndDialog,
     GetWindowRect, CopyRect, OffsetRect, SetWindowPos, GetModuleHandle,
     WinMessages as WM,
     WindowStyle as WS,
-    DialogBoxStyles as DS
+    DialogBoxStyles as DS,
+    ShowWindowCommands as SW
 )
 from .controls.__control_template import Control
 from .controls.button import Button, DefaultButton, CheckBoxButton, GroupBox, CommandButton, RadioButton, SplitButton
@@ -138,6 +141,7 @@ class Dialog:
         registeredNotifications (Dict): A dictionary of registered notification messages and their associated handlers.
         initialize (Callable): A callback function called during the initialization of the dialog.
         closeOnEscapeKey (Bool): Specifies whether the dialog should be closed when the escape key is pressed. (defaults to True)
+        modeless (Bool): Specifies whether the parent window stays usable while the dialog is shown. (defaults to False)
 
     Note:
         The Dialog class is intended to be subclassed for specific dialog implementations.
@@ -162,6 +166,7 @@ class Dialog:
     registeredCommands: Dict      = field(default_factory=dict)
     registeredNotifications: Dict = field(default_factory=dict)
     closeOnEscapeKey: bool        = True
+    modeless: bool                = False
     onIdOk                        = None
 
     def __post_init__(self):
@@ -276,29 +281,52 @@ class Dialog:
                 return True
 
         elif msg == WM.CLOSE:
-            EndDialog(hwnd, 0)  # this is executed by clicking the X in the upper right corner
+            self.__close(hwnd)  # this is executed by clicking the X in the upper right corner
+
+        elif msg == WM.DESTROY:
+            if self.modeless:
+                self.hwnd = 0
+                PostQuitMessage(0)
 
         elif msg == WM.COMMAND:
             if wparam in self.registeredCommands:
                 self.registeredCommands[wparam]()
                 return True
             elif wparam==2 and lparam==0 and self.closeOnEscapeKey:
-                EndDialog(hwnd, 0)
+                self.__close(hwnd)
 
         elif msg == WM.NOTIFY:
             lpnmhdr = ctypes.cast(lparam, LPNMHDR)
             notif_key = (lpnmhdr.contents.code, lpnmhdr.contents.idFrom)
             if notif_key in self.registeredNotifications:
-                args = ctypes.cast(lparam, self.registeredNotifications[notif_key][1])
-                self.registeredNotifications[notif_key][0](args.contents)
+                handler, returned_struct = self.registeredNotifications[notif_key]
+                args = ctypes.cast(lparam, returned_struct) if returned_struct is not None else lpnmhdr
+                handler(args.contents)
                 return True
         return False
 
+    def __close(self, hwnd):
+        '''
+        Closes the dialog, a modeless dialog gets destroyed, which ends its message loop.
+
+        Args:
+            hwnd: The handle to the dialog window.
+
+        Returns:
+            None
+        '''
+        if self.modeless:
+            DestroyWindow(hwnd)
+        else:
+            EndDialog(hwnd, 0)
+
     def show(self):
         '''
         This method displays the dialog on the screen and starts its message loop,
         allowing user interaction with the controls. The method blocks until the
         dialog is closed.
+        A modeless dialog leaves its parent window enabled, show it from a thread
+        of its own to keep the calling thread running.
 
         Args:
             None.
@@ -325,7 +353,11 @@ class Dialog:
             None
         '''
         if self.hwnd:
-            EndDialog(self.hwnd, 0)
+            if self.modeless:
+                # the window can only be destroyed by the thread running its message loop
+                PostMessage(self.hwnd, WM.CLOSE, 0, 0)
+            else:
+                EndDialog(self.hwnd, 0)
 
     def __align_struct(self, tmp):
         '''
@@ -363,7 +395,8 @@ class Dialog:
         Notes:
             - This method is called internally during the creation of the Dialog object.
             - It utilizes the __align_struct method to ensure proper memory alignment.
-            - The created dialog is displayed using the DialogBoxIndirectParam function.
+            - The created dialog is displayed using the DialogBoxIndirectParam function,
+              a modeless dialog using the CreateDialogIndirectParam function and its own message loop.
         """
         controls = bytearray()
         for i, control in enumerate(self.controlList):
@@ -390,11 +423,29 @@ class Dialog:
         # print(' ,'.join(f'0x{x:>02X}' for x in dialog))
         raw_bytes = (ctypes.c_ubyte * len(dialog)).from_buffer_copy(dialog)
         hinstance = GetModuleHandle(None)
-        DialogBoxIndirectParam(hinstance,
-                               raw_bytes,
-                               self.parent,
-                               DIALOGPROC(self.__default_dialog_proc),
-                               0)
+        # the callback must stay alive as long as the dialog exists
+        self.__dialog_proc = DIALOGPROC(self.__default_dialog_proc)
+        if not self.modeless:
+            DialogBoxIndirectParam(hinstance,
+                                   raw_bytes,
+                                   self.parent,
+                                   self.__dialog_proc,
+                                   0)
+            return
+
+        hwnd = CreateDialogIndirectParam(hinstance,
+                                         raw_bytes,
+                                         self.parent,
+                                         self.__dialog_proc,
+                                         0)
+        if not hwnd:
+            return
+        ShowWindow(hwnd, SW.SHOW)
+        msg = wintypes.MSG()
+        while GetMessage(ctypes.byref(msg), None, 0, 0) > 0:
+            if not IsDialogMessage(hwnd, ctypes.byref(msg)):
+                TranslateMessage(ctypes.byref(msg))
+                DispatchMessage(ctypes.byref(msg))
 
 
 def create_dialog_from_rc(rc_code):
@@ -1040,6 +1040,9 @@ class ListView(Control):
         getSelectedColumns() -> List[List[str]]:
         getSelectedRows() -> Dict[str: List[str]]:
 
+        setDispInfoText() -> None:
+            Fills the text requested by a LVN.GETDISPINFO notification of an LVS.OWNERDATA list view.
+
     """
     style: int = Control.style | LVS.REPORT
     windowClass: str = 'SysListView32'
@@ -1048,45 +1051,45 @@ class ListView(Control):
     show_headers: bool = False
     fit_last_column: bool = False
 
-    onClick = WM_NotifyDelegator(NM.CLICK, None)
+    onClick = WM_NotifyDelegator(NM.CLICK, ctypes.POINTER(NMITEMACTIVATE))
     onCustomDraw = WM_NotifyDelegator(NM.CUSTOMDRAW, None)
-    onDblClk = WM_NotifyDelegator(NM.DBLCLK, None)
+    onDblClk = WM_NotifyDelegator(NM.DBLCLK, ctypes.POINTER(NMITEMACTIVATE))
     onKillFocus = WM_NotifyDelegator(NM.KILLFOCUS, None)
-    onRClick = WM_NotifyDelegator(NM.RCLICK, None)
-    onRDblClk = WM_NotifyDelegator(NM.RDBLCLK, None)
+    onRClick = WM_NotifyDelegator(NM.RCLICK, ctypes.POINTER(NMITEMACTIVATE))
+    onRDblClk = WM_NotifyDelegator(NM.RDBLCLK, ctypes.POINTER(NMITEMACTIVATE))
     onReturn = WM_NotifyDelegator(NM.RETURN, None)
     onSetCursor = WM_NotifyDelegator(NM.SETCURSOR, None)
     onSetFocus = WM_NotifyDelegator(NM.SETFOCUS, None)
     onHover = WM_NotifyDelegator(NM.HOVER, None)
     onReleasedCapture = WM_NotifyDelegator(NM.RELEASEDCAPTURE, None)
 
-    onItemChanging = WM_NotifyDelegator(LVN.ITEMCHANGING, None)
-    onItemChanged = WM_NotifyDelegator(LVN.ITEMCHANGED, None)
-    onInsertItem = WM_NotifyDelegator(LVN.INSERTITEM, None)
-    onDeleteItem = WM_NotifyDelegator(LVN.DELETEITEM, None)
-    onDeleteAllItems = WM_NotifyDelegator(LVN.DELETEALLITEMS, None)
-    onBeginLabelEdit = WM_NotifyDelegator(LVN.BEGINLABELEDIT, None)
-    onEndLabelEdit = WM_NotifyDelegator(LVN.ENDLABELEDIT, None)
-    onColumnClick = WM_NotifyDelegator(LVN.COLUMNCLICK, None)
-    onBeginDrag = WM_NotifyDelegator(LVN.BEGINDRAG, None)
-    onBeginrDrag = WM_NotifyDelegator(LVN.BEGINRDRAG, None)
-    onOdCacheHint = WM_NotifyDelegator(LVN.ODCACHEHINT, None)
-    onItemActivate = WM_NotifyDelegator(LVN.ITEMACTIVATE, None)
-    onOdStateChanged = WM_NotifyDelegator(LVN.ODSTATECHANGED, None)
-    onOdFindItem = WM_NotifyDelegator(LVN.ODFINDITEM, None)
+    onItemChanging = WM_NotifyDelegator(LVN.ITEMCHANGING, ctypes.POINTER(NMLISTVIEW))
+    onItemChanged = WM_NotifyDelegator(LVN.ITEMCHANGED, ctypes.POINTER(NMLISTVIEW))
+    onInsertItem = WM_NotifyDelegator(LVN.INSERTITEM, ctypes.POINTER(NMLISTVIEW))
+    onDeleteItem = WM_NotifyDelegator(LVN.DELETEITEM, ctypes.POINTER(NMLISTVIEW))
+    onDeleteAllItems = WM_NotifyDelegator(LVN.DELETEALLITEMS, ctypes.POINTER(NMLISTVIEW))
+    onBeginLabelEdit = WM_NotifyDelegator(LVN.BEGINLABELEDIT, ctypes.POINTER(LVDISPINFO))
+    onEndLabelEdit = WM_NotifyDelegator(LVN.ENDLABELEDIT, ctypes.POINTER(LVDISPINFO))
+    onColumnClick = WM_NotifyDelegator(LVN.COLUMNCLICK, ctypes.POINTER(NMLISTVIEW))
+    onBeginDrag = WM_NotifyDelegator(LVN.BEGINDRAG, ctypes.POINTER(NMLISTVIEW))
+    onBeginrDrag = WM_NotifyDelegator(LVN.BEGINRDRAG, ctypes.POINTER(NMLISTVIEW))
+    onOdCacheHint = WM_NotifyDelegator(LVN.ODCACHEHINT, ctypes.POINTER(NMLVCACHEHINT))
+    onItemActivate = WM_NotifyDelegator(LVN.ITEMACTIVATE, ctypes.POINTER(NMITEMACTIVATE))
+    onOdStateChanged = WM_NotifyDelegator(LVN.ODSTATECHANGED, ctypes.POINTER(NMLVODSTATECHANGE))
+    onOdFindItem = WM_NotifyDelegator(LVN.ODFINDITEM, ctypes.POINTER(NMLVFINDITEM))
     onHotTrack = WM_NotifyDelegator(LVN.HOTTRACK, None)
-    onGetDispInfo = WM_NotifyDelegator(LVN.GETDISPINFO, None)
-    onSetDispInfo = WM_NotifyDelegator(LVN.SETDISPINFO, None)
+    onGetDispInfo = WM_NotifyDelegator(LVN.GETDISPINFO, ctypes.POINTER(LVDISPINFO))
+    onSetDispInfo = WM_NotifyDelegator(LVN.SETDISPINFO, ctypes.POINTER(LVDISPINFO))
     onKeyDown = WM_NotifyDelegator(LVN.KEYDOWN, None)
     onMarqueeBegin = WM_NotifyDelegator(LVN.MARQUEEBEGIN, None)
-    onGetInfoTip = WM_NotifyDelegator(LVN.GETINFOTIP, None)
+    onGetInfoTip = WM_NotifyDelegator(LVN.GETINFOTIP, ctypes.POINTER(NMLVGETINFOTIP))
     onIncrementalSearch = WM_NotifyDelegator(LVN.INCREMENTALSEARCH, None)
     onColumnDropDown = WM_NotifyDelegator(LVN.COLUMNDROPDOWN, None)
     onColumnOverflowClick = WM_NotifyDelegator(LVN.COLUMNOVERFLOWCLICK, None)
-    onBeginScroll = WM_NotifyDelegator(LVN.BEGINSCROLL, None)
-    onEndScroll = WM_NotifyDelegator(LVN.ENDSCROLL, None)
+    onBeginScroll = WM_NotifyDelegator(LVN.BEGINSCROLL, ctypes.POINTER(NMLVSCROLL))
+    onEndScroll = WM_NotifyDelegator(LVN.ENDSCROLL, ctypes.POINTER(NMLVSCROLL))
     onLinkClick = WM_NotifyDelegator(LVN.LINKCLICK, None)
-    onGetEmptyMarkup = WM_NotifyDelegator(LVN.GETEMPTYMARKUP, None)
+    onGetEmptyMarkup = WM_NotifyDelegator(LVN.GETEMPTYMARKUP, ctypes.POINTER(NMLVEMPTYMARKUP))
 
 
     # def initialize(self):
@@ -1340,6 +1343,30 @@ class ListView(Control):
     def setItemCountEx(self, cItems, dwFlags):
         SendMessage(self.hwnd, LVM.SETITEMCOUNT, cItems, dwFlags)
 
+    @staticmethod
+    def setDispInfoText(dispinfo, text):
+        '''
+        Copies text into the buffer provided by a LVN.GETDISPINFO notification.
+
+        Assigning dispinfo.item.pszText would hand out a python owned buffer
+        which is gone before the list view reads it.
+
+        Args:
+            dispinfo (LVDISPINFO): The notification structure.
+            text (str): The text of the requested item or subitem.
+
+        Returns:
+            None
+        '''
+        item = dispinfo.item
+        if not item.mask & LVIF.TEXT or item.cchTextMax <= 0:
+            return
+        address = ctypes.c_void_p.from_address(ctypes.addressof(item) + LVITEM.pszText.offset).value
+        if not address:
+            return
+        text = text[:item.cchTextMax - 1] + '\0'
+        ctypes.memmove(address, ctypes.create_unicode_buffer(text, len(text)), len(text) * ctypes.sizeof(WCHAR))
+
     def sortItems(self, _pfnCompare, _lPrm):
         return SendMessage(self.hwnd, LVM.SORTITEMS, LPARAM(_lPrm),   PFNLVCOMPARE(_pfnCompare))  # BOOL
 
@@ -446,20 +446,20 @@ class TreeView(Control):
     onSetCursor = WM_NotifyDelegator(NM.SETCURSOR, None)
     onSetFocus = WM_NotifyDelegator(NM.SETFOCUS, None)
     onAsyncDraw = WM_NotifyDelegator(TVN.ASYNCDRAW, None)
-    onBeginDrag = WM_NotifyDelegator(TVN.BEGINDRAG, None)
+    onBeginDrag = WM_NotifyDelegator(TVN.BEGINDRAG, ctypes.POINTER(NMTREEVIEW))
     onBeginLabelEdit = WM_NotifyDelegator(TVN.BEGINLABELEDIT, None)
-    onBeginrDrag = WM_NotifyDelegator(TVN.BEGINRDRAG, None)
-    onDeleteItem = WM_NotifyDelegator(TVN.DELETEITEM, None)
+    onBeginrDrag = WM_NotifyDelegator(TVN.BEGINRDRAG, ctypes.POINTER(NMTREEVIEW))
+    onDeleteItem = WM_NotifyDelegator(TVN.DELETEITEM, ctypes.POINTER(NMTREEVIEW))
     onEndLabelEdit = WM_NotifyDelegator(TVN.ENDLABELEDIT, None)
     onGetDispInfo = WM_NotifyDelegator(TVN.GETDISPINFO, None)
-    onGetInfoTip = WM_NotifyDelegator(TVN.GETINFOTIP, None)
+    onGetInfoTip = WM_NotifyDelegator(TVN.GETINFOTIP, ctypes.POINTER(NMTVGETINFOTIP))
     onItemChanged = WM_NotifyDelegator(TVN.ITEMCHANGED, None)
     onItemChanging = WM_NotifyDelegator(TVN.ITEMCHANGING, None)
-    onItemExpanded = WM_NotifyDelegator(TVN.ITEMEXPANDED, None)
-    onItemExpanding = WM_NotifyDelegator(TVN.ITEMEXPANDING, None)
+    onItemExpanded = WM_NotifyDelegator(TVN.ITEMEXPANDED, ctypes.POINTER(NMTREEVIEW))
+    onItemExpanding = WM_NotifyDelegator(TVN.ITEMEXPANDING, ctypes.POINTER(NMTREEVIEW))
     onKeyDown = WM_NotifyDelegator(TVN.KEYDOWN, None)
-    onSelChanged = WM_NotifyDelegator(TVN.SELCHANGED, None)
-    onSelChanging = WM_NotifyDelegator(TVN.SELCHANGING, None)
+    onSelChanged = WM_NotifyDelegator(TVN.SELCHANGED, ctypes.POINTER(NMTREEVIEW))
+    onSelChanging = WM_NotifyDelegator(TVN.SELCHANGING, ctypes.POINTER(NMTREEVIEW))
     onSetDispInfo = WM_NotifyDelegator(TVN.SETDISPINFO, None)
     onSingleExpand = WM_NotifyDelegator(TVN.SINGLEEXPAND, None)
 
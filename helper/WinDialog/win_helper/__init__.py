@@ -93,6 +93,10 @@ IsDialogMessage = user32.IsDialogMessageW
 IsDialogMessage.restype  = BOOL
 IsDialogMessage.argtypes = [HWND, POINTER(MSG)]
 
+PostQuitMessage = user32.PostQuitMessage
+PostQuitMessage.restype  = None
+PostQuitMessage.argtypes = [INT]
+
 GetWindowRect = user32.GetWindowRect
 GetWindowRect.restype  = BOOL
 GetWindowRect.argtypes = [HWND, POINTER(RECT)]
@@ -409,6 +413,7 @@ class DialogBoxStyles(IntEnum):
 
 class WinMessages(IntEnum):
     CLOSE = 16
+    DESTROY = 2
     COMMAND = 273
     INITDIALOG = 272
     NOTIFY = 78
@@ -553,7 +558,9 @@ class WM_NotifyDelegator:
     '''
     def __init__(self, wm_notify_id, returned_struct):
         self.id = wm_notify_id
-        self.returned_struct = returned_struct
+        # every notification starts with a NMHDR, the handler gets at least that
+        self.returned_struct = returned_struct or LPNMHDR
 
     def __set__(self, control, value):
-        control.registeredNotifications[self.id] = (value, self.returned_struct)
+        # NMHDR.code is unsigned, the NM and LVN codes are defined as negative numbers
+        control.registeredNotifications[self.id & 0xFFFFFFFF] = (value, self.returned_struct)
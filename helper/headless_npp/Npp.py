@@ -0,0 +1,1093 @@
+'''
+    Headless stand-in for the Npp module of PythonScript
+
+    Lets scripts which do "from Npp import editor, notepad, ..." run outside of
+    notepad++, e.g. to replay a recorded lsp session on linux, see
+    lspclient/__tests__/replay_session.py. Put this directory in front of
+    sys.path, the constants are read from the Npp.pyi of the lspclient.
+
+    The editor keeps a single document per buffer, positions are byte offsets
+    into its utf-8 text like in scintilla. Changing the text sends MODIFIED,
+    moving the view UPDATEUI to the callbacks, which run synchronously.
+    Everything a script shows to the user, calltips, autocompletion lists,
+    annotations, message boxes and the status bar, is appended to ui_log.
+    notify and open_document are not part of the PythonScript api, a driver
+    uses them to send notifications and to open files with a given text.
+
+    Every call of the api is counted per function, e.g. "editor.getStyleAt",
+    in calls, in notepad++ each one crosses from python into the editor and
+    is what a script really pays for. call_report formats them, counted_calls
+    collects those of a single operation:
+        with counted_calls() as counts:
+            editor.setFirstVisibleLine(1000)
+        print(call_report(counts))
+
+    research uses the re module, ^ and $ match at line boundaries like in
+    boost, \h, \R, \<, \> and the posix classes in brackets, e.g. [[:alpha:]],
+    are translated, other boost extensions are not supported.
+'''
+import os
+import re
+import tempfile
+import functools
+import contextlib
+from enum import IntEnum
+from collections import Counter
+from itertools import accumulate
+
+NPP_PYI = os.environ.get('NPP_PYI', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                 '..', '..', 'lspclient', 'Npp.pyi'))
+
+
+def _load_constants(path):
+    ''' executes the enum classes of Npp.pyi, the editor and notepad declarations are skipped '''
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    header = source[:source.index('class console')]
+    enums = source[source.index('class FORMATTYPE'):source.index('editor2 = editor1 = editor')]
+    namespace = dict()
+    exec(compile(header + enums, path, 'exec'), namespace)  # pylint: disable=W0122
+    return {name: value for name, value in namespace.items() if isinstance(value, type) and issubclass(value, IntEnum)}
+
+
+_CONSTANTS = _load_constants(NPP_PYI)
+# every enum of Npp.pyi can be imported from here, the ones used below are bound by name
+globals().update(_CONSTANTS)
+FOLDLEVEL = _CONSTANTS['FOLDLEVEL']
+LANGTYPE = _CONSTANTS['LANGTYPE']
+MESSAGEBOXFLAGS = _CONSTANTS['MESSAGEBOXFLAGS']
+MODIFICATIONFLAGS = _CONSTANTS['MODIFICATIONFLAGS']
+NOTIFICATION = _CONSTANTS['NOTIFICATION']
+SCINTILLANOTIFICATION = _CONSTANTS['SCINTILLANOTIFICATION']
+UPDATE = _CONSTANTS['UPDATE']
+WRAP = _CONSTANTS['WRAP']
+
+if 'EOLANNOTATIONVISIBLE' not in globals():
+    class EOLANNOTATIONVISIBLE(IntEnum):
+        HIDDEN = 0x0
+        STANDARD = 0x1
+        BOXED = 0x2
+        STADIUM = 0x100
+
+
+# everything shown to the user, (function name, args) in call order
+ui_log = []
+# "object.function" -> number of calls
+calls = Counter()
+# functions of a driver, not part of the PythonScript api and not counted
+DRIVER_FUNCTIONS = {'notify', 'open_document'}
+
+# boost escapes -> (outside, inside of brackets)
+BOOST_ESCAPES = {
+    r'\h': (r'[ \t]', r' \t'),
+    r'\R': (r'(?:\r\n|[\n\r\f\v])', r'\n\r\f\v'),
+    r'\<': (r'\b', r'\<'),
+    r'\>': (r'\b', r'\>'),
+}
+POSIX_CLASSES = {
+    'alpha': r'a-zA-Z\u00aa-\uffff',
+    'alnum': r'0-9a-zA-Z\u00aa-\uffff',
+    'digit': r'0-9',
+    'xdigit': r'0-9a-fA-F',
+    'upper': r'A-Z',
+    'lower': r'a-z',
+    'space': r'\s',
+    'blank': r' \t',
+    'punct': r'!-/:-@\[-`{-~',
+    'cntrl': r'\x00-\x1f\x7f',
+    'word': r'\w',
+}
+
+
+class EDITOR:
+    def __init__(self):
+        self.callbacks = dict()  # notification -> [callback]
+        self.document = DOCUMENT('')
+        self.lines_on_screen = 40
+        self.styles = dict()  # (style, property) -> value
+        self.settings = dict()  # setting name -> value, e.g. mouse dwell time
+        self.properties = dict()  # lexer properties
+        self.calltip = None
+        self.autocompletion = None
+        self.autocompletion_current = -1
+        self.autocompletion_entered = 0
+
+
+    # notifications
+
+    def callback(self, function, notifications):
+        for notification in notifications:
+            self.callbacks.setdefault(notification, []).append(function)
+        return True
+
+    callbackSync = callback
+
+
+    def clearCallbacks(self, notifications=None):
+        if notifications is None:
+            self.callbacks.clear()
+            return
+        for notification in notifications:
+            self.callbacks.pop(notification, None)
+
+
+    def notify(self, notification, args):
+        ''' calls the callbacks registered for notification, not part of the PythonScript api '''
+        for function in list(self.callbacks.get(notification, [])):
+            function(dict(args))
+
+
+    # text and positions
+
+    def getText(self):
+        return self.document.text
+
+
+    def getTextLength(self):
+        return len(self.document.data)
+
+    getLength = getTextLength
+
+
+    def setText(self, text):
+        self._replace(0, len(self.document.data), text)
+
+
+    def getLineCount(self):
+        return len(self.document.line_starts())
+
+
+    def positionFromLine(self, line):
+        starts = self.document.line_starts()
+        if line < 0:
+            return -1
+        return starts[line] if line < len(starts) else len(self.document.data)
+
+
+    def lineFromPosition(self, position):
+        return self.document.line_from_position(position)
+
+
+    def getLineEndPosition(self, line):
+        return self.document.line_end(line)
+
+
+    def getLine(self, line):
+        starts = self.document.line_starts()
+        if not 0 <= line < len(starts):
+            return ''
+        end = starts[line + 1] if line + 1 < len(starts) else len(self.document.data)
+        return self.document.data[starts[line]:end].decode('utf-8')
+
+
+    def getCurLine(self):
+        return self.getLine(self.lineFromPosition(self.document.caret))
+
+
+    def getColumn(self, position):
+        start = self.positionFromLine(self.lineFromPosition(position))
+        return len(self.document.data[start:position].decode('utf-8', 'replace'))
+
+
+    def getCharAt(self, position):
+        data = self.document.data
+        return data[position] if 0 <= position < len(data) else 0
+
+
+    def getTextRange(self, start, end):
+        return self.document.data[start:end].decode('utf-8')
+
+
+    def positionBefore(self, position):
+        ''' start of the character before position, a \r\n line ending is a single character '''
+        data = self.document.data
+        position = max(0, min(position, len(data)))
+        if position == 0:
+            return 0
+        position -= 1
+        while position > 0 and data[position] & 0xc0 == 0x80:
+            position -= 1
+        if position > 0 and data[position] == 0x0a and data[position - 1] == 0x0d:
+            position -= 1
+        return position
+
+
+    def positionAfter(self, position):
+        ''' end of the character at position, a \r\n line ending is a single character '''
+        data = self.document.data
+        position = max(0, min(position, len(data)))
+        if position == len(data):
+            return position
+        if data[position] == 0x0d and data[position + 1:position + 2] == b'\n':
+            return position + 2
+        position += 1
+        while position < len(data) and data[position] & 0xc0 == 0x80:
+            position += 1
+        return position
+
+
+    def wordStartPosition(self, position, only_word_characters=True):
+        data = self.document.data
+        while position > 0 and _is_word_byte(data[position - 1]):
+            position -= 1
+        return position
+
+
+    def wordEndPosition(self, position, only_word_characters=True):
+        data = self.document.data
+        while position < len(data) and _is_word_byte(data[position]):
+            position += 1
+        return position
+
+
+    def getWord(self, position=None, only_word_characters=True):
+        position = self.document.caret if position is None else position
+        return self.getTextRange(self.wordStartPosition(position), self.wordEndPosition(position))
+
+
+    # searching
+
+    def research(self, search, callback, flags=0, start=0, end=-1, max_count=0):
+        '''
+            Calls callback with a match object for every match of the regular expression search
+            between the positions start and end, the spans of the match are positions like in scintilla
+        '''
+        document = self.document
+        end = len(document.data) if end < 0 else end
+        count = 0
+        for match in _compile(search, flags).finditer(document.text, document.char_index(start),
+                                                       document.char_index(end)):
+            callback(MATCH(match, document))
+            count += 1
+            if count == max_count:
+                break
+
+
+    # changes
+
+    def _replace(self, start, end, text):
+        ''' replaces the bytes start to end by text and sends the MODIFIED notifications '''
+        document = self.document
+        removed = document.data[start:end]
+        if removed:
+            lines_removed = removed.count(b'\n')
+            document.replace(start, end, b'')
+            self.notify(SCINTILLANOTIFICATION.MODIFIED,
+                        {'position': start, 'modificationType': int(MODIFICATIONFLAGS.DELETETEXT),
+                         'text': removed.decode('utf-8', 'replace'), 'length': len(removed),
+                         'linesAdded': -lines_removed, 'line': 0})
+        data = text.encode('utf-8')
+        if data:
+            document.replace(start, start, data)
+            self.notify(SCINTILLANOTIFICATION.MODIFIED,
+                        {'position': start, 'modificationType': int(MODIFICATIONFLAGS.INSERTTEXT),
+                         'text': text, 'length': len(data), 'linesAdded': data.count(b'\n'), 'line': 0})
+        if document.caret > start:
+            document.caret = max(start, document.caret + len(data) - len(removed))
+        document.modified = True
+        return len(data)
+
+
+    def insertText(self, position, text):
+        position = self.document.caret if position < 0 else position
+        self._replace(position, position, text)
+
+
+    def addText(self, text):
+        caret = self.document.caret
+        self._replace(caret, caret, text)
+        self.document.caret = caret + len(text.encode('utf-8'))
+
+
+    def deleteRange(self, position, length):
+        self._replace(position, position + length, '')
+
+
+    def setTargetRange(self, start, end):
+        self.document.target = (start, end)
+
+
+    def replaceTarget(self, text):
+        start, end = self.document.target
+        length = self._replace(start, end, text)
+        self.document.target = (start, start + length)
+        return length
+
+
+    def beginUndoAction(self):
+        pass
+
+
+    def endUndoAction(self):
+        pass
+
+
+    def emptyUndoBuffer(self):
+        # there is no undo history
+        pass
+
+
+    def getModify(self):
+        return self.document.modified
+
+
+    # caret, selection and view
+
+    def getCurrentPos(self):
+        return self.document.caret
+
+
+    def gotoPos(self, position):
+        self.document.caret = max(0, min(position, len(self.document.data)))
+        self.document.anchor = self.document.caret
+        line = self.lineFromPosition(self.document.caret)
+        first_line = self.document.first_line
+        if not first_line <= line < first_line + self.lines_on_screen:
+            self.setFirstVisibleLine(max(0, line - self.lines_on_screen // 2))
+        self.notify(SCINTILLANOTIFICATION.UPDATEUI, {'updated': int(UPDATE.SELECTION)})
+
+    setEmptySelection = gotoPos
+
+
+    def gotoLine(self, line):
+        self.gotoPos(self.positionFromLine(line))
+
+
+    def getSelectionStart(self):
+        return min(self.document.caret, self.document.anchor)
+
+
+    def getSelectionEnd(self):
+        return max(self.document.caret, self.document.anchor)
+
+
+    def setSelection(self, caret, anchor):
+        self.document.caret = caret
+        self.document.anchor = anchor
+        self.notify(SCINTILLANOTIFICATION.UPDATEUI, {'updated': int(UPDATE.SELECTION)})
+
+
+    def getFirstVisibleLine(self):
+        return self.document.first_line
+
+
+    def setFirstVisibleLine(self, line):
+        line = max(0, min(line, self.getLineCount() - 1))
+        if line != self.document.first_line:
+            self.document.first_line = line
+            self.notify(SCINTILLANOTIFICATION.UPDATEUI, {'updated': int(UPDATE.V_SCROLL)})
+
+
+    def lineScroll(self, columns, lines):
+        # no horizontal scrolling, nothing is wider than the view
+        self.setFirstVisibleLine(self.document.first_line + lines)
+
+
+    def linesOnScreen(self):
+        return self.lines_on_screen
+
+
+    def docLineFromVisible(self, line):
+        # nothing is folded or wrapped
+        return min(line, self.getLineCount() - 1)
+
+
+    def visibleFromDocLine(self, line):
+        return line
+
+
+    # user interface
+
+    def callTipShow(self, position, text):
+        self.calltip = (position, text)
+        ui_log.append(('callTipShow', (position, text)))
+
+
+    def callTipCancel(self):
+        self.calltip = None
+
+
+    def callTipActive(self):
+        return self.calltip is not None
+
+
+    def callTipUseStyle(self, tab_size):
+        self.settings['callTipUseStyle'] = tab_size
+
+
+    def autoCShow(self, length_entered, item_list):
+        self.autocompletion = (0, item_list)
+        self.autocompletion_current = 0
+        self.autocompletion_entered = length_entered
+        ui_log.append(('autoCShow', (length_entered, item_list)))
+
+
+    def userListShow(self, list_type, item_list):
+        self.autocompletion = (list_type, item_list)
+        self.autocompletion_current = 0
+        ui_log.append(('userListShow', (list_type, item_list)))
+
+
+    def autoCCancel(self):
+        self.autocompletion = None
+        self.autocompletion_current = -1
+
+
+    def autoCGetCurrent(self):
+        return self.autocompletion_current
+
+
+    def autoCComplete(self):
+        ''' inserts the highlighted entry, AUTOCSELECTION is sent before, a callback cancelling the list prevents it '''
+        if self.autocompletion is None:
+            return
+        list_type, item_list = self.autocompletion
+        entry = item_list.split(chr(self.settings.get('autoCSeparator', ord(' '))))[self.autocompletion_current]
+        start = self.document.caret - self.autocompletion_entered
+        self.notify(SCINTILLANOTIFICATION.AUTOCSELECTION, {'listType': list_type, 'text': entry, 'position': start})
+        if self.autocompletion is None:
+            return
+        self.autocompletion = None
+        self.autocompletion_current = -1
+        self._replace(start, self.document.caret, entry)
+        self.document.caret = start + len(entry.encode('utf-8'))
+
+
+    def autoCSelect(self, text):
+        ''' highlights the first entry starting with text, which sends AUTOCSELECTIONCHANGE like scintilla '''
+        if self.autocompletion is None:
+            return
+        list_type, item_list = self.autocompletion
+        entries = item_list.split(chr(self.settings.get('autoCSeparator', ord(' '))))
+        for index, entry in enumerate(entries):
+            if entry.startswith(text):
+                self.autocompletion_current = index
+                self.notify(SCINTILLANOTIFICATION.AUTOCSELECTIONCHANGE,
+                            {'listType': list_type, 'text': entry, 'position': self.document.caret})
+                return
+
+
+    def autoCActive(self):
+        return self.autocompletion is not None
+
+
+    def autoCSetSeparator(self, separator):
+        self.settings['autoCSeparator'] = separator
+
+
+    def autoCSetOrder(self, order):
+        self.settings['autoCOrder'] = order
+
+
+    def setMouseDwellTime(self, milliseconds):
+        self.settings['mouseDwellTime'] = milliseconds
+
+
+    # styles, indicators, folding and annotations
+
+    def styleGetFore(self, style):
+        return self.styles.get((style, 'fore'), (0, 0, 0))
+
+
+    def styleGetBack(self, style):
+        return self.styles.get((style, 'back'), (255, 255, 255))
+
+
+    def styleSetFore(self, style, color):
+        self.styles[(style, 'fore')] = tuple(color)
+
+
+    def styleSetBack(self, style, color):
+        self.styles[(style, 'back')] = tuple(color)
+
+
+    def styleSetItalic(self, style, italic):
+        self.styles[(style, 'italic')] = bool(italic)
+
+
+    def startStyling(self, position, mask=0):
+        self.document.end_styled = position
+
+
+    def setStyling(self, length, style):
+        document = self.document
+        document.styles[document.end_styled:document.end_styled + length] = bytes([style]) * length
+        document.end_styled += length
+
+
+    def getStyleAt(self, position):
+        styles = self.document.styles
+        return styles[position] if 0 <= position < len(styles) else 0
+
+
+    def getEndStyled(self):
+        return self.document.end_styled
+
+
+    def colourise(self, start, end):
+        # there is no lexer, the range just counts as styled
+        length = len(self.document.data)
+        self.document.end_styled = max(self.document.end_styled, length if end < 0 else min(end, length))
+
+
+    def setProperty(self, key, value):
+        self.properties[key] = str(value)
+
+
+    def getProperty(self, key):
+        return self.properties.get(key, '')
+
+    getPropertyExpanded = getProperty
+
+
+    def getPropertyInt(self, key, default=0):
+        try:
+            return int(self.properties[key])
+        except (KeyError, ValueError):
+            return default
+
+
+    def setWrapMode(self, mode):
+        self.settings['wrapMode'] = mode
+
+
+    def getWrapMode(self):
+        return self.settings.get('wrapMode', int(WRAP.NONE))
+
+
+    def wrapCount(self, line):
+        # lines are never wider than the window
+        return 1
+
+
+    def indicSetStyle(self, indicator, style):
+        self.styles[(indicator, 'indicator style')] = style
+
+
+    def indicSetFlags(self, indicator, flags):
+        self.styles[(indicator, 'indicator flags')] = flags
+
+
+    def setIndicatorCurrent(self, indicator):
+        self.document.indicator = indicator
+
+
+    def setIndicatorValue(self, value):
+        self.document.indicator_value = value
+
+
+    def indicatorFillRange(self, start, length):
+        self.document.indicators.setdefault(self.document.indicator, dict())[start] = (length,
+                                                                                      self.document.indicator_value)
+
+
+    def indicatorClearRange(self, start, length):
+        ranges = self.document.indicators.get(self.document.indicator, {})
+        for position in [position for position in ranges if start <= position < start + length]:
+            del ranges[position]
+
+
+    def indicatorValueAt(self, indicator, position):
+        for start, (length, value) in self.document.indicators.get(indicator, {}).items():
+            if start <= position < start + length:
+                return value
+        return 0
+
+
+    def setFoldLevel(self, line, level):
+        self.document.fold_levels[line] = level
+
+
+    def getFoldLevel(self, line):
+        return self.document.fold_levels.get(line, int(FOLDLEVEL.BASE))
+
+
+    def annotationSetText(self, line, text):
+        self.document.annotations[line] = text
+        ui_log.append(('annotationSetText', (line, text)))
+
+
+    def annotationGetText(self, line):
+        return self.document.annotations.get(line) or ''
+
+
+    def annotationSetStyle(self, line, style):
+        self.document.annotation_styles[line] = style
+
+
+    def annotationGetStyle(self, line):
+        return self.document.annotation_styles.get(line, 0)
+
+
+    def annotationSetVisible(self, visible):
+        self.settings['annotationVisible'] = visible
+
+
+    def annotationClearAll(self):
+        self.document.annotations.clear()
+        self.document.annotation_styles.clear()
+
+
+    def eOLAnnotationSetText(self, line, text):
+        if text:
+            self.document.eol_annotations[line] = text
+        else:
+            self.document.eol_annotations.pop(line, None)
+        ui_log.append(('eOLAnnotationSetText', (line, text)))
+
+
+    def eOLAnnotationGetText(self, line):
+        return self.document.eol_annotations.get(line, '')
+
+
+    def eOLAnnotationSetStyle(self, line, style):
+        pass
+
+
+    def eOLAnnotationSetVisible(self, visible):
+        self.settings['eOLAnnotationVisible'] = visible
+
+
+    def eOLAnnotationClearAll(self):
+        self.document.eol_annotations.clear()
+
+
+def _is_word_byte(byte):
+    return byte >= 0x80 or byte == 0x5f or 0x30 <= byte <= 0x39 or 0x41 <= byte <= 0x5a or 0x61 <= byte <= 0x7a
+
+
+@functools.lru_cache(maxsize=256)
+def _compile(search, flags):
+    if isinstance(search, bytes):
+        search = search.decode('utf-8')
+    return re.compile(_boost_to_python(search), flags | re.MULTILINE)
+
+
+def _boost_to_python(search):
+    ''' translates the boost extensions of BOOST_ESCAPES and POSIX_CLASSES '''
+    translated = []
+    in_brackets = False
+    i = 0
+    while i < len(search):
+        char = search[i]
+        if char == '\\' and i + 1 < len(search):
+            escape = search[i:i + 2]
+            translated.append(BOOST_ESCAPES[escape][in_brackets] if escape in BOOST_ESCAPES else escape)
+            i += 2
+            continue
+        if in_brackets and search.startswith('[:', i):
+            end = search.find(':]', i + 2)
+            name = search[i + 2:end]
+            if end != -1 and name in POSIX_CLASSES:
+                translated.append(POSIX_CLASSES[name])
+                i = end + 2
+                continue
+        if char == '[' and not in_brackets:
+            in_brackets = True
+            # a ] right after the opening bracket is a literal one
+            start = i + 2 if search.startswith('[^', i) else i + 1
+            if search.startswith(']', start):
+                translated.append(search[i:start + 1])
+                i = start + 1
+                continue
+        elif char == ']' and in_brackets:
+            in_brackets = False
+        translated.append(char)
+        i += 1
+    return ''.join(translated)
+
+
+class MATCH:
+    ''' a match of research, like the one of the re module but with positions in bytes '''
+    def __init__(self, match, document):
+        self.match = match
+        self.document = document
+
+
+    def span(self, group=0):
+        start, end = self.match.span(group)
+        if start == -1:
+            return start, end
+        return self.document.byte_index(start), self.document.byte_index(end)
+
+
+    def start(self, group=0):
+        return self.span(group)[0]
+
+
+    def end(self, group=0):
+        return self.span(group)[1]
+
+
+    def __getattr__(self, name):
+        # group, groups, groupdict, lastindex, expand ...
+        return getattr(self.match, name)
+
+
+class DOCUMENT:
+    ''' the text of a buffer and everything scintilla keeps per document '''
+    def __init__(self, text):
+        self.data = bytearray(text.encode('utf-8'))
+        self._text = text
+        self._line_starts = None
+        self.caret = 0
+        self.anchor = 0
+        self.first_line = 0
+        self.target = (0, 0)
+        self.modified = False
+        self.indicator = 0
+        self.indicator_value = 0
+        self.indicators = dict()  # indicator -> {start: (length, value)}
+        self.fold_levels = dict()
+        self.annotations = dict()
+        self.annotation_styles = dict()
+        self.eol_annotations = dict()
+        self.styles = bytearray(len(self.data))
+        self.end_styled = 0
+        self._byte_offsets = None
+
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = self.data.decode('utf-8')
+        return self._text
+
+
+    def replace(self, start, end, data):
+        self.data[start:end] = data
+        self.styles[start:end] = bytes(len(data))
+        self.end_styled = min(self.end_styled, start)
+        self._text = None
+        self._line_starts = None
+        self._byte_offsets = None
+
+
+    def _offsets(self):
+        ''' position of every character and the end, None while the text is ascii only '''
+        if self._byte_offsets is None:
+            text = self.text
+            if len(text) == len(self.data):
+                self._byte_offsets = ()
+            else:
+                self._byte_offsets = [0] + list(accumulate(len(char.encode('utf-8')) for char in text))
+        return self._byte_offsets or None
+
+
+    def byte_index(self, char_index):
+        offsets = self._offsets()
+        return char_index if offsets is None else offsets[char_index]
+
+
+    def char_index(self, byte_index):
+        offsets = self._offsets()
+        if offsets is None:
+            return byte_index
+        low, high = 0, len(offsets) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if offsets[middle] <= byte_index:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+
+    def line_starts(self):
+        if self._line_starts is None:
+            starts = [0]
+            data = self.data
+            position = data.find(b'\n')
+            while position != -1:
+                starts.append(position + 1)
+                position = data.find(b'\n', position + 1)
+            self._line_starts = starts
+        return self._line_starts
+
+
+    def line_from_position(self, position):
+        starts = self.line_starts()
+        low, high = 0, len(starts) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if starts[middle] <= position:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+
+    def line_end(self, line):
+        ''' position of the end of line, before its line ending '''
+        starts = self.line_starts()
+        if line + 1 < len(starts):
+            end = starts[line + 1] - 1
+            return end - 1 if end > 0 and self.data[end - 1] == 0x0d else end
+        return len(self.data)
+
+
+class BUFFER:
+    def __init__(self, buffer_id, path, document, lang_type, language):
+        self.buffer_id = buffer_id
+        self.path = path
+        self.document = document
+        self.lang_type = lang_type
+        self.language = language
+
+
+class NOTEPAD:
+    def __init__(self, _editor):
+        self.editor = _editor
+        self.callbacks = dict()
+        self.buffers = dict()  # buffer id -> BUFFER
+        self.current = None
+        self.next_buffer_id = 1000
+        self.status_bar = dict()
+        self.plugin_config_dir = None
+        # answers of prompt and messageBox, in the order of the calls, None and MESSAGEBOXFLAGS.RESULTOK if empty
+        self.prompt_answers = []
+        self.message_box_answers = []
+        self.new(notify=False)
+
+
+    def callback(self, function, notifications):
+        for notification in notifications:
+            self.callbacks.setdefault(notification, []).append(function)
+        return True
+
+
+    def clearCallbacks(self, notifications=None):
+        if notifications is None:
+            self.callbacks.clear()
+            return
+        for notification in notifications:
+            self.callbacks.pop(notification, None)
+
+
+    def notify(self, notification, args):
+        ''' calls the callbacks registered for notification, not part of the PythonScript api '''
+        for function in list(self.callbacks.get(notification, [])):
+            function(dict(args, code=int(notification)))
+
+
+    def open_document(self, path, text, lang_type=None, language=None):
+        '''
+            Opens path with text instead of reading the file and activates it,
+            not part of the PythonScript api
+
+            Returns: the buffer id
+        '''
+        for buffer in self.buffers.values():
+            if buffer.path == path:
+                break
+        else:
+            buffer = self._create(path, text, LANGTYPE.TEXT if lang_type is None else lang_type, language)
+        if lang_type is not None:
+            buffer.lang_type = lang_type
+        if language is not None:
+            buffer.language = language
+        self.activateBufferID(buffer.buffer_id)
+        return buffer.buffer_id
+
+
+    def _create(self, path, text, lang_type, language=None):
+        self.next_buffer_id += 1
+        buffer = BUFFER(self.next_buffer_id, path, DOCUMENT(text), lang_type, language)
+        self.buffers[buffer.buffer_id] = buffer
+        return buffer
+
+
+    def new(self, notify=True):
+        buffer = self._create(f'new {len(self.buffers) + 1}', '', LANGTYPE.TEXT)
+        if notify:
+            self.activateBufferID(buffer.buffer_id)
+        else:
+            self.current = buffer
+            self.editor.document = buffer.document
+
+
+    def open(self, path):
+        for buffer in self.buffers.values():
+            if buffer.path == path:
+                self.activateBufferID(buffer.buffer_id)
+                return
+        with open(path, encoding='utf-8') as f:
+            self.open_document(path, f.read())
+
+    activateFile = open
+
+
+    def activateBufferID(self, buffer_id):
+        buffer = self.buffers[buffer_id]
+        self.current = buffer
+        self.editor.document = buffer.document
+        self.notify(NOTIFICATION.BUFFERACTIVATED, {'bufferID': buffer_id})
+
+
+    def close(self):
+        buffer = self.current
+        self.notify(NOTIFICATION.FILEBEFORECLOSE, {'bufferID': buffer.buffer_id})
+        del self.buffers[buffer.buffer_id]
+        self.notify(NOTIFICATION.FILECLOSED, {'bufferID': buffer.buffer_id})
+        if not self.buffers:
+            self.new(notify=False)
+        self.activateBufferID(next(reversed(list(self.buffers))))
+
+
+    def save(self):
+        buffer = self.current
+        self.notify(NOTIFICATION.FILEBEFORESAVE, {'bufferID': buffer.buffer_id})
+        buffer.document.modified = False
+        self.notify(NOTIFICATION.FILESAVED, {'bufferID': buffer.buffer_id})
+
+
+    def getCurrentBufferID(self):
+        return self.current.buffer_id
+
+
+    def getBufferFilename(self, buffer_id=None):
+        buffer = self.buffers.get(self.current.buffer_id if buffer_id is None else buffer_id)
+        return buffer.path if buffer is not None else ''
+
+
+    def getCurrentFilename(self):
+        return self.current.path
+
+
+    def getLangType(self, buffer_id=None):
+        return self.buffers[self.current.buffer_id if buffer_id is None else buffer_id].lang_type
+
+
+    def setLangType(self, lang_type, buffer_id=None):
+        buffer = self.buffers[self.current.buffer_id if buffer_id is None else buffer_id]
+        buffer.lang_type = lang_type
+        buffer.language = None
+        self.notify(NOTIFICATION.LANGCHANGED, {'bufferID': buffer.buffer_id})
+
+
+    def getLanguageName(self, lang_type):
+        if self.current.lang_type == lang_type and self.current.language:
+            return self.current.language
+        return LANGTYPE(lang_type).name.capitalize()
+
+
+    def getLanguageDesc(self, lang_type):
+        return f'{self.getLanguageName(lang_type)} file'
+
+
+    def getPluginConfigDir(self):
+        if self.plugin_config_dir is None:
+            self.plugin_config_dir = tempfile.mkdtemp(prefix='headless_npp_')
+        return self.plugin_config_dir
+
+
+    def getVersion(self):
+        return (8, 4, 2)
+
+
+    def getPluginVersion(self):
+        return '3.0.14'
+
+
+    def getEditorDefaultForegroundColor(self):
+        return (0, 0, 0)
+
+
+    def getEditorDefaultBackgroundColor(self):
+        return (255, 255, 255)
+
+
+    def setStatusBar(self, section, text):
+        self.status_bar[section] = text
+        ui_log.append(('setStatusBar', (section, text)))
+
+
+    def messageBox(self, message, title='', flags=0):
+        ui_log.append(('messageBox', (message, title)))
+        return self.message_box_answers.pop(0) if self.message_box_answers else MESSAGEBOXFLAGS.RESULTOK
+
+
+    def prompt(self, prompt, title='', default=''):
+        ui_log.append(('prompt', (prompt, title)))
+        return self.prompt_answers.pop(0) if self.prompt_answers else None
+
+
+class CONSOLE:
+    def __init__(self):
+        self.output = []
+
+
+    def write(self, text):
+        self.output.append(text)
+
+
+    def writeError(self, text):
+        self.output.append(text)
+
+
+    def clear(self):
+        self.output = []
+
+
+    def show(self):
+        pass
+
+
+    def hide(self):
+        pass
+
+
+class COUNTED:
+    ''' the object a script imports, counts the calls of the api functions of target in calls '''
+    def __init__(self, name, target):
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_target', target)
+
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if name.startswith('_') or name in DRIVER_FUNCTIONS or not callable(attribute) or isinstance(attribute, type):
+            return attribute
+        key = f'{self._name}.{name}'
+
+        def counted(*args, **kwargs):
+            calls[key] += 1
+            return attribute(*args, **kwargs)
+
+        # later lookups don't get here, the target's methods are bound once
+        object.__setattr__(self, name, counted)
+        return counted
+
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+
+def reset_calls():
+    calls.clear()
+
+
+@contextlib.contextmanager
+def counted_calls():
+    ''' yields a Counter which gets the calls made within the with block '''
+    counts = Counter()
+    before = Counter(calls)
+    try:
+        yield counts
+    finally:
+        counts.update(calls - before)
+
+
+def call_report(counts=None):
+    ''' returns the calls, the most frequent first, and their total as text '''
+    counts = calls if counts is None else counts
+    lines = [f'{count:10d}  {name}' for name, count in counts.most_common()]
+    lines.append(f'{sum(counts.values()):10d}  total')
+    return '\n'.join(lines)
+
+
+_editor = EDITOR()
+editor = editor1 = COUNTED('editor', _editor)
+editor2 = COUNTED('editor2', EDITOR())
+notepad = COUNTED('notepad', NOTEPAD(_editor))
+console = COUNTED('console', CONSOLE())
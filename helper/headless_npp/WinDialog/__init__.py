@@ -0,0 +1,136 @@
+'''
+    Headless stand-in for the WinDialog package, which needs the windows api
+
+    Dialogs are never really shown, show gives the dialog a made up window
+    handle and blocks like the message loop would until the dialog gets
+    terminated, so run it in a thread of its own like a modeless dialog.
+    A ListView behaves like an owner data list view of ROWS_PER_PAGE visible
+    rows, it requests the cells of those rows with onOdCacheHint and
+    onGetDispInfo whenever it would repaint them. Enough for scripts like the
+    results panel of the lspclient to be imported and driven outside of
+    notepad++.
+'''
+import itertools
+import threading
+from types import SimpleNamespace
+
+ROWS_PER_PAGE = 20
+_handles = itertools.count(0x10000)
+
+
+class FLAGS:
+    ''' any style or flag name is 0 '''
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return 0
+
+
+class Dialog:
+    def __init__(self, title='', size=(0, 0), center=False, modeless=False, **kwargs):
+        self.title = title
+        self.hwnd = 0
+        self.shown = 0
+        self.closed = threading.Event()
+
+
+    def show(self):
+        ''' returns once the dialog got terminated, it counts as shown after its initialization '''
+        self.shown += 1
+        self.closed.clear()
+        self.initialize()
+        self.hwnd = next(_handles)
+        self.closed.wait()
+
+
+    def initialize(self):
+        pass
+
+
+    def terminate(self):
+        self.hwnd = 0
+        self.closed.set()
+
+
+class Control:
+    style = 0
+
+    def __init__(self, title='', size=(0, 0), position=(0, 0), style=0, **kwargs):
+        self.title = title
+        self.text = title
+
+
+    def __getattr__(self, name):
+        # event handlers not set by the script and the control messages are no-ops
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: 0
+
+
+    def getText(self):
+        return self.text
+
+
+class ListView(Control):
+    def __init__(self, title='', size=(0, 0), position=(0, 0), style=0, **kwargs):
+        super().__init__(title, size, position, style, **kwargs)
+        self.hwnd = next(_handles)
+        self.columns = 0
+        self.item_count = 0
+        self.top_index = 0
+
+
+    @staticmethod
+    def setDispInfoText(dispinfo, text):
+        pass
+
+
+    def insertColumn(self, index, name):
+        self.columns += 1
+        return index
+
+
+    def setItemCount(self, count):
+        self.item_count = count
+        self.top_index = max(0, min(self.top_index, count - ROWS_PER_PAGE))
+        self._paint()
+
+
+    def getCountPerPage(self):
+        return ROWS_PER_PAGE
+
+
+    def getTopIndex(self):
+        return self.top_index
+
+
+    def ensureVisible(self, index, partial_ok):
+        index = max(0, min(index, self.item_count - 1))
+        if index < self.top_index:
+            self.top_index = index
+        elif index >= self.top_index + ROWS_PER_PAGE:
+            self.top_index = index - ROWS_PER_PAGE + 1
+        else:
+            return True
+        self._paint()
+        return True
+
+
+    def redrawItems(self, first, last):
+        self._paint()
+        return True
+
+
+    def _paint(self):
+        ''' requests the cells of the visible rows, as an owner data list view does when painting '''
+        last = min(self.top_index + ROWS_PER_PAGE, self.item_count) - 1
+        if last < self.top_index:
+            return
+        self.onOdCacheHint(SimpleNamespace(iFrom=self.top_index, iTo=last))
+        for row in range(self.top_index, last + 1):
+            for column in range(self.columns):
+                self.onGetDispInfo(SimpleNamespace(item=SimpleNamespace(iItem=row, iSubItem=column)))
+
+
+class TextBox(Control):
+    pass
@@ -0,0 +1,5 @@
+from .. import FLAGS
+
+LVS = FLAGS()
+LVS_EX = FLAGS()
+LVNI = FLAGS()
@@ -0,0 +1,3 @@
+from .. import FLAGS
+
+ES = FLAGS()
@@ -0,0 +1,11 @@
+from . import FLAGS
+
+WindowStyle = FLAGS()
+
+
+def SetWindowText(hwnd, text):
+    return True
+
+
+def UpdateWindow(hwnd):
+    return True
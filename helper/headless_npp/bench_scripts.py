@@ -0,0 +1,79 @@
+'''
+    Drives the editor bound scripts of this repository with the headless Npp
+    and reports the time and the api calls per operation, in notepad++ every
+    call crosses from python into the editor and dominates the cost.
+
+    EnhanceAnyLexer colors a python file while it gets scrolled page by page,
+    TreeNodeCalculator sums up a generated tree. IntelHexValidator and
+    CheckUnUsualWords are written for the python 2 of PythonScript 2 and are
+    skipped with python 3.
+    Run it with a regular python, not from the PythonScript console:
+        python bench_scripts.py [lines]
+'''
+import os
+import sys
+import time
+import runpy
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.join(HERE, '..', '..')
+sys.path.insert(0, HERE)
+from Npp import editor, notepad, call_report, counted_calls, reset_calls, LANGTYPE, MESSAGEBOXFLAGS  # noqa: E402
+
+PYTHON_SOURCE = '''class Point(object):
+    def __init__(self, x, y, *args, **kwargs):
+        self.x = x  # a comment with self in it
+        self.y = "a string with print(x)"
+
+    def length(cls, other):
+        return abs(complex(self.x - other.x, self.y - other.y))
+
+'''
+
+
+def report(title, seconds, operations, counts):
+    print(f'{title}: {operations} operations, {seconds / operations * 1000:.3f}ms, '
+          f'{sum(counts.values()) / operations:.1f} calls per operation')
+    for line in call_report(counts).splitlines():
+        print(f'    {line}')
+
+
+def bench_enhance_any_lexer(lines):
+    notepad.open_document('C:\\bench\\enhance.py', PYTHON_SOURCE * (lines // 8), LANGTYPE.PYTHON, 'Python')
+    runpy.run_path(os.path.join(REPO, 'npp', 'EnhanceAnyLexer.py'))
+    page = editor.linesOnScreen()
+    pages = range(0, editor.getLineCount() - page, page)
+    with counted_calls() as counts:
+        start = time.perf_counter()
+        for first_line in pages:
+            editor.setFirstVisibleLine(first_line)
+        seconds = time.perf_counter() - start
+    report(f'EnhanceAnyLexer, scrolling {editor.getLineCount()} lines', seconds, len(pages), counts)
+    editor.clearCallbacks()
+    notepad.clearCallbacks()
+
+
+def bench_tree_node_calculator(lines):
+    tree = ['work']
+    for group in range(lines // 50):
+        tree.append(f'    names {group}')
+        tree.extend(f'        # item {item} × {item * 3}€' for item in range(49))
+    notepad.open_document('C:\\bench\\tree.txt', '\r\n'.join(tree), LANGTYPE.TEXT)
+    notepad.message_box_answers.append(MESSAGEBOXFLAGS.RESULTYES)
+    with counted_calls() as counts:
+        start = time.perf_counter()
+        runpy.run_path(os.path.join(REPO, 'misc', 'TreeNodeCalculator.py'))
+        seconds = time.perf_counter() - start
+    report(f'TreeNodeCalculator, {len(tree)} lines', seconds, 1, counts)
+
+
+def main(lines=20000):
+    reset_calls()
+    bench_enhance_any_lexer(lines)
+    bench_tree_node_calculator(lines)
+    if sys.version_info[0] > 2:
+        print('IntelHexValidator and CheckUnUsualWords skipped, they need python 2')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -11,7 +11,7 @@ from .client import LSPCLIENT
 LSP client implementation for notepad++
 '''
 
-__version__ = '0.5'
+__version__ = '0.6'
 __all__ = [lsp_protocol, LSPCLIENT, logging, COMMUNICATION_MANAGER]
 
 single_instance = None
@@ -58,7 +58,16 @@ def __check_lsp_server_config(lsp_server_configs):
                                 if not isinstance(var, str):
                                     print(f'{item} expected string but got {type(var)} -> {var}')
                                     continue
-                    lsp_configs[item] = config[item]
+
+                    if 'features' in config[item] and not isinstance(config[item]['features'], list):
+                        print(f'{item} expected a list of features but got {config[item]["features"]}')
+                        continue
+
+                    # further servers of a language are keyed by language/name, e.g. PYTHON/ruff
+                    config[item]['language'] = item
+                    _count = sum(1 for _config in lsp_configs.values() if _config['language'] == item)
+                    _server = f'{item}/{config[item].get("name", _count)}' if _count else item
+                    lsp_configs[_server] = config[item]
 
     if lsp_configs:
         return lsp_configs
@@ -66,6 +75,19 @@ def __check_lsp_server_config(lsp_server_configs):
         raise ValueError('No valid lsp server configuration found in config file')
 
 
+def __check_proxy_config(config):
+    ''' removes an incomplete proxy config, the servers are started without the proxy then '''
+    proxy = config.get('proxy')
+    if proxy is None:
+        return
+    if not isinstance(proxy, dict) or 'python' not in proxy:
+        print('proxy missing_keys python, servers are started without the proxy')
+        del config['proxy']
+    elif not os.path.exists(proxy['python']):
+        print(f'proxy python does not exists:{proxy["python"]}, servers are started without the proxy')
+        del config['proxy']
+
+
 def __check_config(config_file):
     mandatory_keys = ['version', 'loglevel', 'logpath', 'lspservers']
     print(f'load:{config_file}')
@@ -96,13 +118,33 @@ def start(config_file=None):
             "version": "0.3",
             "loglevel": "info",
             "logpath": "C:\\temp\\npplsplog.txt",
+            "metrics": false,
+            "prefetch_definitions": false,
+            "suspend_idle_minutes": 30,
+            "max_open_documents": 50,
+            "progress_updates_per_second": 4,
+            "result_cache": false,
+            "result_cache_megabytes": 64,
+            "max_server_instances": 4,
+            "file_watch_interval": 2,
+            "completion_list_size": 200,
+            "proxy": {"python": "C:\\Python\\Python38_64\\pythonw.exe", "port": 2088, "idle_minutes": 60},
             "lspservers": [
                 {
                     "PYTHON": {
                         "pipe": "tcp",
                         "tcpretries" : 3,
                         "executable": "C:\\Python\\Python38_64\\Scripts\\pyls.exe",
-                        "args": ["--tcp", "--check-parent-process", "--log-file", "C:\\temp\\log.txt", "-v"]
+                        "args": ["--tcp", "--check-parent-process", "--log-file", "C:\\temp\\log.txt", "-v"],
+                        "settings": {"pyls": {"plugins": {"pycodestyle": {"maxLineLength": 120}}}}
+                    }
+                },
+                {
+                    "PYTHON": {
+                        "name": "ruff",
+                        "pipe": "io",
+                        "executable": "C:\\Python\\Python38_64\\Scripts\\ruff-lsp.exe",
+                        "features": ["diagnostics", "codeAction", "documentFormatting"]
                     }
                 },
                 {
@@ -139,6 +181,7 @@ def start(config_file=None):
         config = __check_config(config_file)
         if config:
             lsp_server_config = __check_lsp_server_config(config['lspservers'])
+            __check_proxy_config(config)
             if lsp_server_config:
                 logging.basicConfig(
                     filename=config['logpath'],
@@ -156,7 +199,7 @@ def start(config_file=None):
                 logging.info(config)
                 if logging.root.level == logging.NOTSET:
                     logging.disable()
-                single_instance = LSPCLIENT(lsp_server_config)
+                single_instance = LSPCLIENT(lsp_server_config, config)
                 args = {'bufferID': notepad.getCurrentBufferID()}
                 single_instance.on_buffer_activated(args)
         else:
@@ -166,12 +209,14 @@ def start(config_file=None):
 def stop():
     '''
         trying to stop all running lsp server processes
-        and destroying all created objects
+        and destroying all created objects, returns the shutdown report
     '''
     global single_instance
+    report = None
     if isinstance(single_instance, LSPCLIENT):
-        single_instance.terminate()
+        report = single_instance.terminate()
     single_instance = None
+    return report
 
 
 def document_symbols():
@@ -179,6 +224,28 @@ def document_symbols():
         single_instance._send_documet_symbol()
 
 
+def goto_symbol():
+    if isinstance(single_instance, LSPCLIENT):
+        single_instance._goto_symbol()
+
+
+def performance_report(reset=False):
+    '''
+        opens a new document with the latency percentiles of all requests
+        since start or the last reset, requires "metrics": true in the config file
+    '''
+    if isinstance(single_instance, LSPCLIENT):
+        single_instance._performance_report(reset)
+
+
+def show_diagnostics():
+    '''
+        opens the results panel with the diagnostics of all files
+    '''
+    if isinstance(single_instance, LSPCLIENT):
+        single_instance._show_diagnostics()
+
+
 def format_document():
     if isinstance(single_instance, LSPCLIENT):
         single_instance._send_document_formatting()
@@ -0,0 +1,105 @@
+'''
+    Compares a completion response with eager documentation to one without,
+    as servers send it when the client advertises resolveSupport, for 100,
+    1000 and 5000 items. Measures the size of the response and the time from
+    the received bytes to the shown list, decoding included, plus the
+    resolve of the highlighted item the lazy list needs when the selection
+    rests on an entry.
+    Then compares showing all of 1000, 10000 and 50000 items, the string
+    autoCShow gets and scintilla scans, to the ranked list capped at
+    MAX_SHOWN entries, on arrival and per typed character, where typing
+    without changing the shown entries reuses the rendered list.
+    Checks that the merged responses of a complete and an incomplete server
+    are all shown, the list is only marked to be requested again on typing.
+    Run it with a regular python, not from the PythonScript console:
+        python bench_completion_items.py
+'''
+import os
+import sys
+import json
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(HERE, '..', '..', 'helper', 'headless_npp'), os.path.join(HERE, '..', '..')]
+from Npp import editor  # noqa: E402
+from lspclient.completion_items import COMPLETION_ITEMS, MAX_SHOWN  # noqa: E402
+from lspclient.fan_out import merge_completions  # noqa: E402
+
+REPEAT = 20
+DOCUMENTATION = ('Return a new list containing all items from the iterable in ascending order.\n\n'
+                 'A custom key function can be supplied to customize the sort order, and the\n'
+                 'reverse flag can be set to request the result in descending order.')
+
+
+def response(count, eager):
+    items = []
+    for i in range(count):
+        item = {'label': f'name_{i}', 'kind': 3, 'insertText': f'name_{i}', 'sortText': f'{i:05d}',
+                'data': {'id': i, 'module': 'package.module'}}
+        if eager:
+            item.update(detail=f'def name_{i}(iterable, /, *, key=None, reverse=False) -> list',
+                        documentation={'kind': 'plaintext', 'value': DOCUMENTATION})
+        items.append(item)
+    return json.dumps({'jsonrpc': '2.0', 'id': 1, 'result': {'isIncomplete': False, 'items': items}}).encode()
+
+
+def time_to_popup(data):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        items = json.loads(data)['result']['items']
+        editor.autoCShow(0, COMPLETION_ITEMS().show(items, 'PYTHON'))
+    return (time.perf_counter() - start) / REPEAT
+
+
+def bench_ranking(count):
+    items = json.loads(response(count, False))['result']['items']
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        full = '\n'.join(item.get('insertText') or item['label'] for item in items)
+    full_seconds = (time.perf_counter() - start) / REPEAT
+    completion_items = COMPLETION_ITEMS()
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        ranked = completion_items.show(items, 'PYTHON')
+    ranked_seconds = (time.perf_counter() - start) / REPEAT
+    # name_1 matches a ninth of the items, name_12 fewer than MAX_SHOWN from 10000 items on
+    keystrokes = ['n', 'na', 'name_', 'name_1', 'name_12']
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        completion_items.show(items, 'PYTHON')
+        for prefix in keystrokes:
+            completion_items.render(prefix)
+    typing_seconds = (time.perf_counter() - start) / REPEAT - ranked_seconds
+    print(f'{count} items: all {len(full) / 1024:.0f}kB {full_seconds * 1000:.2f}ms, '
+          f'ranked top {MAX_SHOWN} {len(ranked) / 1024:.1f}kB {ranked_seconds * 1000:.2f}ms, '
+          f'{typing_seconds / len(keystrokes) * 1000:.2f}ms per typed character, '
+          f'{completion_items.reused} of {completion_items.renders - REPEAT * 2} renders reused')
+
+
+def check_incomplete_merge():
+    complete = {'isIncomplete': False, 'items': [{'label': 'alpha'}, {'label': 'beta'}]}
+    incomplete = {'isIncomplete': True, 'items': [{'label': 'beta'}, {'label': 'gamma'}]}
+    merged = merge_completions([complete, incomplete])
+    assert merged['isIncomplete'] is True
+    assert [item['label'] for item in merged['items']] == ['alpha', 'beta', 'gamma']
+    completion_items = COMPLETION_ITEMS()
+    shown = completion_items.show(merged['items'], 'PYTHON', '', merged['isIncomplete'])
+    assert shown.split('\n') == ['alpha', 'beta', 'gamma'] and completion_items.incomplete
+    print('a complete and an incomplete response: all 3 items shown, requested again on typing')
+
+
+def main():
+    check_incomplete_merge()
+    for count in (100, 1000, 5000):
+        eager, lazy = response(count, True), response(count, False)
+        resolved = json.dumps({'jsonrpc': '2.0', 'id': 2,
+                               'result': json.loads(response(1, True))['result']['items'][0]}).encode()
+        print(f'{count} items: eager {len(eager) / 1024:.0f}kB {time_to_popup(eager) * 1000:.2f}ms, '
+              f'lazy {len(lazy) / 1024:.0f}kB {time_to_popup(lazy) * 1000:.2f}ms, '
+              f'resolving the highlighted item {len(resolved)} bytes')
+    for count in (1000, 10000, 50000):
+        bench_ranking(count)
+
+
+if __name__ == '__main__':
+    main()
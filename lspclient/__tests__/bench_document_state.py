@@ -0,0 +1,34 @@
+'''
+    Compares the per request cost of the document version lookup,
+    scintilla property calls as used up to 0.5 against the in memory registry.
+    Run it from the PythonScript console.
+'''
+import time
+from Npp import editor, console
+from lspclient.document_state import DOCUMENT_REGISTRY
+
+REQUESTS = 100000
+BUFFERS = 500
+
+console.show()
+
+start = time.perf_counter()
+for _ in range(REQUESTS):
+    editor.setProperty('fileversion', editor.getPropertyInt('fileversion', 0) + 1)
+print(f'{REQUESTS} version updates via scintilla properties: {time.perf_counter() - start:.3f}s')
+
+registry = DOCUMENT_REGISTRY()
+paths = [f'C:\\project\\module_{i}.py' for i in range(BUFFERS)]
+for buffer_id, path in enumerate(paths):
+    registry.get(buffer_id, path, 'python')
+
+start = time.perf_counter()
+for i in range(REQUESTS):
+    document = registry.get(i % BUFFERS, paths[i % BUFFERS], 'python')
+    document.version += 1
+print(f'{REQUESTS} buffer switches and version updates via the registry: {time.perf_counter() - start:.3f}s')
+
+start = time.perf_counter()
+for buffer_id in range(BUFFERS):
+    registry.release(buffer_id)
+print(f'releasing {BUFFERS} documents: {(time.perf_counter() - start) * 1000:.2f}ms, {len(registry)} left')
@@ -0,0 +1,161 @@
+'''
+    Measures the file watcher on a generated tree of 100000 files in 1000
+    directories, the initial scan, a rescan without changes and a rescan
+    after 5000 files have been touched. Then lets a watcher thread see a
+    checkout changing, creating and deleting files next to 5000 of them and checks that it
+    ends up as a single notification, with the change notifications of the
+    system, inotify or ReadDirectoryChangesW, where available and with polling.
+    Finally keeps changing a file for longer than the maximum wait and checks
+    that the changes are sent meanwhile, and that an index without
+    subdirectories, as of a directory outside of any project, and an index
+    of at most max_files files don't go beyond that.
+    Run it with a regular python, not from the PythonScript console:
+        python bench_file_watcher.py [files]
+'''
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(HERE, '..', '..', 'helper', 'headless_npp'), os.path.join(HERE, '..', '..')]
+from lspclient.file_watcher import (FILE_INDEX, FILE_WATCHER, INOTIFY, DIRECTORY_CHANGES,  # noqa: E402
+                                   CREATED, CHANGED, DELETED)
+
+PER_DIRECTORY = 100
+CHECKOUT = 5000
+
+
+def create_tree(root, files):
+    for i in range(files):
+        directory = os.path.join(root, f'package_{i // PER_DIRECTORY // 10}', f'module_{i // PER_DIRECTORY}')
+        if i % PER_DIRECTORY == 0:
+            os.makedirs(directory)
+        with open(os.path.join(directory, f'file_{i}.py'), 'w') as f:
+            f.write('x = 1\n')
+
+
+def checkout(root, files, offset):
+    ''' changes, creates and deletes files like a checkout would, returns the expected changes '''
+    expected = {CREATED: 0, CHANGED: 0, DELETED: 0}
+    for i in range(offset, files, files // CHECKOUT):
+        path = os.path.join(root, f'package_{i // PER_DIRECTORY // 10}', f'module_{i // PER_DIRECTORY}', f'file_{i}.py')
+        if i % 3 == 0:
+            os.remove(path)
+            expected[DELETED] += 1
+        else:
+            with open(path, 'a') as f:
+                f.write('y = 2\n')
+            expected[CHANGED] += 1
+            if i % 3 == 1:
+                with open(path + '.new', 'w') as f:
+                    f.write('z = 3\n')
+                expected[CREATED] += 1
+    return expected
+
+
+def bench_index(root, files):
+    index = FILE_INDEX(root)
+    start = time.perf_counter()
+    index.scan()
+    print(f'initial scan of {len(index)} files: {(time.perf_counter() - start) * 1000:.0f}ms')
+    start = time.perf_counter()
+    changes = index.scan()
+    print(f'rescan without changes: {(time.perf_counter() - start) * 1000:.0f}ms, {len(changes)} changes')
+    for i in range(0, files, files // CHECKOUT):
+        path = os.path.join(root, f'package_{i // PER_DIRECTORY // 10}', f'module_{i // PER_DIRECTORY}', f'file_{i}.py')
+        os.utime(path, ns=(0, i))
+    start = time.perf_counter()
+    changes = index.scan()
+    print(f'rescan after touching {CHECKOUT} files: {(time.perf_counter() - start) * 1000:.0f}ms, '
+          f'{len(changes)} changes')
+
+
+def bench_watcher(root, files, notifications_of_system, offset):
+    notifications = []
+    watcher = FILE_WATCHER(root, lambda _root, changes: notifications.append(changes),
+                           interval=0.2, debounce=0.5, notifications=notifications_of_system)
+    watcher.start()
+    while not watcher.index.files:
+        time.sleep(0.01)
+    time.sleep(0.5)  # the initial scan and the inotify watches
+    start = time.perf_counter()
+    expected = checkout(root, files, offset)
+    while not notifications and time.perf_counter() - start < 60:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    time.sleep(1)
+    watcher.stop()
+    watcher.join()
+    got = {CREATED: 0, CHANGED: 0, DELETED: 0}
+    for batch in notifications:
+        for _path, change in batch:
+            got[change] += 1
+    print(f'{"notifications" if notifications_of_system else "polling"}: checkout of {sum(expected.values())} files reported after '
+          f'{elapsed * 1000:.0f}ms in {len(notifications)} notification(s), {watcher.scans} scans '
+          f'{watcher.scan_seconds / max(1, watcher.scans) * 1000:.1f}ms avg')
+    assert len(notifications) == 1, 'the checkout must be a single notification'
+    assert got == expected, f'expected {expected}, got {got}'
+
+
+def bench_max_wait(root):
+    ''' a file written every 0.1s never rests for the debounce '''
+    notifications = []
+    watcher = FILE_WATCHER(root, lambda _root, changes: notifications.append((time.perf_counter(), changes)),
+                           interval=0.2, debounce=0.5, max_wait=1.0)
+    watcher.start()
+    while not watcher.index.files:
+        time.sleep(0.01)
+    time.sleep(0.5)
+    path = os.path.join(root, 'log.txt')
+    start = time.perf_counter()
+    while time.perf_counter() - start < 3.5:
+        with open(path, 'a') as f:
+            f.write('line\n')
+        time.sleep(0.1)
+    watcher.stop()
+    watcher.join()
+    print(f'a file changing for 3.5s with a maximum wait of 1s: sent after '
+          f'{", ".join(f"{(sent - start) * 1000:.0f}ms" for sent, _changes in notifications)}')
+    assert len(notifications) >= 3, 'the changes must be sent once per maximum wait'
+
+
+def bench_limits(root):
+    shallow = FILE_INDEX(root, recursive=False)
+    shallow.scan()
+    assert set(shallow.files) == {''}, 'the subdirectories must not be scanned'
+    assert shallow.scan('package_0', recursive=False) == [] and set(shallow.files) == {''}
+    max_files = 1000
+    index = FILE_INDEX(root, max_files=max_files)
+    start = time.perf_counter()
+    index.scan()
+    print(f'index of at most {max_files} files: {len(index)} files in {len(index.files)} directories, '
+          f'{(time.perf_counter() - start) * 1000:.0f}ms')
+    assert max_files <= len(index) <= max_files + PER_DIRECTORY, len(index)
+    assert len(index) == sum(len(files) for files in index.files.values())
+    assert index.scan() == [], 'a full index must not report the files left out'
+
+
+def main(files=100000):
+    root = tempfile.mkdtemp()
+    try:
+        start = time.perf_counter()
+        create_tree(root, files)
+        print(f'created {files} files in {time.perf_counter() - start:.1f}s')
+        bench_index(root, files)
+        bench_watcher(root, files, notifications_of_system=False, offset=0)
+        notifier = DIRECTORY_CHANGES.create(root) if os.name == 'nt' else INOTIFY.create()
+        if notifier is not None:
+            notifier.close()
+            bench_watcher(root, files, notifications_of_system=True, offset=1)
+        else:
+            print('change notifications not available')
+        bench_max_wait(root)
+        bench_limits(root)
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
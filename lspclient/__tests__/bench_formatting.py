@@ -0,0 +1,48 @@
+'''
+    Compares whole document replacement with the minimal diff approach
+    used by the formatting handlers. Run it from the PythonScript console,
+    it opens a new tab with a 20k lines python document.
+'''
+import time
+from Npp import editor, notepad, console, LANGTYPE
+from lspclient.text_edits import apply_minimal_edits
+
+LINES = 20000
+
+console.show()
+notepad.new()
+notepad.setLangType(LANGTYPE.PYTHON)
+
+original = ''.join(f'def function_{i}(a,b):\n    return a+b\n' if i % 2 == 0 else f'x_{i} = {i}\n'
+                   for i in range(LINES))
+# a formatter typically touches only a few lines, e.g. every 100th line here
+formatted = ''.join(f'def function_{i}(a, b):\n    return a + b\n' if i % 200 == 0 else
+                    f'def function_{i}(a,b):\n    return a+b\n' if i % 2 == 0 else f'x_{i} = {i}\n'
+                    for i in range(LINES))
+whole_document_edit = [{'range': {'start': {'line': 0, 'character': 0},
+                                  'end': {'line': original.count('\n') + 1, 'character': 0}},
+                        'newText': formatted}]
+
+
+def measure(title, apply):
+    editor.setText(original)
+    editor.emptyUndoBuffer()
+    editor.colourise(0, -1)
+    start = time.perf_counter()
+    apply()
+    applied = time.perf_counter()
+    editor.colourise(editor.getEndStyled(), -1)
+    styled = time.perf_counter()
+    assert editor.getText() == formatted
+    print(f'{title:<20} apply: {applied - start:.4f}s  restyle: {styled - applied:.4f}s  total: {styled - start:.4f}s')
+
+
+def whole_document():
+    editor.beginUndoAction()
+    editor.setTargetRange(0, editor.getTextLength())
+    editor.replaceTarget(formatted)
+    editor.endUndoAction()
+
+
+measure('whole document', whole_document)
+measure('minimal diff', lambda: apply_minimal_edits(editor, whole_document_edit))
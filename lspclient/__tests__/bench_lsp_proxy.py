@@ -0,0 +1,135 @@
+'''
+    Compares the time until the initialize result arrives when each editor
+    starts its own server with the time through the lsp proxy, where only the
+    first client waits for the server. The fake server needs INDEX_SECONDS
+    to answer initialize, like a server indexing the project.
+    Also checks that request ids of two clients don't get mixed up and that
+    diagnostics carry the document versions of the client, and that a
+    connection without the token gets closed.
+    Run it with a regular python, not from the PythonScript console:
+        python bench_lsp_proxy.py
+'''
+import os
+import sys
+import time
+import socket
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lsp_proxy import read_message, encode_message  # noqa: E402
+
+INDEX_SECONDS = 1.0
+CLIENTS = 5
+PORT = 2189
+FAKE_SERVER = f'''
+import sys, time, json
+sys.path.insert(0, {os.path.dirname(os.path.dirname(os.path.abspath(__file__)))!r})
+from lsp_proxy import read_message, encode_message
+while True:
+    message = read_message(sys.stdin.buffer)
+    if message is None or message.get('method') == 'exit':
+        break
+    if message.get('method') == 'initialize':
+        time.sleep({INDEX_SECONDS})
+        result = {{'capabilities': {{'hoverProvider': True}}}}
+    elif 'id' in message:
+        result = {{'echo': message['id']}}
+    elif message['method'] in ('textDocument/didOpen', 'textDocument/didChange'):
+        document = message['params']['textDocument']
+        sys.stdout.buffer.write(encode_message({{'jsonrpc': '2.0', 'method': 'textDocument/publishDiagnostics',
+                                                'params': {{'uri': document['uri'], 'version': document['version'],
+                                                           'diagnostics': []}}}}))
+        sys.stdout.buffer.flush()
+        continue
+    else:
+        continue
+    sys.stdout.buffer.write(encode_message({{'jsonrpc': '2.0', 'id': message['id'], 'result': result}}))
+    sys.stdout.buffer.flush()
+'''
+
+
+def initialize(stream_out, write):
+    start = time.perf_counter()
+    write({'jsonrpc': '2.0', 'id': 1, 'method': 'initialize', 'params': {'rootUri': 'file:///project'}})
+    assert read_message(stream_out)['result']['capabilities']['hoverProvider']
+    return time.perf_counter() - start
+
+
+directory = tempfile.mkdtemp()
+server_script = os.path.join(directory, 'fake_server.py')
+with open(server_script, 'w') as f:
+    f.write(FAKE_SERVER)
+
+direct = []
+for _ in range(CLIENTS):
+    process = subprocess.Popen([sys.executable, server_script], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def write(message, process=process):
+        process.stdin.write(encode_message(message))
+        process.stdin.flush()
+    direct.append(initialize(process.stdout, write))
+    write({'jsonrpc': '2.0', 'method': 'exit'})
+    process.wait()
+
+token_file = os.path.join(directory, 'lsp_proxy.token')
+proxy = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                       'lsp_proxy.py'), '--port', str(PORT), '--idle-minutes', '1',
+                          '--token-file', token_file])
+time.sleep(0.5)
+with open(token_file) as f:
+    token = f.read()
+
+# any local process can connect, without the token it can't start a server
+connection = socket.create_connection(('127.0.0.1', PORT))
+connection.sendall(encode_message({'jsonrpc': '2.0', 'method': '$/proxy/connect',
+                                   'params': {'config': {'executable': sys.executable}, 'token': 'guessed'}}))
+assert read_message(connection.makefile('rb')) is None, 'the proxy must close the connection'
+connection.close()
+
+proxied = []
+connections = []
+for _ in range(CLIENTS):
+    connection = socket.create_connection(('127.0.0.1', PORT))
+    reader = connection.makefile('rb')
+
+    def write(message, connection=connection):
+        connection.sendall(encode_message(message))
+    write({'jsonrpc': '2.0', 'method': '$/proxy/connect',
+           'params': {'config': {'executable': sys.executable, 'args': [server_script]}, 'token': token}})
+    proxied.append(initialize(reader, write))
+    connections.append((connection, reader, write))
+
+# both clients use id 7, each must get its own response back
+for _connection, _reader, write in connections[:2]:
+    write({'jsonrpc': '2.0', 'id': 7, 'method': 'textDocument/hover', 'params': {}})
+responses = [read_message(reader) for _connection, reader, _write in connections[:2]]
+assert all(response['id'] == 7 for response in responses), responses
+assert responses[0]['result']['echo'] != responses[1]['result']['echo'], responses
+
+# the server numbers the versions itself, the clients see their own ones
+uri = 'file:///project/a.py'
+connections[0][2]({'jsonrpc': '2.0', 'method': 'textDocument/didOpen',
+                   'params': {'textDocument': {'uri': uri, 'languageId': 'python', 'version': 0, 'text': ''}}})
+connections[0][2]({'jsonrpc': '2.0', 'method': 'textDocument/didChange',
+                   'params': {'textDocument': {'uri': uri, 'version': 5}, 'contentChanges': [{'text': 'x'}]}})
+versions = [read_message(connections[0][1])['params'].get('version') for _ in range(2)]
+assert versions == [0, 5], versions
+connections[1][2]({'jsonrpc': '2.0', 'method': 'textDocument/didOpen',
+                   'params': {'textDocument': {'uri': uri, 'languageId': 'python', 'version': 3, 'text': 'y'}}})
+# the text of the second client replaced the one of the first client
+diagnostics = [read_message(reader)['params'] for _connection, reader, _write in connections[:2]]
+assert 'version' not in diagnostics[0] and diagnostics[1]['version'] == 3, diagnostics
+
+print(f'own server per editor: {sum(direct) / CLIENTS * 1000:.0f}ms per editor until initialized')
+print(f'through the proxy: first editor {proxied[0] * 1000:.0f}ms, '
+      f'others {sum(proxied[1:]) / (CLIENTS - 1) * 1000:.1f}ms until initialized')
+print(f'{sum(direct) - sum(proxied):.2f}s saved for {CLIENTS} editors')
+
+for connection, _reader, write in connections:
+    write({'jsonrpc': '2.0', 'method': 'exit'})
+    connection.close()
+proxy.kill()
+os.remove(server_script)
+os.remove(token_file)
+os.rmdir(directory)
@@ -0,0 +1,28 @@
+'''
+    Measures the overhead the latency metrics add per request/response
+'''
+import time
+from Npp import console
+from lspclient.metrics import LATENCY_METRICS
+
+MESSAGES = 100000
+METHODS = ['textDocument/completion', 'textDocument/hover', 'textDocument/definition']
+
+console.show()
+
+
+def run(metrics):
+    start = time.perf_counter_ns()
+    for request_id in range(MESSAGES):
+        metrics.request_sent(request_id, 'PYTHON', METHODS[request_id % 3])
+        now = time.perf_counter_ns()
+        metrics.response_decoded(request_id, now, now, now)
+        metrics.response_handled(request_id)
+    return (time.perf_counter_ns() - start) / MESSAGES / 1000
+
+
+disabled = run(LATENCY_METRICS(False))
+enabled_metrics = LATENCY_METRICS(True)
+enabled = run(enabled_metrics)
+print(f'per message: disabled {disabled:.2f}us  enabled {enabled:.2f}us')
+print(enabled_metrics.report())
@@ -0,0 +1,36 @@
+'''
+    Measures the position conversion time.
+    Run it from the PythonScript console, it opens a new tab with a 50k lines
+    document, every 10th line contains tabs and non ASCII characters,
+    and converts 100k random positions in both directions.
+'''
+import time
+import random
+from Npp import editor, notepad, console
+from lspclient.position_codec import POSITION_CODEC, UTF8, UTF16, UTF32
+
+LINES = 50000
+CONVERSIONS = 100000
+
+console.show()
+random.seed(0)
+notepad.new()
+editor.setText(''.join(f'\tvalue_{i} = "äöü €𝄞 {i}"\n' if i % 10 == 0 else f'value_{i} = function_{i}(parameter_{i})\n'
+                       for i in range(LINES)))
+positions = [random.randrange(editor.getTextLength()) for _ in range(CONVERSIONS)]
+positions = [editor.positionBefore(editor.positionAfter(position)) for position in positions]
+
+for encoding in (UTF16, UTF8, UTF32):
+    codec = POSITION_CODEC(encoding)
+    start = time.perf_counter()
+    lsp_positions = [codec.to_lsp(editor, position) for position in positions]
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    lsp_positions = [codec.to_lsp(editor, position) for position in positions]
+    warm = time.perf_counter() - start
+    start = time.perf_counter()
+    converted = [codec.from_lsp(editor, line, character) for line, character in lsp_positions]
+    back = time.perf_counter() - start
+    assert converted == positions, f'{encoding}: round trip failed'
+    print(f'{encoding}: {CONVERSIONS} to_lsp cold {cold:.3f}s  warm {warm:.3f}s  from_lsp {back:.3f}s  '
+          f'({len(codec.lines)} cached lines)')
@@ -0,0 +1,63 @@
+'''
+    Measures the digest of a file text and the lookup of cached semantic tokens
+    and folding ranges, more results are written than fit into the maximum size,
+    the least recently used ones must have been evicted.
+    Run it with a regular python, not from the PythonScript console:
+        python bench_result_cache.py
+'''
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from result_cache import RESULT_CACHE, content_digest  # noqa: E402
+
+FILES = 200
+TOKENS_PER_FILE = 5000
+LOOKUPS = 1000
+SERVER = 'PYTHON pyls.exe'
+
+directory = tempfile.mkdtemp()
+path = os.path.join(directory, 'results.sqlite')
+cache = RESULT_CACHE(path, max_megabytes=8)
+assert cache.enabled
+
+digests = []
+for n in range(FILES):
+    digest = content_digest(f'file {n}\n' * 1000)
+    digests.append(digest)
+    cache.put(SERVER, 'textDocument/semanticTokens/full', digest,
+              {'data': [random.randrange(100) for _ in range(TOKENS_PER_FILE * 5)]})
+    cache.put(SERVER, 'textDocument/foldingRange', digest,
+              [{'startLine': line, 'endLine': line + 10} for line in range(0, 1000, 20)])
+cache.close()
+print(f'{cache.writes} results written, {cache.evicted} evicted')
+assert cache.evicted > 0
+connection = sqlite3.connect(path)
+stored = connection.execute('SELECT SUM(size) FROM results').fetchone()[0]
+connection.close()
+assert stored <= 8 * 1048576, stored
+
+cache = RESULT_CACHE(path, max_megabytes=8)
+start = time.perf_counter()
+text = 'x = 1\n' * 20000
+for _ in range(100):
+    content_digest(text)
+digest_ms = (time.perf_counter() - start) / 100 * 1000
+for _ in range(LOOKUPS):
+    digest = random.choice(digests)
+    cache.get(SERVER, 'textDocument/semanticTokens/full', digest)
+    cache.get(SERVER, 'textDocument/foldingRange', digest)
+print(cache.report())
+print(f'digest of a 20000 line file: {digest_ms:.2f}ms')
+cache.close()
+
+size = os.path.getsize(path)
+print(f'database size {size / 1048576:.1f}MB, {stored / 1048576:.1f}MB of results')
+assert cache.hits > 0
+for name in os.listdir(directory):
+    os.remove(os.path.join(directory, name))
+os.rmdir(directory)
@@ -0,0 +1,62 @@
+'''
+    Populates the results panel with 100k references spread over 200 files
+    and scrolls through all of them page by page, then sorts and filters them.
+    Measures how long the panel needs until the rows are shown, how many cells
+    the owner data list view requests and how many files get read for previews.
+    Run it from the PythonScript console.
+'''
+import os
+import time
+import tempfile
+from Npp import console
+from WinDialog.win_helper import UpdateWindow
+from lspclient.results_panel import RESULTS_PANEL, FILE_COLUMN, LINE_COLUMN
+from lspclient.document_state import path_to_uri
+
+ROWS = 100000
+FILES = 200
+LINES = 1000
+
+console.show()
+directory = tempfile.mkdtemp()
+paths = []
+for i in range(FILES):
+    path = os.path.join(directory, f'module_{i}.py')
+    with open(path, 'w') as f:
+        f.write(''.join(f'value_{line} = function_{line}(parameter_{line})\n' for line in range(LINES)))
+    paths.append(path)
+rows = [(path_to_uri(paths[i % FILES]), paths[i % FILES], (i * 7) % LINES, 0, None) for i in range(ROWS)]
+
+panel = RESULTS_PANEL(lambda row: None)
+start = time.perf_counter()
+panel.show('Benchmark', rows, 'references')
+while panel.dialog is None or not panel.dialog.hwnd:
+    time.sleep(0.001)
+listview = panel.dialog.listview
+UpdateWindow(panel.dialog.hwnd)
+print(f'{ROWS} rows shown after {(time.perf_counter() - start) * 1000:.1f}ms, {panel.report()}')
+
+panel.reset()
+per_page = listview.getCountPerPage()
+start = time.perf_counter()
+for index in range(0, ROWS, per_page):
+    listview.ensureVisible(min(index + per_page, ROWS) - 1, False)
+    UpdateWindow(listview.hwnd)
+scroll_time = time.perf_counter() - start
+print(f'scrolled through {ROWS // per_page} pages in {scroll_time * 1000:.1f}ms '
+      f'({scroll_time / (ROWS // per_page) * 1000:.3f}ms per page), {panel.report()}')
+
+for column in (FILE_COLUMN, LINE_COLUMN, LINE_COLUMN):
+    start = time.perf_counter()
+    panel._on_column_click(type('NMLISTVIEW', (), {'iSubItem': column}))
+    print(f'sort by column {column}: {(time.perf_counter() - start) * 1000:.1f}ms')
+
+start = time.perf_counter()
+panel.model.filter('module_1')
+panel._refresh(listview)
+print(f'filter: {len(panel.model)} rows left after {(time.perf_counter() - start) * 1000:.1f}ms')
+
+panel.close()
+for path in paths:
+    os.remove(path)
+os.rmdir(directory)
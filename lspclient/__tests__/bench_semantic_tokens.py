@@ -0,0 +1,83 @@
+'''
+    Measures the semantic token paint time per scroll step.
+    Run it from the PythonScript console, it opens a new tab
+    with a 50k lines document and 150k tokens.
+    Then checks that of two delta responses computed against the same
+    resultId only the first gets applied.
+'''
+import time
+from Npp import editor, notepad, console
+from lspclient.semantic_tokens import SEMANTIC_TOKENS, setup_indicator, legend_colors
+from lspclient.position_codec import POSITION_CODEC
+
+LINES = 50000
+SCROLL_STEPS = 100
+LINES_PER_STEP = 3
+
+console.show()
+notepad.new()
+editor.setText(''.join(f'value_{i} = function_{i}(parameter_{i})\n' for i in range(LINES)))
+setup_indicator()
+
+legend = {'tokenTypes': ['variable', 'function', 'parameter'], 'tokenModifiers': []}
+colors = legend_colors(legend)
+codec = POSITION_CODEC()
+data = []
+for i in range(LINES):
+    data.extend((1 if i else 0, 0, len(f'value_{i}'), 0, 0))
+    data.extend((0, len(f'value_{i} = '), len(f'function_{i}'), 1, 0))
+    data.extend((0, len(f'function_{i}('), len(f'parameter_{i}'), 2, 0))
+
+start = time.perf_counter()
+tokens = SEMANTIC_TOKENS()
+tokens.set_full({'data': data, 'resultId': '1'}, 0)
+print(f'decoding {len(tokens.full)} tokens took {time.perf_counter() - start:.4f}s')
+
+
+def visible_lines():
+    first = editor.docLineFromVisible(editor.getFirstVisibleLine())
+    return first, editor.docLineFromVisible(editor.getFirstVisibleLine() + editor.linesOnScreen())
+
+
+editor.gotoLine(0)
+start = time.perf_counter()
+tokens.paint(editor, 0, *visible_lines(), colors, codec)
+print(f'initial paint took {(time.perf_counter() - start) * 1000:.2f}ms')
+
+timings = []
+for _ in range(SCROLL_STEPS):
+    editor.lineScroll(0, LINES_PER_STEP)
+    start = time.perf_counter()
+    tokens.paint(editor, 0, *visible_lines(), colors, codec)
+    timings.append((time.perf_counter() - start) * 1000)
+timings.sort()
+print(f'incremental paint per scroll step of {LINES_PER_STEP} lines: '
+      f'median {timings[len(timings) // 2]:.3f}ms  max {timings[-1]:.3f}ms')
+
+tokens.invalidate_paint()
+timings = []
+for _ in range(SCROLL_STEPS):
+    editor.lineScroll(0, LINES_PER_STEP)
+    start = time.perf_counter()
+    tokens.paint(editor, 0, *visible_lines(), colors, codec)
+    tokens.invalidate_paint()
+    timings.append((time.perf_counter() - start) * 1000)
+timings.sort()
+print(f'full visible area paint per scroll step: median {timings[len(timings) // 2]:.3f}ms  max {timings[-1]:.3f}ms')
+
+# two deltas based on resultId 1, e.g. requested before the first response arrived
+deltas = SEMANTIC_TOKENS()
+deltas.set_full({'data': [0, 0, 5, 0, 0, 1, 0, 8, 1, 0], 'resultId': '1'}, 0)
+deltas.request_sent(1)
+assert deltas.pending and deltas.pending_result_id == '1'
+first = {'resultId': '2', 'edits': [{'start': 5, 'deleteCount': 0, 'data': [1, 0, 3, 2, 0]}]}
+second = {'resultId': '3', 'edits': [{'start': 5, 'deleteCount': 5, 'data': [2, 0, 4, 1, 0]}]}
+assert deltas.apply_response(first, 1, '1')
+assert not deltas.pending
+assert not deltas.apply_response(second, 2, '1'), 'a delta against a replaced resultId must be dropped'
+assert list(deltas.data) == [0, 0, 5, 0, 0, 1, 0, 3, 2, 0, 1, 0, 8, 1, 0] and deltas.result_id == '2'
+assert not deltas.apply_response({'resultId': '0', 'data': []}, 0, None), 'an older version must be dropped'
+deltas.request_sent(3)
+deltas.request_ended()
+assert not deltas.pending
+print('overlapping deltas: the second one got dropped')
@@ -0,0 +1,56 @@
+'''
+    Counts the getText calls and copied characters for typing "print(" into a
+    20k lines document, the way on_char_added, on_modified and the debounced
+    didChange fetched the text before and with the snapshot service.
+    Run it from the PythonScript console.
+'''
+import time
+from Npp import editor, notepad, console
+from lspclient.snapshot import TEXT_SNAPSHOTS
+from lspclient.document_state import DOCUMENT_STATE
+
+LINES = 20000
+TYPED = 'print('
+
+
+class COUNTING_EDITOR:
+    def __init__(self, _editor):
+        self._editor = _editor
+        self.calls = 0
+        self.chars = 0
+
+    def getText(self):
+        text = self._editor.getText()
+        self.calls += 1
+        self.chars += len(text)
+        return text
+
+
+console.show()
+notepad.new()
+editor.setText(''.join(f'value_{i} = function_{i}(parameter_{i})\n' for i in range(LINES)))
+
+counting_editor = COUNTING_EDITOR(editor)
+start = time.perf_counter()
+for char in TYPED:
+    editor.addText(char)
+    if char == '(':
+        counting_editor.getText()  # didChange before signatureHelp
+        counting_editor.getText()  # text argument of signatureHelp
+counting_editor.getText()  # debounced didChange
+print(f'before: {counting_editor.calls} getText calls, {counting_editor.chars} characters copied, '
+      f'{(time.perf_counter() - start) * 1000:.2f}ms')
+
+editor.setText(''.join(f'value_{i} = function_{i}(parameter_{i})\n' for i in range(LINES)))
+counting_editor = COUNTING_EDITOR(editor)
+snapshots = TEXT_SNAPSHOTS()
+document = DOCUMENT_STATE(notepad.getCurrentBufferID(), 'C:\\bench.py', 'python')
+start = time.perf_counter()
+for char in TYPED:
+    editor.addText(char)
+    snapshots.invalidate(document)  # on_modified
+    if char == '(':
+        snapshots.text(counting_editor, document)  # didChange before signatureHelp
+snapshots.text(counting_editor, document)  # debounced didChange, unchanged text is not sent again
+print(f'after: {counting_editor.calls} getText calls, {counting_editor.chars} characters copied, '
+      f'{(time.perf_counter() - start) * 1000:.2f}ms')
@@ -0,0 +1,48 @@
+'''
+    Measures the selection of the documents to suspend with 300 open tabs
+    of two languages, which runs on every activation, after typing pauses and
+    every minute. Then selects again with the cpp documents spread over two
+    projects, each with a server instance of its own and max_open documents.
+    Run it from the PythonScript console.
+'''
+import time
+from Npp import console
+from lspclient.suspension import DOCUMENT_SUSPENSION
+from lspclient.document_state import DOCUMENT_REGISTRY
+
+DOCUMENTS = 300
+ROUNDS = 1000
+
+console.show()
+documents = DOCUMENT_REGISTRY()
+suspension = DOCUMENT_SUSPENSION(idle_minutes=30, max_open=50)
+now = time.monotonic()
+for i in range(DOCUMENTS):
+    document = documents.get(i, f'C:\\project\\file_{i}.{"cpp" if i % 3 else "py"}', 'cpp' if i % 3 else 'python')
+    document.is_open = True
+    # a third of the documents hasn't been activated for an hour
+    document.last_activated = now - (3600 if i % 3 == 0 else i)
+current = documents.lookup(DOCUMENTS - 1)
+
+start = time.perf_counter()
+for _ in range(ROUNDS):
+    suspend = suspension.candidates(documents, current)
+elapsed = time.perf_counter() - start
+print(f'{len(suspend)} of {DOCUMENTS} documents to suspend, '
+      f'{elapsed / ROUNDS * 1000:.3f}ms per selection')
+for document in suspend:
+    document.is_open = False
+print(f'{sum(document.is_open for document in documents)} documents left open, '
+      f'next selection: {len(suspension.candidates(documents, current))} documents')
+
+for document in documents:
+    document.is_open = True
+# the cpp files of the first and the second half belong to projects of their own
+instances = {document: f'cpp@{document.buffer_id < DOCUMENTS // 2}' if document.language_id == 'cpp' else 'python'
+             for document in documents}
+suspend = suspension.candidates(documents, current, lambda document: (instances[document],))
+left = dict()
+for document in documents:
+    if document not in suspend:
+        left[instances[document]] = left.get(instances[document], 0) + 1
+print(f'per server instance: {len(suspend)} documents to suspend, left open {left}')
@@ -0,0 +1,36 @@
+'''
+    Measures the go to symbol lookup latency with 100k indexed symbols
+'''
+import time
+import random
+from Npp import console
+from lspclient.symbol_index import SYMBOL_INDEX
+
+DOCUMENTS = 100
+SYMBOLS_PER_DOCUMENT = 1000
+QUERIES = ['get', 'gtdsym', 'update_handler', 'rqsthndlr999', 'zzz', 'q']
+
+console.show()
+random.seed(0)
+words = ['get', 'set', 'update', 'handler', 'response', 'request', 'document', 'symbol',
+         'index', 'format', 'range', 'token', 'client', 'server', 'message']
+
+index = SYMBOL_INDEX()
+for document in range(DOCUMENTS):
+    uri = f'file:///C:/project/file_{document}.py'
+    index.update(uri, 1, [{'name': '_'.join(random.sample(words, 3)) + str(i),
+                           'kind': 12,
+                           'location': {'uri': uri,
+                                        'range': {'start': {'line': i, 'character': 0},
+                                                  'end': {'line': i, 'character': 10}}}}
+                          for i in range(SYMBOLS_PER_DOCUMENT)])
+
+start = time.perf_counter()
+index.find('x')
+print(f'building the lookup structures for {len(index)} symbols took {time.perf_counter() - start:.3f}s')
+
+for query in QUERIES:
+    start = time.perf_counter()
+    for _ in range(100):
+        found = index.find(query)
+    print(f'{query:<16} {len(found):>3} found  {(time.perf_counter() - start) * 10:.3f}ms per lookup')
@@ -0,0 +1,48 @@
+'''
+    Measures the queueing overhead of the ui dispatcher and the effect of coalescing.
+    1000 batches, each with 20 hover results, 20 diagnostics for 5 documents,
+    10 progress notifications and 5 results for an outdated document version.
+    Run it from the PythonScript console.
+'''
+import time
+from Npp import console
+from lspclient.ui_dispatcher import UI_DISPATCHER
+from lspclient.metrics import LATENCY_METRICS
+from lspclient.document_state import DOCUMENT_STATE
+
+BATCHES = 1000
+
+console.show()
+metrics = LATENCY_METRICS(True)
+dispatcher = UI_DISPATCHER(metrics)
+document = DOCUMENT_STATE(1, 'C:\\bench.py', 'python')
+calls = [0]
+
+
+def handler():
+    calls[0] += 1
+
+
+posted = 0
+post_time = 0
+drain_time = 0
+for batch in range(BATCHES):
+    start = time.perf_counter()
+    for _ in range(20):
+        dispatcher.post(handler, 'hover', document, document.version)
+    for i in range(20):
+        dispatcher.post(handler, ('diagnostics', i % 5))
+    for _ in range(10):
+        dispatcher.post(handler, 'progress')
+    for _ in range(5):
+        dispatcher.post(handler, None, document, document.version - 1)
+    posted += 55
+    post_time += time.perf_counter() - start
+    start = time.perf_counter()
+    dispatcher.drain()
+    drain_time += time.perf_counter() - start
+dispatcher.stop()
+
+print(f'{posted} results posted, {calls[0]} handlers run')
+print(f'post {post_time / posted * 1000000:.2f}us per result, drain {drain_time / BATCHES * 1000:.3f}ms per batch')
+print(metrics.report())
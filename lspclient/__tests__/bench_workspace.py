@@ -0,0 +1,56 @@
+'''
+    Measures the root lookup of 10000 files in 20 projects, without and with
+    the per directory cache, the file system checks are counted instead of
+    being made. Then assigns the roots to a server without workspace folder
+    support and checks that at most max_instances instances are kept.
+    Also checks that the root of a file outside of any project doesn't
+    depend on the files looked up before and isn't taken for a project.
+    Run it from the PythonScript console.
+'''
+import time
+from Npp import console
+from lspclient.workspace import ROOT_FINDER, WORKSPACE_POOL
+
+PROJECTS = 20
+FILES = 10000
+checks = []
+
+
+def exists(path):
+    checks.append(path)
+    return path.endswith('\\.git') and path.count('\\') == 3
+
+
+console.show()
+paths = [f'C:\\work\\project_{i % PROJECTS}\\src\\package_{i % 7}\\module_{i}.py' for i in range(FILES)]
+
+start = time.perf_counter()
+for path in paths:
+    ROOT_FINDER(exists=exists).root_of(path)
+uncached = time.perf_counter() - start
+uncached_checks = len(checks)
+
+checks.clear()
+finder = ROOT_FINDER(exists=exists)
+start = time.perf_counter()
+roots = [finder.root_of(path) for path in paths]
+cached = time.perf_counter() - start
+print(f'{len(set(roots))} roots of {FILES} files, uncached {uncached / FILES * 1000:.4f}ms '
+      f'({uncached_checks} checks), cached {cached / FILES * 1000:.4f}ms ({len(checks)} checks)')
+assert all(finder.is_project(root) for root in set(roots))
+
+# outside of any project each directory is its own root, whatever was looked up first
+finder = ROOT_FINDER(exists=lambda path: False)
+finder.root_of('C:\\a\\b\\c\\x.py')
+assert finder.root_of('C:\\a\\b\\c\\d\\z.py') == 'C:\\a\\b\\c\\d'
+assert finder.root_of('C:\\a\\y.py') == 'C:\\a'
+assert not finder.is_project('C:\\a\\b\\c\\d')
+
+pool = WORKSPACE_POOL(max_instances=4)
+stopped = []
+for root in roots[:200]:
+    instance, _added = pool.assign('PYTHON', root, multi_root=False)
+    stopped.extend(pool.evict('PYTHON', instance))
+running = set(pool.assigned.values())
+assert len(running) <= 4, running
+print(f'{len(running)} instances running, {len(stopped)} stopped while switching between {PROJECTS} projects')
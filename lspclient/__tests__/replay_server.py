@@ -0,0 +1,118 @@
+'''
+    Fake language server for replay_session.py, answers from a recorded session
+
+    The messages a server sent in the recording are attached to the client
+    message they followed, responses to their request. A client message is
+    matched with the recorded one of the same method and occurrence, e.g. the
+    third textDocument/hover, its responses and the notifications which
+    followed it are sent after the recorded delay divided by speed, 0 means
+    at once. A request which wasn't recorded gets a null result and is
+    reported on stderr.
+        python replay_server.py recording server speed
+'''
+import os
+import sys
+import time
+import heapq
+import threading
+
+sys.path[:0] = [os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'helper', 'headless_npp'),
+                os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+from lsp_proxy import read_message, encode_message  # noqa: E402
+from session_recorder import read_recording  # noqa: E402
+
+
+def build_script(events, server):
+    '''
+        Returns {(method, occurrence): [(delay, message, is_response)]} of the messages server sent
+        after each client message, messages sent before the first one are keyed by None
+    '''
+    script = {None: []}
+    occurrences = dict()
+    pending = dict()  # recorded request id -> (key, time)
+    last_key, last_time = None, 0
+    for seconds, kind, source, message in events:
+        if source != server or kind == 'editor':
+            continue
+        if kind == 'send':
+            method = message.get('method')
+            if method is None:
+                continue  # the answer to a request of the server
+            occurrences[method] = occurrences.get(method, 0) + 1
+            last_key, last_time = (method, occurrences[method]), seconds
+            script.setdefault(last_key, [])
+            if 'id' in message:
+                pending[message['id']] = (last_key, seconds)
+        elif 'method' not in message and message.get('id') in pending:
+            key, sent = pending.pop(message['id'])
+            script[key].append((seconds - sent, message, True))
+        else:
+            script[last_key].append((seconds - last_time, message, False))
+    return script
+
+
+class FAKE_SERVER:
+    def __init__(self, script, speed):
+        self.script = script
+        self.speed = speed
+        self.occurrences = dict()
+        self.queue = []  # (due, sequence, message)
+        self.sequence = 0
+        self.condition = threading.Condition()
+        self.unexpected = 0
+        threading.Thread(target=self._write, daemon=True).start()
+
+
+    def _schedule(self, delay, message):
+        with self.condition:
+            self.sequence += 1
+            due = time.perf_counter() + (delay / self.speed if self.speed else 0)
+            heapq.heappush(self.queue, (due, self.sequence, message))
+            self.condition.notify()
+
+
+    def _write(self):
+        while True:
+            with self.condition:
+                while not self.queue or self.queue[0][0] > time.perf_counter():
+                    self.condition.wait(max(0, self.queue[0][0] - time.perf_counter()) if self.queue else None)
+                _due, _sequence, message = heapq.heappop(self.queue)
+            sys.stdout.buffer.write(encode_message(message))
+            sys.stdout.buffer.flush()
+
+
+    def on_client_message(self, message):
+        method = message.get('method')
+        if method is None:
+            return
+        self.occurrences[method] = self.occurrences.get(method, 0) + 1
+        replies = self.script.get((method, self.occurrences[method]))
+        if replies is None:
+            if method == 'shutdown':
+                # sent by the shutdown coordinator, not recorded
+                self._schedule(0, {'jsonrpc': '2.0', 'id': message['id'], 'result': None})
+            elif 'id' in message:
+                self.unexpected += 1
+                sys.stderr.write(f'unexpected request {method} #{self.occurrences[method]}\n')
+                self._schedule(0, {'jsonrpc': '2.0', 'id': message['id'], 'result': None})
+            return
+        for delay, reply, is_response in replies:
+            self._schedule(delay, dict(reply, id=message['id']) if is_response else reply)
+
+
+def main(path, server, speed):
+    _header, events = read_recording(path)
+    script = build_script(events, server)
+    fake = FAKE_SERVER(script, float(speed))
+    for delay, message, _is_response in script[None]:
+        fake._schedule(delay, message)
+    while True:
+        message = read_message(sys.stdin.buffer)
+        if message is None or message.get('method') == 'exit':
+            break
+        fake.on_client_message(message)
+    return 1 if fake.unexpected else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*sys.argv[1:4]))
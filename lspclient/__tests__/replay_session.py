@@ -0,0 +1,202 @@
+'''
+    Replays a session recorded with the "record_session" option
+
+    Runs LSPCLIENT outside of notepad++, with the headless Npp of
+    helper/headless_npp, and a replay_server.py per recorded server which
+    answers from the recording. The editor notifications are replayed at the
+    recorded times divided by speed, 0 replays as fast as possible.
+    With speed 0 the next notification waits until the client got the
+    responses it is waiting for, debounced requests may be merged or dropped
+    then, so compare the sent messages at speed 1.
+    The replayed session gets recorded too, the requests and notifications the
+    client sent must be the same as in the recording, with --strict also
+    their params. So must the calls which changed what the user sees, fold
+    levels, indicators, annotations, calltips, lists and the status bar,
+    with their arguments. Reports the time the client spent in the notification
+    handlers, which is time the gui thread is blocked, the editor and notepad
+    calls made during the replay and the request latencies.
+    Run it with a regular python, not from the PythonScript console:
+        python replay_session.py session.jsonl.gz --speed 0
+'''
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(HERE, '..', '..', 'helper', 'headless_npp'), os.path.join(HERE, '..', '..')]
+from Npp import editor, notepad, ui_log, call_report, NOTIFICATION, SCINTILLANOTIFICATION, MODIFICATIONFLAGS  # noqa: E402
+from lspclient.client import LSPCLIENT  # noqa: E402
+from lspclient.session_recorder import read_recording  # noqa: E402
+
+# seconds to wait for outstanding responses after the last notification
+SETTLE_SECONDS = 2
+NOTEPAD_NOTIFICATIONS = {
+    'filesaved': NOTIFICATION.FILESAVED,
+    'fileclosed': NOTIFICATION.FILECLOSED,
+    'filebeforesave': NOTIFICATION.FILEBEFORESAVE,
+}
+EDITOR_NOTIFICATIONS = {
+    'charadded': SCINTILLANOTIFICATION.CHARADDED,
+    'dwellstart': SCINTILLANOTIFICATION.DWELLSTART,
+    'dwellend': SCINTILLANOTIFICATION.DWELLEND,
+    'userlistselection': SCINTILLANOTIFICATION.USERLISTSELECTION,
+    # the insertion of the entry follows as recorded modification
+    'autocselection': SCINTILLANOTIFICATION.AUTOCSELECTION,
+}
+
+
+class REPLAYER:
+    def __init__(self, path, speed):
+        self.path = path
+        self.speed = speed
+        self.header, self.events = read_recording(path)
+        self.buffer_ids = dict()  # recorded buffer id -> headless buffer id
+        self.handler_time = dict()  # notification -> [count, seconds, max seconds]
+        self.replayed_path = os.path.join(tempfile.mkdtemp(), 'replayed.jsonl.gz')
+        configs = {server: dict(config, pipe='io', executable=sys.executable,
+                                args=[os.path.join(HERE, 'replay_server.py'), path, server, str(speed)])
+                   for server, config in self.header['servers'].items()}
+        # the cache and the proxy would answer instead of the recorded servers
+        options = dict(self.header['options'], metrics=True, record_session=self.replayed_path,
+                       result_cache=False, proxy=None)
+        self.client = LSPCLIENT(configs, options)
+
+
+    def _restore_view(self, args):
+        # without notifications, scintilla already was in that state when the notification got recorded
+        editor.document.caret = args['caret']
+        editor.document.anchor = args['caret']
+        editor.document.first_line = args['first_line']
+
+
+    def _busy(self):
+        ''' True while the client waits for responses or has ui updates pending '''
+        return bool(self.client.open_results or self.client.ui.pending
+                    or self.client.com_manager.waiting_for_initialize_result)
+
+
+    def replay(self, notification, args):
+        if notification == 'bufferactivated':
+            self.buffer_ids[args['bufferID']] = notepad.open_document(args['path'], args['text'],
+                                                                      args['lang_type'], args['language'])
+            self._restore_view(args)
+        elif notification == 'modified':
+            if args['modificationType'] & MODIFICATIONFLAGS.INSERTTEXT:
+                editor.insertText(args['position'], args['text'])
+            elif args['modificationType'] & MODIFICATIONFLAGS.DELETETEXT:
+                editor.deleteRange(args['position'], args['length'])
+        elif notification == 'updateui':
+            self._restore_view(args)
+            editor.notify(SCINTILLANOTIFICATION.UPDATEUI, {'updated': args['updated']})
+        elif notification in NOTEPAD_NOTIFICATIONS:
+            notepad.notify(NOTEPAD_NOTIFICATIONS[notification],
+                           {'bufferID': self.buffer_ids.get(args['bufferID'], args['bufferID'])})
+        elif notification == 'autocselectionchange':
+            # notifies like scintilla once the entry is highlighted
+            editor.autoCSelect(args['text'])
+        elif notification in EDITOR_NOTIFICATIONS:
+            self._restore_view(args)
+            editor.notify(EDITOR_NOTIFICATIONS[notification],
+                          {k: v for k, v in args.items() if k not in ('caret', 'first_line')})
+
+
+    def run(self):
+        ''' returns the seconds the replay took '''
+        start = time.perf_counter()
+        for seconds, kind, notification, args in self.events:
+            if kind != 'editor':
+                continue
+            if self.speed:
+                due = start + seconds / self.speed
+            else:
+                due = time.perf_counter() + SETTLE_SECONDS
+            while time.perf_counter() < due and (self.speed or self._busy()):
+                self.client.ui.drain()
+                time.sleep(min(0.002, max(0, due - time.perf_counter())))
+            handler_start = time.perf_counter()
+            self.replay(notification, args)
+            elapsed = time.perf_counter() - handler_start
+            entry = self.handler_time.setdefault(notification, [0, 0, 0])
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+            self.client.ui.drain()
+        settle_end = time.perf_counter() + SETTLE_SECONDS
+        while time.perf_counter() < settle_end and self._busy():
+            self.client.ui.drain()
+            time.sleep(0.002)
+        return time.perf_counter() - start
+
+
+def sent_messages(events, strict):
+    ''' returns {server: [method or (method, params)]} of the requests and notifications the client sent '''
+    messages = dict()
+    for _seconds, kind, server, message in events:
+        if kind == 'send' and 'method' in message:
+            params = message.get('params')
+            if message['method'] == 'initialize':
+                params = dict(params, processId=None)  # differs per run
+            messages.setdefault(server, []).append((message['method'], params) if strict else message['method'])
+    return messages
+
+
+def shown_calls(events):
+    ''' returns {function: [args]} of the calls which changed what the user sees '''
+    calls = dict()
+    for _seconds, kind, function, args in events:
+        if kind == 'ui':
+            calls.setdefault(function, []).append(args)
+    return calls
+
+
+def compare(recorded, replayed, what='messages'):
+    ''' returns a list of differences, empty if the client sent the same messages or made the same calls '''
+    differences = []
+    for key in sorted(set(recorded) | set(replayed)):
+        expected, actual = recorded.get(key, []), replayed.get(key, [])
+        for index, (_expected, _actual) in enumerate(zip(expected, actual)):
+            if _expected != _actual:
+                differences.append(f'{key} {what[:-1]} {index}: expected {_expected}, got {_actual}')
+                break
+        if len(expected) != len(actual):
+            differences.append(f'{key}: {len(expected)} {what} recorded, {len(actual)} replayed')
+    return differences
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='replays a recorded lsp session')
+    parser.add_argument('recording')
+    parser.add_argument('--speed', type=float, default=1, help='1 is real time, 0 as fast as possible')
+    parser.add_argument('--strict', action='store_true', help='compare the params of the messages too')
+    args = parser.parse_args(argv)
+
+    replayer = REPLAYER(args.recording, args.speed)
+    duration = replayer.run()
+    replayer.client.terminate()
+    recorded_duration = replayer.events[-1][0] if replayer.events else 0
+
+    print(f'recorded {recorded_duration:.2f}s, replayed in {duration:.2f}s at speed {args.speed:g}')
+    print('time spent in the notification handlers:')
+    for notification, (count, seconds, longest) in sorted(replayer.handler_time.items()):
+        print(f'    {notification:<18} {count:6d} calls {seconds * 1000:9.1f}ms total {longest * 1000:8.2f}ms max')
+    shown = dict()
+    for function, _args in ui_log:
+        shown[function] = shown.get(function, 0) + 1
+    print(f'shown: {shown}')
+    print('editor and notepad calls:')
+    print(call_report())
+    print(replayer.client.metrics.report())
+
+    _header, replayed_events = read_recording(replayer.replayed_path)
+    differences = compare(sent_messages(replayer.events, args.strict), sent_messages(replayed_events, args.strict))
+    differences += compare(shown_calls(replayer.events), shown_calls(replayed_events), 'calls')
+    for difference in differences:
+        print(difference)
+    print('replay matches the recording' if not differences else f'{len(differences)} differences')
+    return 1 if differences else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+'''
+    Runs every bench of the lspclient and the headless bench of the helper
+    scripts with the headless Npp of helper/headless_npp, each one in a
+    python process of its own, and reports those which failed with the end
+    of their output. The benches written for the PythonScript console import
+    Npp and lspclient without setting up sys.path, the headless Npp and the
+    repository are put on the PYTHONPATH for them.
+    Run it with a regular python, not from the PythonScript console:
+        python run_benches.py [name ...]
+'''
+import os
+import sys
+import glob
+import time
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.normpath(os.path.join(HERE, '..', '..'))
+HEADLESS_NPP = os.path.join(REPO, 'helper', 'headless_npp')
+# seconds a single bench may take, the file watcher and the proxy ones wait for real timers
+TIMEOUT = 600
+# lines of output shown of a failed bench
+TAIL_LINES = 15
+
+
+def benches():
+    return sorted(glob.glob(os.path.join(HERE, 'bench_*.py'))) + [os.path.join(HEADLESS_NPP, 'bench_scripts.py')]
+
+
+def run(path):
+    ''' returns (returncode, output, seconds), returncode is None if the bench timed out '''
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [HEADLESS_NPP, REPO, os.environ.get('PYTHONPATH')])))
+    start = time.perf_counter()
+    try:
+        process = subprocess.run([sys.executable, path], cwd=os.path.dirname(path), env=env, timeout=TIMEOUT,
+                                 stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    except subprocess.TimeoutExpired as e:
+        return None, e.output or b'', time.perf_counter() - start
+    return process.returncode, process.stdout, time.perf_counter() - start
+
+
+def main(argv=None):
+    names = sys.argv[1:] if argv is None else argv
+    failed = []
+    for path in benches():
+        name = os.path.splitext(os.path.basename(path))[0]
+        if names and name not in names:
+            continue
+        returncode, output, seconds = run(path)
+        if returncode == 0:
+            print(f'{name:<28} ok      {seconds:7.1f}s')
+            continue
+        print(f'{name:<28} {"timeout" if returncode is None else "failed":<7} {seconds:7.1f}s')
+        for line in output.decode('utf-8', 'replace').splitlines()[-TAIL_LINES:]:
+            print(f'    {line}')
+        failed.append(name)
+    print(f'{len(failed)} benches failed: {", ".join(failed)}' if failed else 'all benches ran')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+'''
+    Capabilities of the running servers
+
+    Holds the capabilities of the initialize result and the ones registered
+    later via client/registerCapability. A registration overrides the static
+    capability of the same feature until it gets unregistered.
+    Reading works like a dict of dicts, capabilities['PYTHON'].get('hoverProvider').
+
+    Features are named after their capability without the Provider suffix,
+    e.g. completion or documentFormatting, the "features" of a server config
+    use these names, plus diagnostics.
+'''
+import logging
+log = logging.info
+
+# registration method -> key of the server capability it corresponds to
+REGISTRATION_CAPABILITIES = {
+    'textDocument/completion': 'completionProvider',
+    'textDocument/hover': 'hoverProvider',
+    'textDocument/signatureHelp': 'signatureHelpProvider',
+    'textDocument/declaration': 'declarationProvider',
+    'textDocument/definition': 'definitionProvider',
+    'textDocument/typeDefinition': 'typeDefinitionProvider',
+    'textDocument/implementation': 'implementationProvider',
+    'textDocument/references': 'referencesProvider',
+    'textDocument/documentHighlight': 'documentHighlightProvider',
+    'textDocument/documentSymbol': 'documentSymbolProvider',
+    'textDocument/codeAction': 'codeActionProvider',
+    'textDocument/codeLens': 'codeLensProvider',
+    'textDocument/documentLink': 'documentLinkProvider',
+    'textDocument/formatting': 'documentFormattingProvider',
+    'textDocument/rangeFormatting': 'documentRangeFormattingProvider',
+    'textDocument/onTypeFormatting': 'documentOnTypeFormattingProvider',
+    'textDocument/rename': 'renameProvider',
+    'textDocument/foldingRange': 'foldingRangeProvider',
+    'textDocument/selectionRange': 'selectionRangeProvider',
+    'textDocument/semanticTokens': 'semanticTokensProvider',
+    'textDocument/inlayHint': 'inlayHintProvider',
+    'workspace/symbol': 'workspaceSymbolProvider',
+    'workspace/executeCommand': 'executeCommandProvider',
+}
+# requests which depend on the capability of another method
+REQUEST_REGISTRATIONS = {
+    'completionItem/resolve': 'textDocument/completion',
+    'textDocument/prepareRename': 'textDocument/rename',
+    'textDocument/semanticTokens/full': 'textDocument/semanticTokens',
+    'textDocument/semanticTokens/full/delta': 'textDocument/semanticTokens',
+    'textDocument/semanticTokens/range': 'textDocument/semanticTokens',
+}
+PROVIDER = 'Provider'
+
+
+def provider_key(method):
+    ''' returns the server capability a request method depends on, None if it doesn't depend on one '''
+    return REGISTRATION_CAPABILITIES.get(REQUEST_REGISTRATIONS.get(method, method))
+
+
+def feature_name(method):
+    ''' returns the feature name of a request method, e.g. completion, None if it doesn't belong to a feature '''
+    key = provider_key(method)
+    return key[:-len(PROVIDER)] if key is not None else None
+
+
+class CAPABILITY_INDEX:
+    def __init__(self):
+        self.static = dict()  # language -> capabilities of the initialize result
+        self.registrations = dict()  # language -> {registration id: (method, register options)}
+        self.merged = dict()  # language -> static capabilities updated by the registrations
+
+
+    def __setitem__(self, language, capabilities):
+        self.static[language] = capabilities
+        self._merge(language)
+
+
+    def __getitem__(self, language):
+        return self.merged[language]
+
+
+    def __contains__(self, language):
+        return language in self.merged
+
+
+    def get(self, language, default=None):
+        return self.merged.get(language, default)
+
+
+    def register(self, language, registrations):
+        '''
+            Args:
+                language: the server the registrations come from
+                registrations: list of lsp Registration dicts
+
+            Returns: None
+            Raises: Nothing
+        '''
+        registered = self.registrations.setdefault(language, dict())
+        for registration in registrations:
+            registered[registration['id']] = (registration['method'], registration.get('registerOptions'))
+            log(f'{language} registered {registration["method"]}')
+        self._merge(language)
+
+
+    def unregister(self, language, unregistrations):
+        registered = self.registrations.get(language, dict())
+        for unregistration in unregistrations:
+            registered.pop(unregistration['id'], None)
+        self._merge(language)
+
+
+    def provides(self, language, method):
+        ''' True if the server provides method, None if it isn't known yet because the server is still initializing '''
+        key = provider_key(method)
+        if key is None:
+            return True
+        capabilities = self.merged.get(language)
+        if capabilities is None:
+            return None
+        # an empty options dict, e.g. completionProvider: {}, means supported as well
+        return capabilities.get(key) not in (None, False)
+
+
+    def workspace_folders(self, language):
+        ''' True if the server accepts workspace folder changes, None while it is still initializing '''
+        capabilities = self.merged.get(language)
+        if capabilities is None:
+            return None
+        folders = capabilities.get('workspace', dict()).get('workspaceFolders', dict())
+        # changeNotifications may be a registration id, the server registers the notification later then
+        return bool(folders.get('supported') and folders.get('changeNotifications'))
+
+
+    def remove(self, language):
+        ''' forgets everything about a server which has been shut down '''
+        self.static.pop(language, None)
+        self.registrations.pop(language, None)
+        self.merged.pop(language, None)
+
+
+    def registered(self, language, method):
+        ''' returns the register options of all registrations of method '''
+        return [options for _method, options in self.registrations.get(language, dict()).values()
+                if _method == method]
+
+
+    def _merge(self, language):
+        # rebuilt on each change, reading happens far more often than registering
+        merged = dict(self.static.get(language, dict()))
+        for method, options in self.registrations.get(language, dict()).values():
+            key = REGISTRATION_CAPABILITIES.get(method)
+            if key is not None:
+                merged[key] = options if options else True
+        self.merged[language] = merged
@@ -2,34 +2,126 @@
     Implements the notepad++ related lsp functionality
 '''
 import os
-from urllib.request import url2pathname
+import time
+import zlib
 import pprint
 import logging
 
 from Npp import (editor, editor1, editor2, notepad, console,
-                 NOTIFICATION, SCINTILLANOTIFICATION,
+                 NOTIFICATION, SCINTILLANOTIFICATION, MODIFICATIONFLAGS, UPDATE,
                  ANNOTATIONVISIBLE, ORDERING, STATUSBARSECTION)
 from .io_handler import COMMUNICATION_MANAGER
-from .lsp_protocol import MESSAGES, TextDocumentSaveReason
+from .metrics import LATENCY_METRICS
+from .lsp_protocol import MESSAGES, TextDocumentSaveReason, DiagnosticSeverity, SymbolKind, ErrorCodes
+from .text_edits import apply_minimal_edits
+from .position_codec import POSITION_CODEC, UTF16
+from .semantic_tokens import setup_indicator, legend_colors
+from .document_state import DOCUMENT_REGISTRY, uri_to_path, path_to_uri
+from .snapshot import TEXT_SNAPSHOTS
+from .symbol_index import SYMBOL_INDEX, flatten_symbols, NAME, KIND, CONTAINER, URI, LINE, CHARACTER
+from .viewport import visible_line_range, DEBOUNCER
+from .eol_annotations import (setup_eol_annotations, inlay_hint_labels, code_lens_labels, INLAY_HINT, CODE_LENS,
+                              EOLANNOTATIONVISIBLE)
+from .ui_dispatcher import UI_DISPATCHER
+from .prefetch import DEFINITION_PREFETCHER
+from .results_panel import RESULTS_PANEL
+from .suspension import DOCUMENT_SUSPENSION, process_memory, IDLE_MINUTES, MAX_OPEN
+from .shutdown import SHUTDOWN_COORDINATOR
+from .capabilities import CAPABILITY_INDEX, feature_name
+from .fan_out import FAN_OUT, MERGED_METHODS
+from .progress import PROGRESS_REPORTER, UPDATES_PER_SECOND
+from .result_cache import RESULT_CACHE, MAX_MEGABYTES, content_digest
+from .session_recorder import SESSION_RECORDER
+from .workspace import ROOT_FINDER, WORKSPACE_POOL, MAX_INSTANCES, workspace_folder
+from .file_watcher import WATCHED_FILES, POLL_INTERVAL
+from .completion_items import COMPLETION_ITEMS, RESOLVE_DELAY, MAX_SHOWN
 
 log = logging.info
+# the semantic token legend of a server is cached with an empty digest
+LEGEND = 'semanticTokens/legend'
 pp = pprint.PrettyPrinter(indent=4)
 
+# additional lines above and below the visible area requested with range requests
+VIEWPORT_MARGIN = 50
+# inlay hints and code lenses are requested once scrolling paused that long
+ANNOTATION_DELAY = 0.3
+# userListShow list type used for the go to symbol list
+SYMBOL_LIST_TYPE = 42
+# seconds the caret has to rest before its definition gets prefetched
+PREFETCH_IDLE_DELAY = 0.3
+
 
 class LSPCLIENT():
 
-    def __init__(self, lsp_server_configs):
+    def __init__(self, lsp_server_configs, options=None):
         log('LSPCLIENT')
+        self.options = options or dict()
+        self.metrics = LATENCY_METRICS(self.options.get('metrics', False))
+        self.ui = UI_DISPATCHER(self.metrics)
         self.available_lsp_servers = lsp_server_configs.keys()
-        self.com_manager = COMMUNICATION_MANAGER(lsp_server_configs, self.on_receive)
+        self.server_configs = lsp_server_configs
+        _proxy = self.options.get('proxy')
+        if _proxy is not None:
+            # the proxy writes its token there, only processes of the user can read it
+            _proxy = dict(_proxy, token_file=_proxy.get('token_file') or
+                          os.path.join(notepad.getPluginConfigDir(), 'lsp_proxy.token'))
+        self.com_manager = COMMUNICATION_MANAGER(lsp_server_configs, self.on_receive, _proxy)
         self.lsp_msg = MESSAGES()
         self.lsp_doc_flag = False
         self.current_language = None
         self.current_triggers = dict()
-        self.current_file = ''
-        self.open_files_dict = dict()
-        self.sent_didopen_files = []
+        self.documents = DOCUMENT_REGISTRY()
+        self.snapshots = TEXT_SNAPSHOTS()
+        self.current_document = None
+        # the document workspace edits are applied to, its BUFFERACTIVATED notification comes later
+        self.edited_document = None
         self.open_results = dict()
+        # a partial merge gets handled like any response
+        self.fan_out = FAN_OUT(self._result_handler)
+        self.server_capabilities = CAPABILITY_INDEX()
+        self.progress = PROGRESS_REPORTER(lambda: self.ui.post(self._show_progress, 'progress'),
+                                          self.options.get('progress_updates_per_second', UPDATES_PER_SECOND))
+        # server requests are answered on the reader thread, they must not block
+        self.server_request_handlers = {
+            'workspace/configuration': self._on_configuration_request,
+            'client/registerCapability': self._on_register_capability,
+            'client/unregisterCapability': self._on_unregister_capability,
+            'workspace/applyEdit': self._on_apply_edit,
+            'window/workDoneProgress/create': self._on_work_done_progress_create,
+            'workspace/workspaceFolders': self._on_workspace_folders_request,
+        }
+        self.semantic_token_colors = dict()
+        self.symbol_index = SYMBOL_INDEX()
+        self.symbol_list_items = dict()
+        # the debounced functions read the editor and send requests, they run on the gui thread
+        self.document_changed = DEBOUNCER(0.5, self._on_document_changed, self.ui.post)
+        self.visible_range_changed = DEBOUNCER(0.1, self._request_semantic_tokens, self.ui.post)
+        self.scroll_settled = DEBOUNCER(ANNOTATION_DELAY, self._request_eol_annotations, self.ui.post)
+        self.prefetch_enabled = self.options.get('prefetch_definitions', False)
+        self.prefetcher = DEFINITION_PREFETCHER()
+        self.caret_idle = DEBOUNCER(PREFETCH_IDLE_DELAY, self._prefetch_definition, self.ui.post)
+        self.completion_items = COMPLETION_ITEMS(max_shown=self.options.get('completion_list_size', MAX_SHOWN))
+        self.completion_start = None  # caret position when the completion was requested
+        self.selection_rested = DEBOUNCER(RESOLVE_DELAY, self._resolve_completion_item, self.ui.post)
+        self.results = RESULTS_PANEL(self._on_result_activated)
+        self.diagnostics = dict()  # uri -> {server: lsp diagnostics}
+        self.suspension = DOCUMENT_SUSPENSION(self.options.get('suspend_idle_minutes', IDLE_MINUTES),
+                                              self.options.get('max_open_documents', MAX_OPEN))
+        self.suspension.start(self._suspend_documents, self.ui.post)
+        self.shutdown = SHUTDOWN_COORDINATOR()
+        self.roots = ROOT_FINDER(self.options.get('root_markers'))
+        self.workspaces = WORKSPACE_POOL(self.options.get('max_server_instances', MAX_INSTANCES))
+        self.watched_files = WATCHED_FILES(self._send_watched_file_changes,
+                                           self.options.get('file_watch_interval', POLL_INTERVAL),
+                                           is_project=self.roots.is_project)
+        self.result_cache = None
+        if self.options.get('result_cache', False):
+            self.result_cache = RESULT_CACHE(os.path.join(notepad.getPluginConfigDir(), 'lspclient_results.sqlite'),
+                                             self.options.get('result_cache_megabytes', MAX_MEGABYTES))
+        self.recorder = None
+        if self.options.get('record_session'):
+            self.recorder = SESSION_RECORDER(self.options['record_session'], lsp_server_configs, self.options)
+            self.com_manager.recorder = self.recorder
         self.setup()
         self.waiting_for_completion_response = False
         self.current_hover_position = -1
@@ -37,13 +129,21 @@ class LSPCLIENT():
 
     def setup(self):
         log('register callbacks etc...')
-        notepad.callback(self.on_buffer_activated, [NOTIFICATION.BUFFERACTIVATED])
-        notepad.callback(self.on_file_saved, [NOTIFICATION.FILESAVED])
-        notepad.callback(self.on_file_closed, [NOTIFICATION.FILECLOSED])
-        notepad.callback(self.on_file_before_save, [NOTIFICATION.FILEBEFORESAVE])
-        editor.callbackSync(self.on_char_added, [SCINTILLANOTIFICATION.CHARADDED])
-        editor.callbackSync(self.on_dwell_end, [SCINTILLANOTIFICATION.DWELLEND])
-        editor.callbackSync(self.on_dwell_start, [SCINTILLANOTIFICATION.DWELLSTART])
+        notepad.callback(self._recorded(self.on_buffer_activated, 'bufferactivated'), [NOTIFICATION.BUFFERACTIVATED])
+        notepad.callback(self._recorded(self.on_file_saved, 'filesaved'), [NOTIFICATION.FILESAVED])
+        notepad.callback(self._recorded(self.on_file_closed, 'fileclosed'), [NOTIFICATION.FILECLOSED])
+        notepad.callback(self._recorded(self.on_file_before_save, 'filebeforesave'), [NOTIFICATION.FILEBEFORESAVE])
+        editor.callbackSync(self._recorded(self.on_char_added, 'charadded'), [SCINTILLANOTIFICATION.CHARADDED])
+        editor.callbackSync(self._recorded(self.on_dwell_end, 'dwellend'), [SCINTILLANOTIFICATION.DWELLEND])
+        editor.callbackSync(self._recorded(self.on_dwell_start, 'dwellstart'), [SCINTILLANOTIFICATION.DWELLSTART])
+        editor.callbackSync(self._recorded(self.on_modified, 'modified'), [SCINTILLANOTIFICATION.MODIFIED])
+        editor.callbackSync(self._recorded(self.on_update_ui, 'updateui'), [SCINTILLANOTIFICATION.UPDATEUI])
+        editor.callbackSync(self._recorded(self.on_user_list_selection, 'userlistselection'),
+                            [SCINTILLANOTIFICATION.USERLISTSELECTION])
+        editor.callbackSync(self._recorded(self.on_autoc_selection_change, 'autocselectionchange'),
+                            [SCINTILLANOTIFICATION.AUTOCSELECTIONCHANGE])
+        editor.callbackSync(self._recorded(self.on_autoc_selection, 'autocselection'),
+                            [SCINTILLANOTIFICATION.AUTOCSELECTION])
 
         fg_color = editor.styleGetFore(32)
         darker_bg_color = tuple([x - 10 if x > 10 else x for x in editor.styleGetBack(32)])
@@ -71,40 +171,93 @@ class LSPCLIENT():
         editor1.setMouseDwellTime(500)
         editor2.setMouseDwellTime(500)
 
-        self.open_files_dict = {x[1]: x[0] for x in notepad.getFiles()}
-        
+        setup_indicator()
+        setup_eol_annotations(tuple(x // 2 + 64 for x in fg_color), darker_bg_color)
+
+
+    def _recorded(self, handler, notification):
+        ''' returns handler, wrapped to record the notification first if the session gets recorded '''
+        if self.recorder is None:
+            return handler
+
+        def recorded(args):
+            self.recorder.editor_event(notification, args)
+            handler(args)
+        return recorded
+
+
+    def _shown(self, function, *args):
+        ''' records a call which changed what the user sees, if the session gets recorded, the replay compares them '''
+        if self.recorder is not None:
+            self.recorder.ui_event(function, args)
+
+
+    def _shown_folding(self, document):
+        if self.recorder is not None:
+            self._shown('setFoldLevel', document.path, zlib.crc32(document.folding_ranges.levels))
+
+
+    def _apply_folding(self, document, ranges):
+        if document.folding_ranges.apply(editor, ranges):
+            self._shown_folding(document)
+
 
     def terminate(self):
+        '''
+            Clears the callbacks and shuts all servers down
+
+            Returns: report of the shutdown, str
+            Raises: Nothing
+        '''
         log('clear callbacks...')
         notepad.clearCallbacks([NOTIFICATION.BUFFERACTIVATED,
                                 NOTIFICATION.FILESAVED,
-                                NOTIFICATION.FILECLOSED])
+                                NOTIFICATION.FILECLOSED,
+                                NOTIFICATION.FILEBEFORESAVE])
         editor.clearCallbacks([SCINTILLANOTIFICATION.CHARADDED,
                                SCINTILLANOTIFICATION.DWELLEND,
-                               SCINTILLANOTIFICATION.DWELLSTART])
-
-        for monitor_thread in self.com_manager.running_monitoring_threads():
-            self.com_manager.stop_monitoring_thread(monitor_thread)
-            self.com_manager.send(self.lsp_msg.exit())
-            self.com_manager.send(self.lsp_msg.shutdown())
+                               SCINTILLANOTIFICATION.DWELLSTART,
+                               SCINTILLANOTIFICATION.MODIFIED,
+                               SCINTILLANOTIFICATION.UPDATEUI,
+                               SCINTILLANOTIFICATION.USERLISTSELECTION,
+                               SCINTILLANOTIFICATION.AUTOCSELECTIONCHANGE,
+                               SCINTILLANOTIFICATION.AUTOCSELECTION])
+        self.document_changed.cancel()
+        self.selection_rested.cancel()
+        self.visible_range_changed.cancel()
+        self.scroll_settled.cancel()
+        self.caret_idle.cancel()
+        self.suspension.stop()
+        self.results.close()
+        self.progress.cancel()
+        self.ui.stop()
+        self.watched_files.stop()
+        if self.current_document is not None:
+            self.current_document.folding_ranges.release(editor)
+        if self.result_cache is not None:
+            self.result_cache.close()
+
+        report = self.shutdown.run(self.com_manager, self.lsp_msg)
+        log(report)
+        if self.recorder is not None:
+            self.recorder.close()
+        return report
 
 
     def __TextDocumentIdentifier(self):
-        _version = self._get_file_version()
-        return self.current_file, _version
+        return self.current_document.uri, self.current_document.version
 
 
     def __TextDocumentPositionParams(self, cur_pos=None):
         if cur_pos is None:
             cur_pos = editor.getCurrentPos()
-        _line = editor.lineFromPosition(cur_pos)
-        _character_pos = editor.getColumn(cur_pos)
-        _file, _version = self.__TextDocumentIdentifier()
-        return _file, _version, _line, _character_pos
+        _line, _character_pos = self._position_codec().to_lsp(editor, cur_pos)
+        _uri, _version = self.__TextDocumentIdentifier()
+        return _uri, _version, _line, _character_pos
 
 
     def __DocumentFormattingParams(self):
-        _file, _version = self.__TextDocumentIdentifier()
+        _uri, _version = self.__TextDocumentIdentifier()
         # TODO:
         # /**
          # * The format options.
@@ -129,7 +282,172 @@ class LSPCLIENT():
              # * Signature for further properties.
              # */
             # [key: string]: boolean | number | string;
-        return _file, _version
+        return _uri, _version
+
+
+    def _register_response_handler(self, handler, key=None, document=None, on_failure=None):
+        '''
+            Must be called directly after the request has been sent, on the gui thread.
+            The handler runs on the gui thread, see UI_DISPATCHER.post for key.
+            If document is given, the result is dropped once the document version changed.
+            on_failure runs on the gui thread instead of the handler for an error or empty result
+            and if the result gets dropped.
+        '''
+        _version = None if document is None else document.version
+        self.open_results[self.lsp_msg.request_id] = (handler, key, document, _version, on_failure)
+
+
+    def _config(self, server):
+        ''' the config of a server instance '''
+        return self.server_configs.get(self.workspaces.config_of(server), {})
+
+
+    def _feature_enabled(self, server, feature):
+        ''' False if the config of server declares features without feature '''
+        features = self._config(server).get('features')
+        return features is None or feature is None or feature in features
+
+
+    def _servers_for(self, method):
+        ''' returns the servers of the current document which provide method, in config order '''
+        _feature = feature_name(method)
+        return [server for server in self.com_manager.current_servers
+                if self._feature_enabled(server, _feature)
+                and self.server_capabilities.provides(server, method) is not False]
+
+
+    def _send_request(self, lspmessage, servers=None, prefetch=False):
+        '''
+            Sends the request just created by lsp_msg to the servers providing it.
+            Requests with mergeable results go to all of them, others to the first one.
+
+            Args:
+                lspmessage: the request
+                servers: the servers to send it to, by default the ones providing the method
+                prefetch: True for a request nobody waits for, its latencies are recorded apart
+
+            Returns: False if no server provides the method, no response handler must be registered then
+            Raises: Nothing
+        '''
+        _method = self.lsp_msg.request_method
+        if servers is None:
+            servers = self._servers_for(_method)
+            if len(servers) > 1:
+                merge = MERGED_METHODS.get(_method)
+                if merge is None:
+                    servers = servers[:1]
+                else:
+                    self.fan_out.started(self.lsp_msg.request_id, servers, merge)
+        if not servers:
+            log(f'no server of {self.current_language} provides {_method}')
+            return False
+        # timestamped before the response can arrive on the reader thread
+        self.metrics.request_sent(self.lsp_msg.request_id, '+'.join(servers),
+                                  f'{_method} (prefetch)' if prefetch else _method)
+        self.com_manager.send_to_servers(servers, lspmessage)
+        return True
+
+
+    def _document_servers(self, document):
+        ''' the server instances serving document, in config order '''
+        instances = (self.workspaces.instance_of(server, document.root)
+                     for server in self.com_manager.servers_of(document.language_id.upper()))
+        return [instance for instance in instances if instance is not None]
+
+
+    def _workspace_servers(self, document):
+        '''
+            Assigns the server instances for the root of document, adds it as workspace folder
+            to servers supporting that, shuts the least recently used instances down if there are too many
+
+            Returns: [(instance, server)] the instances and the keys of their configs
+            Raises: Nothing
+        '''
+        servers = []
+        for server in self.com_manager.servers_of(self.current_language):
+            instance, added = self.workspaces.assign(server, document.root,
+                                                     self.server_capabilities.workspace_folders(server))
+            if added:
+                log(f'{document.root} added to the workspace folders of {instance}')
+                self.com_manager.send_to_server(instance, self.lsp_msg.didChangeWorkspaceFolders(
+                    [workspace_folder(document.root)]))
+                self._update_file_watchers(instance)
+            for evicted, roots in self.workspaces.evict(server, instance):
+                self._stop_instance(evicted, roots)
+            servers.append((instance, server))
+        return servers
+
+
+    def _stop_instance(self, instance, roots):
+        ''' shuts a server instance no longer needed down, its documents get reopened on activation '''
+        language = self._config(instance).get('language', self.workspaces.config_of(instance))
+        for document in self.documents:
+            if document.is_open and document.root in roots and document.language_id.upper() == language:
+                # the other servers of the language must not see a second didOpen
+                self.com_manager.send_to_servers(self._document_servers(document), self.lsp_msg.didClose(document.uri))
+                document.is_open = False
+                document.semantic_tokens.result_id = None
+                document.semantic_tokens.request_ended()
+        log(f'stopping {instance}, it served {roots}')
+        if instance in self.com_manager.running_servers:
+            self.shutdown.stop(instance, self.com_manager, self.lsp_msg)
+        self.watched_files.update(instance, [], [])
+        self.fan_out.stopped(instance)
+        self.server_capabilities.remove(instance)
+        self.semantic_token_colors.pop(instance, None)
+
+
+    def _update_file_watchers(self, server):
+        ''' watches the workspace roots of server for the files it registered watchers for '''
+        registrations = self.server_capabilities.registered(server, 'workspace/didChangeWatchedFiles')
+        watchers = [watcher for options in registrations for watcher in (options or {}).get('watchers', [])]
+        self.watched_files.update(server, self.workspaces.folders.get(server, []), watchers)
+
+
+    def _send_watched_file_changes(self, server, changes):
+        # called on the file watcher threads, the notification skeleton of lsp_msg is shared with the gui thread
+        def _send():
+            if server in self.com_manager.running_servers:
+                self.com_manager.send_to_server(server, self.lsp_msg.didChangeWatchedFiles(changes))
+        self.ui.post(_send)
+
+
+    def _active_document(self):
+        ''' the state of the active buffer, even if its BUFFERACTIVATED notification hasn't been processed yet '''
+        return self.documents.get(notepad.getCurrentBufferID(),
+                                  notepad.getCurrentFilename(),
+                                  notepad.getLanguageName(notepad.getLangType()).lower())
+
+
+    def _position_codec(self, document=None):
+        ''' returns the position codec of document, defaults to the current document '''
+        document = document or self.current_document
+        if document.position_codec is None:
+            _servers = self._document_servers(document)
+            _capabilities = self.server_capabilities.get(_servers[0], {}) if _servers else {}
+            document.position_codec = POSITION_CODEC(_capabilities.get('positionEncoding', UTF16))
+        return document.position_codec
+
+
+    def _performance_report(self, reset=False):
+        server_memory = {server: process_memory(self.com_manager.server_pid(server))
+                         for server in self.com_manager.running_servers}
+        report = (f'{self.metrics.report()}\n\n{self.snapshots.report()}\n{self.prefetcher.report()}\n'
+                  f'{self.results.report()}\n{self.suspension.report(server_memory)}\n{self.progress.report()}\n'
+                  f'{self.fan_out.report()}\n{self.watched_files.report()}\n{self.completion_items.report()}' + (f'\n{self.result_cache.report()}' if self.result_cache else ''))
+        if reset:
+            self.metrics.reset()
+            self.snapshots.reset()
+            self.prefetcher.reset()
+            self.results.reset()
+            self.suspension.reset()
+            self.progress.reset()
+            self.fan_out.reset()
+            self.completion_items.reset()
+            if self.result_cache is not None:
+                self.result_cache.reset()
+        notepad.new()
+        editor.setText(report)
 
 
     def _get_trigger_chars(self, dict_var, key_list):
@@ -142,126 +460,481 @@ class LSPCLIENT():
 
 
     def _get_file_version(self):
-        log('called')
-        file_version = editor.getPropertyInt('fileversion', 0)
-        # editor.setProperty('fileversion', file_version + 1)
-        return file_version
+        return self.current_document.version
+
+
+    def _send_did_change(self, document=None):
+        '''
+            Sends the current text with a new version,
+            unless it is the same as the last one sent.
+
+            Args:
+                document: shown in the editor, defaults to the current document
+
+            Returns: the version the server knows
+            Raises: Nothing
+        '''
+        document = document or self.current_document
+        _text = self.snapshots.text(editor, document)
+        _hash = hash(_text)
+        if _hash == document.snapshot_hash:
+            log(f'{document.path} unchanged since version {document.version}, didChange skipped')
+            return document.version
+        document.snapshot_hash = _hash
+        document.version += 1
+        self._update_content_digest(document, _text)
+        _message = self.lsp_msg.didChange(document.uri, document.language_id, document.version, _text)
+        if document is self.current_document:
+            self.com_manager.send(_message)
+        else:
+            self.com_manager.send_to_servers(self._document_servers(document), _message)
+        return document.version
+
 
+    def _cache_key(self, server):
+        ''' results of different executables configured under the same id must not be mixed up '''
+        server = self.workspaces.config_of(server)
+        return f'{server} {self.server_configs[server]["executable"]}'
 
-    def _set_file_version(self):
-        log('called')
-        file_version = editor.getPropertyInt('fileversion', 0) + 1
-        editor.setProperty('fileversion', file_version)
-        return file_version
 
+    def _update_content_digest(self, document, text):
+        if self.result_cache is not None and self.result_cache.enabled:
+            document.content_digest = (document.version, content_digest(text))
 
-    def _send_did_change(self, version=None):
-        version = self._get_file_version() if version is None else version
-        self.com_manager.send(self.lsp_msg.didChange(self.current_file,
-                                                     self.current_language.lower(),
-                                                     version,
-                                                     editor.getText()))
 
+    def _cache_result(self, server, method, document, _version, result):
+        ''' stores result if it belongs to the text whose digest is known '''
+        if document.content_digest is not None and document.content_digest[0] == _version:
+            self.result_cache.put(self._cache_key(server), method, document.content_digest[1], result)
 
-    def _send_documet_symbol(self):
-        self.com_manager.send(self.lsp_msg.documentSymbol(self.current_file,
-                                                          self._get_file_version()))
-        self.open_results[self.lsp_msg.request_id] = self.document_symbol_response_handler
+
+    def _cached_result(self, method, document):
+        ''' returns (server, cached result) for the current text of document, (None, None) if unknown '''
+        _servers = self._servers_for(method)[:1]
+        if not _servers or document.content_digest is None or document.content_digest[0] != document.version:
+            return None, None
+        return _servers[0], self.result_cache.get(self._cache_key(_servers[0]), method, document.content_digest[1])
+
+
+    def _serve_cached_results(self, document):
+        '''
+            Shows the folding, outline and coloring stored for the text of a just opened document,
+            possibly before its server has been initialized. The requests are sent as usual,
+            their results replace the cached ones.
+        '''
+        _server, ranges = self._cached_result('textDocument/foldingRange', document)
+        if ranges:
+            self._apply_folding(document, ranges)
+        _server, symbols = self._cached_result('textDocument/documentSymbol', document)
+        if symbols:
+            self.symbol_index.update(document.uri, document.version, symbols)
+        server, tokens = self._cached_result('textDocument/semanticTokens/full', document)
+        if tokens:
+            if server not in self.semantic_token_colors:
+                legend = self.result_cache.get(self._cache_key(server), LEGEND, '')
+                if legend is None:
+                    return
+                self.semantic_token_colors[server] = legend_colors(legend)
+            document.semantic_tokens.set_full(tokens, document.version, cached=True)
+            self._paint_semantic_tokens()
+
+
+    def _send_documet_symbol(self, on_indexed=None):
+        _uri, _version = self.__TextDocumentIdentifier()
+        _servers = self._servers_for('textDocument/documentSymbol')[:1]
+        if self._send_request(self.lsp_msg.documentSymbol(_uri, _version), _servers):
+            self._register_response_handler(
+                lambda msg: self.document_symbol_response_handler(msg, _uri, _version, on_indexed, _servers[0]))
+
+
+    def _index_symbols(self):
+        ''' keeps the symbol index of the current document up to date, go to symbol finds all open documents '''
+        if self.lsp_doc_flag and not self.symbol_index.is_current(*self.__TextDocumentIdentifier()):
+            self._send_documet_symbol()
+
+
+    def _goto_symbol(self):
+        query = notepad.prompt('Symbol name, the characters only need to appear in order', 'Go to symbol', '')
+        if not query:
+            return
+        if self.lsp_doc_flag and not self.symbol_index.is_current(*self.__TextDocumentIdentifier()):
+            self._send_documet_symbol(lambda: self._show_symbols(query))
+        else:
+            self._show_symbols(query)
+
+
+    def _show_symbols(self, query):
+        symbols = self.symbol_index.find(query)
+        if symbols:
+            self._show_symbol_list(symbols)
+        else:
+            log(f'{query} not found in open documents, asking the server')
+            self._send_workspace_symbol(query)
+
+
+    def _show_symbol_list(self, symbols):
+        if len(symbols) == 1:
+            self._goto_location(symbols[0][URI], symbols[0][LINE], symbols[0][CHARACTER])
+            return
+        self.symbol_list_items = dict()
+        for symbol in symbols:
+            _file = uri_to_path(symbol[URI])
+            _container = f'{symbol[CONTAINER]}.' if symbol[CONTAINER] else ''
+            self.symbol_list_items[f'{_container}{symbol[NAME]}  -  {os.path.basename(_file)}:{symbol[LINE] + 1}'] = symbol
+        editor.userListShow(SYMBOL_LIST_TYPE, '\n'.join(self.symbol_list_items))
+        self._shown('userListShow', SYMBOL_LIST_TYPE, '\n'.join(self.symbol_list_items))
+
+
+    def _goto_location(self, uri, line, character):
+        if self.current_document is None or uri != self.current_document.uri:
+            notepad.activateFile(uri_to_path(uri))
+        editor.gotoPos(self._position_codec(self._active_document()).from_lsp(editor, line, character))
+
+
+    def _on_result_activated(self, row):
+        ''' called from the results panel thread '''
+        uri, _path, line, character, _text = row
+        self.ui.post(lambda: self._goto_location(uri, line, character), 'goto result')
+
+
+    def _diagnostic_rows(self, uri):
+        _file = uri_to_path(uri)
+        rows = []
+        for server, diagnostics in self.diagnostics[uri].items():
+            for item in diagnostics:
+                _start = item.get('range', {}).get('start', {'line': 0, 'character': 0})
+                _severity = DiagnosticSeverity(item.get('severity', DiagnosticSeverity.Error)).name
+                rows.append((uri, _file, _start['line'], _start['character'],
+                             f"{_severity}: {item.get('message', '')} ({item.get('source') or server})"))
+        return rows
+
+
+    def _show_diagnostics(self):
+        rows = [row for uri in sorted(self.diagnostics) for row in self._diagnostic_rows(uri)]
+        self.results.show(f'Diagnostics ({len(rows)})', rows, 'diagnostics')
+
+
+    def _update_diagnostics(self, uri, diagnostics, server):
+        '''
+            Replaces the diagnostics server published for uri, the ones of the other servers are kept
+
+            Returns: the diagnostics of all servers for uri
+        '''
+        published = self.diagnostics.setdefault(uri, dict())
+        if diagnostics:
+            published[server] = diagnostics
+        else:
+            published.pop(server, None)
+        if not published:
+            del self.diagnostics[uri]
+        if self.results.showing('diagnostics'):
+            self._show_diagnostics()
+        return [item for items in published.values() for item in items]
 
 
     def _send_document_formatting(self):
-        self.com_manager.send(self.lsp_msg.formatting(self.current_file,
-                                                      self._get_file_version()))
-        self.open_results[self.lsp_msg.request_id] = self.document_formatting_handler
+        if self._send_request(self.lsp_msg.formatting(*self.__TextDocumentIdentifier())):
+            self._register_response_handler(self.document_formatting_handler, 'formatting', self.current_document)
 
     def _send_document_range_formatting(self):
-        _start_pos = editor.getSelectionStart()
-        start_line = editor.lineFromPosition(_start_pos)
-        start_char_pos = _start_pos - editor.positionFromLine(start_line)
-        _end_pos = editor.getSelectionEnd()
-        end_line = editor.lineFromPosition(_end_pos)
-        end_char_pos = _end_pos - editor.positionFromLine(end_line)
-        
-        self.com_manager.send(self.lsp_msg.rangeFormatting(self.current_file,
-                                                           self._get_file_version(),
-                                                           (start_line, start_char_pos),
-                                                           (end_line, end_char_pos)))
-        self.open_results[self.lsp_msg.request_id] = self.document_range_formatting_handler
+        codec = self._position_codec()
+        if self._send_request(self.lsp_msg.rangeFormatting(*self.__TextDocumentIdentifier(),
+                                                           codec.to_lsp(editor, editor.getSelectionStart()),
+                                                           codec.to_lsp(editor, editor.getSelectionEnd()))):
+            self._register_response_handler(self.document_range_formatting_handler, 'formatting', self.current_document)
+
+
+    def _prefetched_definition(self):
+        ''' returns the prefetched definition result of the identifier at the caret or None '''
+        if not self.prefetch_enabled:
+            return None
+        _word_start = editor.wordStartPosition(editor.getCurrentPos(), True)
+        return self.prefetcher.lookup(self.prefetcher.key(self.current_document, _word_start))
+
+
+    def _prefetch_definition(self, position=None):
+        ''' requests the definition of the identifier at position, the caret by default, in the background '''
+        if not self.lsp_doc_flag:
+            return
+        # only once the server is known to provide it, prefetches don't wait in the backlog
+        _servers = self._servers_for('textDocument/definition')[:1]
+        if not _servers or not self.server_capabilities.provides(_servers[0], 'textDocument/definition'):
+            return
+        if position is None:
+            position = editor.getCurrentPos()
+        _word_start = editor.wordStartPosition(position, True)
+        if _word_start == editor.wordEndPosition(position, True):
+            return
+        key = self.prefetcher.key(self.current_document, _word_start)
+        if self.prefetcher.should_prefetch(key):
+            _request = self.lsp_msg.definition(*self.__TextDocumentPositionParams(position))
+            # in flight before the response can arrive on the reader thread
+            self.prefetcher.started(self.lsp_msg.request_id, key)
+            self._send_request(_request, _servers, prefetch=True)
 
 
     def _send_goto_definition(self):
-        self.com_manager.send(self.lsp_msg.definition(*self.__TextDocumentPositionParams()))
-        self.open_results[self.lsp_msg.request_id] = self.goto_definition_response_handler
+        result = self._prefetched_definition()
+        if result is not None:
+            if result:
+                self.goto_definition_response_handler({'result': result})
+            return
+        if self._send_request(self.lsp_msg.definition(*self.__TextDocumentPositionParams())):
+            self._register_response_handler(self.goto_definition_response_handler, 'goto')
 
 
     def _send_peek_definition(self):
-        self.com_manager.send(self.lsp_msg.definition(*self.__TextDocumentPositionParams()))
-        self.open_results[self.lsp_msg.request_id] = self.peek_definition_response_handler
+        result = self._prefetched_definition()
+        if result is not None:
+            if result:
+                self.peek_definition_response_handler({'result': result})
+            return
+        if self._send_request(self.lsp_msg.definition(*self.__TextDocumentPositionParams())):
+            self._register_response_handler(self.peek_definition_response_handler, 'peek', self.current_document)
 
 
     def _send_hover(self, hover_position):
         self.current_hover_position = hover_position
-        self.com_manager.send(self.lsp_msg.hover(*self.__TextDocumentPositionParams(hover_position)))
-        self.open_results[self.lsp_msg.request_id] = self.hover_response_handler
+        if self._send_request(self.lsp_msg.hover(*self.__TextDocumentPositionParams(hover_position))):
+            self._register_response_handler(self.hover_response_handler, 'hover', self.current_document)
 
 
     def _send_references(self):
-        self.com_manager.send(self.lsp_msg.references(*self.__TextDocumentPositionParams()))
-        self.open_results[self.lsp_msg.request_id] = self.reference_response_handler
+        if self._send_request(self.lsp_msg.references(*self.__TextDocumentPositionParams())):
+            self._register_response_handler(self.reference_response_handler)
 
 
     def _send_codeLens(self):
-        self.com_manager.send(self.lsp_msg.codeLens(*self.__TextDocumentIdentifier()))
-        self.open_results[self.lsp_msg.request_id] = self.code_lens_response_handler
+        document = self.current_document
+        _version = document.version
+        _last_line = editor.getLineCount() - 1
+        if self._send_request(self.lsp_msg.codeLens(document.uri, _version)):
+            document.eol_annotations.request_sent(CODE_LENS, _version, 0, _last_line)
+            self._register_response_handler(
+                lambda msg: self.eol_annotations_response_handler(msg, document, _version, CODE_LENS, 0, _last_line))
+
+
+    def _send_inlayHint(self, first_line, last_line):
+        document = self.current_document
+        _version = document.version
+        if self._send_request(self.lsp_msg.inlayHint(document.uri, (first_line, 0), (last_line + 1, 0))):
+            document.eol_annotations.request_sent(INLAY_HINT, _version, first_line, last_line)
+            # not superseded by the request for the next scroll position, each one covers other lines
+            self._register_response_handler(
+                lambda msg: self.eol_annotations_response_handler(msg, document, _version, INLAY_HINT,
+                                                                  first_line, last_line))
+
+
+    def _request_eol_annotations(self):
+        '''
+            Requests the inlay hints of the visible lines plus a margin and the code lenses of the document,
+            unless they have already been requested for the current version
+        '''
+        if not self.lsp_doc_flag or EOLANNOTATIONVISIBLE is None:
+            return
+        annotations = self.current_document.eol_annotations
+        _version = self.current_document.version
+        self._paint_eol_annotations()
+        first_line, last_line = visible_line_range()
+        if annotations.needs_request(INLAY_HINT, _version, first_line, last_line) and self._provided(INLAY_HINT):
+            self._send_inlayHint(*visible_line_range(VIEWPORT_MARGIN))
+        if annotations.needs_request(CODE_LENS, _version, 0, 0) and self._provided(CODE_LENS):
+            self._send_codeLens()
+
+
+    def _provided(self, method):
+        ''' True if a server of the current language is known to provide method, it isn't sent speculatively '''
+        return any(self.server_capabilities.provides(server, method) for server in self._servers_for(method))
+
+
+    def _paint_eol_annotations(self):
+        first_line, last_line = visible_line_range()
+        if self.current_document.eol_annotations.paint(editor, first_line, last_line):
+            self._shown('eOLAnnotationSetText', self.current_document.path, first_line, last_line)
 
 
     def _send_prepareRename(self):
-        self.com_manager.send(self.lsp_msg.prepareRename(*self.__TextDocumentPositionParams()))
-        self.open_results[self.lsp_msg.request_id] = self.prepare_rename_response_handler
+        if self._send_request(self.lsp_msg.prepareRename(*self.__TextDocumentPositionParams())):
+            self._register_response_handler(self.prepare_rename_response_handler)
 
 
     def _send_foldingRange(self):
-        self.com_manager.send(self.lsp_msg.foldingRange(*self.__TextDocumentIdentifier()))
-        self.open_results[self.lsp_msg.request_id] = self.folding_range_response_handler
+        _servers = self._servers_for('textDocument/foldingRange')[:1]
+        if not _servers or not self.server_capabilities.provides(_servers[0], 'textDocument/foldingRange'):
+            return
+        document = self.current_document
+        _version = document.version
+        if self._send_request(self.lsp_msg.foldingRange(document.uri, _version), _servers):
+            self._register_response_handler(
+                lambda msg: self.folding_range_response_handler(msg, document, _version, _servers[0]),
+                ('folding', document.uri), document)
 
 
     def _send_goto_declaration(self):
-        self.com_manager.send(self.lsp_msg.declaration(*self.__TextDocumentPositionParams()))
-        self.open_results[self.lsp_msg.request_id] = self.declaration_response_handler
+        if self._send_request(self.lsp_msg.declaration(*self.__TextDocumentPositionParams())):
+            self._register_response_handler(self.declaration_response_handler)
 
 
     def _send_type_definition(self):
-        self.com_manager.send(self.lsp_msg.typeDefinition(*self.__TextDocumentPositionParams()))
-        self.open_results[self.lsp_msg.request_id] = self.type_definition_response_handler
+        if self._send_request(self.lsp_msg.typeDefinition(*self.__TextDocumentPositionParams())):
+            self._register_response_handler(self.type_definition_response_handler)
 
 
     def _send_documentHighlight(self):
-        self.com_manager.send(self.lsp_msg.documentHighlight(*self.__TextDocumentPositionParams()))
-        self.open_results[self.lsp_msg.request_id] = self.document_highlight_response_handler
+        if self._send_request(self.lsp_msg.documentHighlight(*self.__TextDocumentPositionParams())):
+            self._register_response_handler(self.document_highlight_response_handler)
 
 
     def _send_workspace_symbol(self, _query):
-        self.com_manager.send(self.lsp_msg.workspace_symbol(_query))
-        self.open_results[self.lsp_msg.request_id] = self.workspace_symbol_response_handler
+        if self._send_request(self.lsp_msg.workspace_symbol(_query)):
+            self._register_response_handler(self.workspace_symbol_response_handler, 'symbols')
+
+
+    def _send_resolve(self):
+        self._resolve_completion_item()
+
+
+    def _resolve_completion_item(self, index=None):
+        '''
+            Sends completionItem/resolve for an entry of the autocompletion list,
+            by default the highlighted one, to the server which sent the item
+
+            Returns: None
+            Raises: Nothing
+        '''
+        if index is None:
+            if not editor.autoCActive():
+                return
+            index = editor.autoCGetCurrent()
+        server, item = self.completion_items.item(index)
+        if item is None or self.completion_items.tip(index) is not None:
+            return
+        _provider = self.server_capabilities.get(server, {}).get('completionProvider')
+        if not (isinstance(_provider, dict) and _provider.get('resolveProvider')):
+            return
+        if self._send_request(self.lsp_msg.resolve(item), [server]):
+            self._register_response_handler(lambda msg: self.resolve_response_handler(msg, server, item, index),
+                                            'resolve')
 
 
-    def _send_resolve(self, _label):
-        self.com_manager.send(self.lsp_msg.resolve(_label))
-        self.open_results[self.lsp_msg.request_id] = self.resolve_response_handler
+    def _semantic_tokens_server(self):
+        ''' the first server of the current language providing semantic tokens, None if there is none '''
+        return next((server for server in self._servers_for('textDocument/semanticTokens/full')
+                     if server in self.semantic_token_colors), None)
 
 
-    def _notification_handler(self, decoded_message):
+    def _request_semantic_tokens(self):
+        if not self.lsp_doc_flag:
+            return
+        server = self._semantic_tokens_server()
+        if server is None:
+            return
+        document = self.current_document
+        _version = document.version
+        tokens = document.semantic_tokens
+        first_line, last_line = visible_line_range()
+        if tokens.tokens_for(_version, first_line, last_line) is not None:
+            self._paint_semantic_tokens()
+            if not tokens.cached:
+                return
+        # unknown until the server has been initialized, the colors may come from the result cache
+        _provider = self.server_capabilities.get(server, {}).get('semanticTokensProvider')
+        if not _provider:
+            return
+
+        if _provider.get('range', False) and not tokens.cached:
+            first_line, last_line = visible_line_range(VIEWPORT_MARGIN)
+            if self._send_request(self.lsp_msg.semanticTokensRange(document.uri,
+                                                                   (first_line, 0),
+                                                                   (last_line + 1, 0)), [server]):
+                self._register_response_handler(
+                    lambda msg: self.semantic_tokens_range_response_handler(msg, document, _version, first_line, last_line),
+                    ('semantic tokens range', document.uri), document)
+
+        # the response of the request in flight triggers the next one if the version changed meanwhile
+        if (tokens.full_version != _version or tokens.cached) and _provider.get('full', False) and not tokens.pending:
+            _base = None
+            if tokens.result_id is not None and isinstance(_provider['full'], dict) and _provider['full'].get('delta'):
+                _base = tokens.result_id
+                _request = self.lsp_msg.semanticTokensFullDelta(document.uri, _base)
+            else:
+                _request = self.lsp_msg.semanticTokensFull(document.uri)
+            if self._send_request(_request, [server]):
+                tokens.cached = False
+                tokens.request_sent(_version)
+                self._register_response_handler(
+                    lambda msg: self.semantic_tokens_full_response_handler(msg, document, _version, _base, server),
+                    on_failure=tokens.request_ended)
+
+
+    def _paint_semantic_tokens(self):
+        ''' paints the visible lines, returns False if no tokens are available for them '''
+        server = self._semantic_tokens_server() if self.current_document is not None else None
+        if server is None:
+            return False
+        first_line, last_line = visible_line_range()
+        painted = self.current_document.semantic_tokens.paint(editor, self._get_file_version(), first_line, last_line,
+                            self.semantic_token_colors[server], self._position_codec())
+        if painted:
+            self._shown('indicatorFillRange', self.current_document.path, first_line, last_line)
+        return painted
+
+
+    def _on_document_changed(self, document):
+        ''' called once the user paused typing '''
+        if self.lsp_doc_flag and document is self.current_document:
+            self._send_did_change()
+            self._request_semantic_tokens()
+            self._send_foldingRange()
+            self._request_eol_annotations()
+            self._index_symbols()
+            self._suspend_documents()
+
+
+    def _suspend_documents(self):
+        ''' closes the documents on the server which haven't been activated for a while '''
+        if self.com_manager.waiting_for_initialize_result:
+            return
+        suspend = self.suspension.candidates(self.documents, self.current_document, self._document_servers)
+        if not suspend:
+            return
+        for server in {server for document in suspend for server in self._document_servers(document)}:
+            self.suspension.record_memory(server, process_memory(self.com_manager.server_pid(server)))
+        for document in suspend:
+            # everything else is kept, the document gets reopened with its current text on activation
+            self.com_manager.send_to_servers(self._document_servers(document), self.lsp_msg.didClose(document.uri))
+            document.is_open = False
+            document.semantic_tokens.result_id = None
+            self.prefetcher.invalidate(document.uri)
+            self.suspension.record_suspended(document)
+
+
+    @staticmethod
+    def _notification_key(decoded_message, server=None):
+        ''' notifications of the same key supersede each other if they arrive within one ui tick '''
+        _method = decoded_message.get('method', None)
+        if _method == 'textDocument/publishDiagnostics':
+            return _method, decoded_message['params']['uri'], server
+        return None
+
+
+    def _notification_handler(self, decoded_message, server=None):
         _method = decoded_message.get('method', None)
         if _method == 'textDocument/publishDiagnostics':
             # if editor.getModify():
                 # return
+            if not self._feature_enabled(server, 'diagnostics'):
+                log(f'diagnostics of {server} ignored')
+                return
             # TODO: for now every diagnostic message clears the console
             console.clear()
-            _file = url2pathname(decoded_message['params']['uri'].replace('file:', ''))
-            if decoded_message['params']['diagnostics']:
+            _diagnostics = self._update_diagnostics(decoded_message['params']['uri'],
+                                                    decoded_message['params']['diagnostics'], server)
+            _file = uri_to_path(decoded_message['params']['uri'])
+            if _diagnostics:
                 diag_dict = dict()
                 console_output = []
-                for item in decoded_message['params']['diagnostics']:
+                for item in _diagnostics:
                     # _code = item.get('code', '')
                     _message = item.get('message', 'MESSAGE:???')
                     _severity = item.get('severity', '1')
@@ -300,32 +973,58 @@ class LSPCLIENT():
                 log(f'{_file}, {diag_msgs}')
                 print('\n'.join(console_output))
 
-        elif _method == 'window/progress':
-            if decoded_message['params']['done']:
-                pass  # TODO: reset statusbar
-            else:
-                _message = decoded_message['params']['message']
-                _title = decoded_message['params']['title']
-                notepad.setStatusBar(STATUSBARSECTION.DOCTYPE, f'{_title} - {_message}')
         else:
             log(f'unknown notification received: {decoded_message}')
 
 
-    @staticmethod
-    def signature_response_handler(decoded_message):
+    def _show_progress(self):
+        text = self.progress.status()
+        if text is None:
+            # indexing has ended, the section shows the language again
+            text = notepad.getLanguageDesc(notepad.getLangType())
+        notepad.setStatusBar(STATUSBARSECTION.DOCTYPE, text)
+        self._shown('setStatusBar', text)
+
+
+    def signature_response_handler(self, decoded_message):
         if decoded_message['result'].get('signatures', None):
             tip = '{}\n\n{}'.format(decoded_message['result']['signatures'][0]['label'],
                                     decoded_message['result']['signatures'][0]['documentation'][:1000])
             if tip.strip():
                 editor.callTipShow(editor.getCurrentPos(), tip)
+                self._shown('callTipShow', tip)
 
 
-    @staticmethod
-    def _show_completion_list(_completion_list):
+    def _show_completion_list(self, _completion_list, length_entered=0):
         editor.autoCCancel()
         editor.autoCSetSeparator(ord('\n'))
         editor.autoCSetOrder(ORDERING.CUSTOM)
-        editor.autoCShow(0, '\n'.join(_completion_list))
+        editor.autoCShow(length_entered, _completion_list)
+        self._shown('autoCShow', length_entered, _completion_list)
+
+
+    def _completion_prefix(self):
+        ''' the word typed since the completion was requested, '' if there is none '''
+        caret = editor.getCurrentPos()
+        if self.completion_start is None or caret <= self.completion_start:
+            return ''
+        prefix = editor.getTextRange(self.completion_start, caret)
+        return prefix if all(char.isalnum() or char == '_' for char in prefix) else ''
+
+
+    def _completion_list(self, items, incomplete=False):
+        ''' keeps the items for resolving them later, returns the ranked list to show '''
+        _servers = self._servers_for('textDocument/completion')
+        return self.completion_items.show(items, _servers[0] if _servers else self.current_language,
+                                          self._completion_prefix(), incomplete)
+
+
+    def _filter_completion_list(self, more=False):
+        ''' shows the list again for the typed prefix, unless it would show the same entries '''
+        prefix = self._completion_prefix()
+        completion_list = self.completion_items.render(prefix, more)
+        if completion_list is not None:
+            self._show_completion_list(completion_list, len(prefix))
 
 
     def completion_response_handler(self, decoded_message):
@@ -333,79 +1032,56 @@ class LSPCLIENT():
         if 'items' in decoded_message['result']:
             if decoded_message['result']['items']:
                 if 'label' in decoded_message['result']['items'][0]:
-                    if decoded_message['result']['isIncomplete'] is False:
-                        completion_list = [x['insertText'] for x in decoded_message['result']['items']]
-                        # editor.autoCShow(0, '\n'.join(sorted(completion_list)))
-                        self._show_completion_list(completion_list)
-                    else:
-                        log('wait for additional data')
+                    # an incomplete list is shown as well, typing requests it again instead of filtering it
+                    completion_list = self._completion_list(decoded_message['result']['items'],
+                                                            decoded_message['result'].get('isIncomplete', False))
+                    self._show_completion_list(completion_list, len(self.completion_items.prefix))
                 else:
                     log('?? something else ??')
         else:
             if decoded_message['result']:
-                completion_list = [x['insertText'] for x in decoded_message['result']]
-                self._show_completion_list(completion_list)
+                completion_list = self._completion_list(decoded_message['result'])
+                self._show_completion_list(completion_list, len(self.completion_items.prefix))
 
  
-    def document_symbol_response_handler(self, decoded_message):
-        # How to visualize is the question??
+    def document_symbol_response_handler(self, decoded_message, _uri, _version, on_indexed=None, server=None):
+        # either SymbolInformation[]
         # {"jsonrpc":"2.0","id":2,"result":[
         # {"name":"json","containerName":null,"location":{"uri":"...","range":{"start":{"line":0,"character":0},"end":{"line":0,"character":11}}},"kind":2},
         # {"name":"Test","containerName":null,"location":{"uri":"...","range":{"start":{"line":3,"character":0},"end":{"line":13,"character":0}}},"kind":5},
-        # {"name":"t",   "containerName":null,"location":{"uri":"...","range":{"start":{"line":15,"character":0},"end":{"line":15,"character":10}}},"kind":13}]}    
         # {"name":"__init__","containerName":"Test","location":{"uri":"...","range":{"start":{"line":5,"character":4},"end":{"line":7,"character":0}}},"kind":6},
-        # {"name":"start",   "containerName":"Test","location":{"uri":"...","range":{"start":{"line":8,"character":4},"end":{"line":10,"character":0}}},"kind":6},
-        # {"name":"stop",    "containerName":"Test","location":{"uri":"...","range":{"start":{"line":11,"character":4},"end":{"line":13,"character":0}}},"kind":6},
-        symbol_list = []
-        for symbol in decoded_message['result']:
-            if symbol['kind'] in [5, 6, 12]:
-                symbol_list.append(f'{symbol["containerName"]}->{symbol["name"]}')
-        log('\n'.join(symbol_list))
-
-
-    @staticmethod
-    def __format_document(item):
-        new_content = item['newText']
-        _start_line = item['range']['start']['line']
-        _start_char_pos = item['range']['start']['character']
-        _end_line = item['range']['end']['line']
-        _end_char_pos = item['range']['end']['character']
-        start = editor.positionFromLine(_start_line) + _start_char_pos
-        end = editor.positionFromLine(_end_line) + _end_char_pos
-        if start == -1 or end == -1:
-            log(f'ABORTED - negative position found:{item}')
-            return
-        editor.setTargetRange(start, end)
-        editor.replaceTarget(new_content)
+        # or a DocumentSymbol[] tree
+        # {"name":"Test","kind":5,"range":{...},"selectionRange":{...},"children":[{"name":"__init__","kind":6,...}]}
+        self.symbol_index.update(_uri, _version, decoded_message['result'])
+        document = self.documents.find(_uri)
+        if document is not None and server is not None:
+            self._cache_result(server, 'textDocument/documentSymbol', document, _version, decoded_message['result'])
+        log('\n'.join(f'{symbol[CONTAINER]}->{symbol[NAME]}' for symbol in self.symbol_index.symbols_of(_uri)))
+        if on_indexed is not None:
+            on_indexed()
 
 
     def document_formatting_handler(self, decoded_message):
         log(decoded_message)
-        editor.beginUndoAction()
         current_caret_pos = editor.getCurrentPos()
-        for item in reversed(decoded_message['result']):
-            self.__format_document(item)
-        # editor.setText(decoded_message['result'][0]['newText'])
+        apply_minimal_edits(editor, decoded_message['result'], self._position_codec().encoding,
+                            self.snapshots.text(editor, self.current_document))
         editor.gotoPos(current_caret_pos)
-        editor.endUndoAction()
 
 
     def document_range_formatting_handler(self, decoded_message):
         log(decoded_message)
-        editor.beginUndoAction()
         current_caret_pos = editor.getCurrentPos()
-        for item in reversed(decoded_message['result']):
-            self.__format_document(item)
+        apply_minimal_edits(editor, decoded_message['result'], self._position_codec().encoding,
+                            self.snapshots.text(editor, self.current_document))
         editor.gotoPos(current_caret_pos)
-        editor.endUndoAction()
 
 
     def goto_definition_response_handler(self, decoded_message):
         log(decoded_message)
         if decoded_message['result']:
-            _file = url2pathname(decoded_message['result'][0]['uri'].replace('file:', ''))
-            notepad.activateFile(_file)
-            editor.gotoLine(decoded_message['result'][0]['range']['start']['line'])
+            _start = decoded_message['result'][0]['range']['start']
+            self._goto_location(decoded_message['result'][0]['uri'], _start['line'], _start['character'])
 
 
     def _clear_peek_definition(self):
@@ -415,14 +1091,16 @@ class LSPCLIENT():
     def peek_definition_response_handler(self, decoded_message):
         log(decoded_message)
         if decoded_message['result']:
-            _file = url2pathname(decoded_message['result'][0]['uri'].replace('file:', ''))
+            _file = uri_to_path(decoded_message['result'][0]['uri'])
             _line_number = decoded_message['result'][0]['range']['start']['line']
             with open(_file) as f:
                 for i, line in enumerate(f):
                     if i == _line_number:
                         break
             cursor_line = editor.lineFromPosition(editor.getCurrentPos())
-            editor.annotationSetText(cursor_line, '\n{}\n'.format(line[:-1] if line.endswith('\n') else line))
+            text = '\n{}\n'.format(line[:-1] if line.endswith('\n') else line)
+            editor.annotationSetText(cursor_line, text)
+            self._shown('annotationSetText', cursor_line, text)
             editor.annotationSetStyle(cursor_line, self.PEEK_STYLE)
             editor.annotationSetVisible(ANNOTATIONVISIBLE.STANDARD)
 
@@ -432,39 +1110,45 @@ class LSPCLIENT():
         if 'contents' in decoded_message['result']:
             tip = decoded_message['result']['contents']
             if tip and self.current_hover_position != -1:
-                if isinstance(tip[0], dict) and 'value' in tip[0]:
-                    editor.callTipShow(self.current_hover_position, tip[0]['value'])
-                else:
-                    editor.callTipShow(self.current_hover_position, tip[0][:500])
+                tip = tip[0]['value'] if isinstance(tip[0], dict) and 'value' in tip[0] else tip[0][:500]
+                editor.callTipShow(self.current_hover_position, tip)
+                self._shown('callTipShow', tip)
                 self.current_hover_position = -1
 
 
     def reference_response_handler(self, decoded_message):
-        log(decoded_message)
         # {'jsonrpc': '2.0', 'id': 4, 'result': [
         # {'uri': 'file:///d:/.../test.py', 'range': {'start': {'line': 8, 'character': 8}, 'end': {'line': 8, 'character': 13}}}, 
         # {'uri': 'file:///d:/.../test.py', 'range': {'start': {'line': 16, 'character': 2}, 'end': {'line': 16, 'character': 7}}}]}
-        # How to visualize is the question??
+        # the preview text of the lines is read by the results panel, only for the rows it shows
+        paths = dict()
         references = []
-        if decoded_message['result']:
-            for reference in decoded_message['result']:
-                _line = reference['range']['start']['line']
-                _file = url2pathname(reference['uri'].replace('file:', ''))
-                references.append((_file, _line))
-            log('\n'.join(['{}\r\n  {}'.format(*x) for x in references]))
-
-
-    def code_lens_response_handler(self, decoded_message):
-        if decoded_message['result']:
-            log(decoded_message)
+        for reference in decoded_message['result']:
+            _uri = reference['uri']
+            _file = paths.get(_uri)
+            if _file is None:
+                _file = paths[_uri] = uri_to_path(_uri)
+            _start = reference['range']['start']
+            references.append((_uri, _file, _start['line'], _start['character'], None))
+        log(f'{len(references)} references received')
+        self.results.show(f'References ({len(references)})', references, 'references')
+
+
+    def eol_annotations_response_handler(self, decoded_message, document, _version, method, first_line, last_line):
+        # unresolved code lenses have no command yet, they are not shown
+        labels = (inlay_hint_labels if method == INLAY_HINT else code_lens_labels)(decoded_message.get('result'))
+        if not document.eol_annotations.set(method, _version, first_line, last_line, labels):
+            log(f'outdated {method} response for {document.path} version {_version} dropped')
+        elif document is self.current_document:
+            self._paint_eol_annotations()
 
 
     def _send_rename(self):
         _current_word = editor.getWord()
         new_name = notepad.prompt('Provide the new name to be used', 'Rename to ...', _current_word)
         log(f'{new_name=}')
-        self.com_manager.send(self.lsp_msg.rename(*self.__TextDocumentPositionParams(), _new_name=new_name))
-        self.open_results[self.lsp_msg.request_id] = self.rename_response_handler
+        if self._send_request(self.lsp_msg.rename(*self.__TextDocumentPositionParams(), _new_name=new_name)):
+            self._register_response_handler(self.rename_response_handler, 'rename', self.current_document)
 
 
     def rename_response_handler(self, decoded_message):
@@ -474,26 +1158,21 @@ class LSPCLIENT():
         # 'start': {'character': 0, 'line': 0}}}],
         # 'textDocument': {'uri': 'file:///d:/...', 'version': None}}]}}
         if decoded_message['result']:
-            editor.beginUndoAction()
-            for changes in decoded_message['result']['documentChanges']:
-                for change in changes['edits']:
-                    _file = url2pathname(changes['textDocument']['uri'].replace('file:', ''))
-                    notepad.open(_file)
-                    start_line = change['range']['start']['line']
-                    end_line = change['range']['end']['line']
-                    start_position = editor.positionFromLine(start_line) + change['range']['start']['character']
-                    end_position = editor.positionFromLine(end_line) + change['range']['end']['character']
-                    editor.setTargetRange(start_position, end_position)
-                    editor.replaceTarget(change['newText'])
-            editor.endUndoAction()
+            _failure = self._apply_edit(decoded_message['result'])
+            if _failure:
+                log(f'rename not applied: {_failure}')
 
 
     def prepare_rename_response_handler(self, decoded_message):
         log(decoded_message)
 
 
-    def folding_range_response_handler(self, decoded_message):
-        log(decoded_message)
+    def folding_range_response_handler(self, decoded_message, document, _version, server):
+        if document is not self.current_document or _version != document.version:
+            log(f'outdated folding ranges for {document.path} version {_version} dropped')
+            return
+        self._apply_folding(document, decoded_message['result'])
+        self._cache_result(server, 'textDocument/foldingRange', document, _version, decoded_message['result'])
 
 
     def declaration_response_handler(self, decoded_message):
@@ -509,52 +1188,306 @@ class LSPCLIENT():
 
 
     def workspace_symbol_response_handler(self, decoded_message):
-        log(decoded_message)
+        symbols = [symbol for symbol in flatten_symbols(None, decoded_message['result']) if symbol[URI]]
+        log(f'{len(symbols)} workspace symbols received')
+        if len(symbols) == 1:
+            self._goto_location(symbols[0][URI], symbols[0][LINE], symbols[0][CHARACTER])
+        elif symbols:
+            rows = []
+            for symbol in symbols:
+                _container = f'{symbol[CONTAINER]}.' if symbol[CONTAINER] else ''
+                _kind = SymbolKind(symbol[KIND]).name if symbol[KIND] in SymbolKind.__members__.values() else ''
+                rows.append((symbol[URI], uri_to_path(symbol[URI]), symbol[LINE], symbol[CHARACTER],
+                             f'{_container}{symbol[NAME]}  {_kind}'))
+            self.results.show(f'Workspace symbols ({len(rows)})', rows, 'symbols')
+
+
+    def semantic_tokens_full_response_handler(self, decoded_message, document, _version, _base, server):
+        if not document.semantic_tokens.apply_response(decoded_message['result'], _version, _base):
+            if document is self.current_document:
+                self._request_semantic_tokens()
+            return
+        # a delta result is stored as the full data it results in
+        self._cache_result(server, 'textDocument/semanticTokens/full', document, _version,
+                           {'data': document.semantic_tokens.data[:]})
+        if document is self.current_document:
+            self._paint_semantic_tokens()
+            # typed while the request was in flight
+            if _version != document.version:
+                self._request_semantic_tokens()
+
+
+    def semantic_tokens_range_response_handler(self, decoded_message, document, _version, first_line, last_line):
+        tokens = document.semantic_tokens
+        if tokens.full_version == _version:
+            return
+        tokens.set_range(decoded_message['result'], _version, first_line, last_line)
+        if document is self.current_document:
+            self._paint_semantic_tokens()
+
+
+    def _on_initialize_result(self, decoded_message, _server):
+        ''' a server has been initialized, runs on the gui thread '''
+        _language = self._config(_server).get('language', self.workspaces.config_of(_server))
+        # known before the server gets initialized and may register further capabilities
+        _capabilities = decoded_message['result']['capabilities']
+        self.server_capabilities[_server] = _capabilities
+        self.com_manager.send_initialized(_server, self.lsp_msg.initialized())
+        _settings = self._config(_server).get('settings')
+        if _settings:
+            self.com_manager.send_to_server(_server, self.lsp_msg.didChangeConfiguration(_settings))
+        # codecs created before the result arrived assumed utf-16, positions are converted with the
+        # encoding of the first server of a language, with several servers only utf-16 is offered
+        for document in self.documents:
+            document.position_codec = None
+        _provider = _capabilities.get('semanticTokensProvider')
+        if _provider and 'legend' in _provider:
+            self.semantic_token_colors[_server] = legend_colors(_provider['legend'])
+            if self.result_cache is not None:
+                self.result_cache.put(self._cache_key(_server), LEGEND, '', _provider['legend'])
+            self._request_semantic_tokens()
+        self._send_foldingRange()
+        self._request_eol_annotations()
+        _triggers = self.current_triggers.setdefault(_language, {'signatureHelpProvider': [],
+                                                                 'completionProvider': []})
+        for k, v in self._get_trigger_chars(decoded_message, ['signatureHelpProvider',
+                                                              'completionProvider']):
+            if self._feature_enabled(_server, k[:-len('Provider')]):
+                triggers = [ord(x) for x in v.get('triggerCharacters', [])]
+                # the trigger characters of all servers of the language
+                _triggers[k] = sorted(set(_triggers[k]).union(triggers))
+
+
+    def _result_handler(self, decoded_message, server=None):
+        _id = decoded_message['id']
+        if self.shutdown.response_received(_id):
+            return
+        self.completion_items.received(_id, server, decoded_message.get('result'))
+        decoded_message = self.fan_out.collect(decoded_message, server)
+        if decoded_message is None:
+            return
+        if self.prefetcher.is_prefetch(_id):
+            self.prefetcher.completed(_id, decoded_message.get('result'))
+            self.metrics.response_handled(_id)
+        else:
+            self._dispatch_result(decoded_message)
 
 
-    def _result_handler(self, decoded_message):
-        if decoded_message['id'] in self.open_results:
-            _handler = self.open_results.pop(decoded_message['id'])
+    def _dispatch_result(self, decoded_message, retry=True):
+        ''' passes a response to its registered handler, called on the reader threads, on the gui thread to retry '''
+        _id = decoded_message['id']
+        if _id in self.open_results:
+            _handler, _key, _document, _version, _on_failure = self.open_results.pop(_id)
             if 'error' in decoded_message or not decoded_message['result']:
+                self.metrics.response_handled(_id)
+                if _on_failure is not None:
+                    self.ui.post(_on_failure)
                 return
-            _handler(decoded_message)
+
+            def _handle():
+                _handler(decoded_message)
+                self.metrics.response_handled(_id)
+
+            def _dropped():
+                self.metrics.response_dropped(_id)
+                if _on_failure is not None:
+                    _on_failure()
+            self.ui.post(_handle, _key, _document, _version, _dropped)
+        elif retry:
+            # a fast response may overtake the registration of its handler, which follows on the gui thread
+            self.ui.post(lambda: self._dispatch_result(decoded_message, retry=False))
         else:
+            self.metrics.response_dropped(_id)
             log(f'Unexpected message received: {decoded_message}')
 
 
-    def resolve_response_handler(self, decoded_message):
-        log(decoded_message)
+    def _respond(self, server, decoded_message, result=None):
+        self.com_manager.send_to_server(server, self.lsp_msg.response(decoded_message, result))
 
 
-    def on_receive(self, message):
+    def _server_request_handler(self, decoded_message, server):
+        ''' dispatches a request of the server, called on its reader thread '''
+        _method = decoded_message['method']
+        handler = self.server_request_handlers.get(_method)
+        if handler is None:
+            log(f'unsupported server request: {decoded_message}')
+            self.com_manager.send_to_server(server, self.lsp_msg.error_response(
+                decoded_message, ErrorCodes.MethodNotFound, f'{_method} is not supported'))
+            return
+        try:
+            handler(decoded_message, server)
+        except Exception as e:  # pylint: disable=W0703
+            log(f'{_method} failed: {e}')
+            self.com_manager.send_to_server(server, self.lsp_msg.error_response(
+                decoded_message, ErrorCodes.InternalError, str(e)))
+
+
+    @staticmethod
+    def _settings_section(settings, section):
+        ''' returns the value of a dotted section like python.analysis, None if it doesn't exist '''
+        if not section:
+            return settings
+        if section in settings:
+            return settings[section]
+        value = settings
+        for part in section.split('.'):
+            if not isinstance(value, dict) or part not in value:
+                return None
+            value = value[part]
+        return value
+
+
+    def _on_configuration_request(self, decoded_message, server):
+        _settings = self._config(server).get('settings', {})
+        self._respond(server, decoded_message, [self._settings_section(_settings, item.get('section'))
+                                                for item in decoded_message['params']['items']])
+
+
+    def _on_workspace_folders_request(self, decoded_message, server):
+        self._respond(server, decoded_message, [workspace_folder(root) for root in self.workspaces.folders.get(server, [])])
+
+
+    def _on_register_capability(self, decoded_message, server):
+        self.server_capabilities.register(server, decoded_message['params']['registrations'])
+        self._respond(server, decoded_message)
+        self._update_file_watchers(server)
+
+
+    def _on_unregister_capability(self, decoded_message, server):
+        # the specification misspells it as unregisterations
+        _params = decoded_message['params']
+        self.server_capabilities.unregister(server, _params.get('unregisterations', _params.get('unregistrations', [])))
+        self._respond(server, decoded_message)
+        self._update_file_watchers(server)
+
+
+    def _on_work_done_progress_create(self, decoded_message, server):
+        self.progress.create(server, decoded_message['params']['token'])
+        self._respond(server, decoded_message)
+
+
+    def _on_apply_edit(self, decoded_message, server):
+        # the edits need the gui thread, the response is sent once they have been applied
+        self.ui.post(lambda: self._apply_workspace_edit_or_fail(decoded_message, server))
+
+
+    def _apply_workspace_edit_or_fail(self, decoded_message, server):
+        ''' the server waits for a response, it gets an error one if applying the edit raised '''
+        try:
+            self._apply_workspace_edit(decoded_message, server)
+        except Exception as e:  # pylint: disable=W0703
+            log(f'workspace/applyEdit failed: {e}')
+            self.com_manager.send_to_server(server, self.lsp_msg.error_response(
+                decoded_message, ErrorCodes.InternalError, str(e)))
+
+
+    def _apply_workspace_edit(self, decoded_message, server):
+        ''' applies the edit of a workspace/applyEdit request and responds whether it has been applied '''
+        _failure = self._apply_edit(decoded_message['params']['edit'])
+        self._respond(server, decoded_message, {'applied': False, 'failureReason': _failure} if _failure
+                      else {'applied': True})
+
+
+    def _apply_edit(self, _edit):
+        '''
+            Applies a WorkspaceEdit, each document in one undo action with the minimal edits engine.
+            File operations (create, rename, delete) are not supported. Nothing gets applied
+            if an open document isn't at the version the edit is for.
+
+            Args:
+                _edit: lsp WorkspaceEdit, of a workspace/applyEdit request or a rename response
+
+            Returns: None if it has been applied, the reason otherwise
+        '''
+        changes = {uri: (None, edits) for uri, edits in (_edit.get('changes') or {}).items()}
+        for change in _edit.get('documentChanges') or []:
+            if 'kind' in change:
+                return f'{change["kind"]} is not supported'
+            _uri = change['textDocument']['uri']
+            _version, edits = changes.get(_uri, (None, []))
+            changes[_uri] = (change['textDocument'].get('version'), edits + change['edits'])
+
+        for _uri, (_version, edits) in changes.items():
+            # the server may spell the uri differently, e.g. the drive letter
+            document = self.documents.find(path_to_uri(uri_to_path(_uri)))
+            if _version is not None and document is not None and document.is_open and _version != document.version:
+                return f'{document.path} is at version {document.version}, the edit is for version {_version}'
+
+        _buffer_id = notepad.getCurrentBufferID()
+        try:
+            for _uri, (_version, edits) in changes.items():
+                notepad.open(uri_to_path(_uri))
+                # current_document is still the previous one, on_modified invalidates this one
+                document = self.edited_document = self._active_document()
+                # it might have been changed while it was not visible
+                self.snapshots.invalidate(document)
+                if document.position_codec is not None:
+                    document.position_codec.clear()
+                apply_minimal_edits(editor, edits, self._position_codec(document).encoding,
+                                    self.snapshots.text(editor, document))
+                if document.is_open:
+                    self._send_did_change(document)
+        finally:
+            self.edited_document = None
+            notepad.activateBufferID(_buffer_id)
+        return None
+
+
+    def resolve_response_handler(self, decoded_message, server, item, index):
+        tip = self.completion_items.resolved_item(server, item, decoded_message['result'])
+        # the list may have been closed, moved on or replaced by another one meanwhile
+        if editor.autoCActive() and editor.autoCGetCurrent() == index and self.completion_items.item(index)[1] is item:
+            self._show_completion_tip(tip)
+
+
+    def _show_completion_tip(self, tip):
+        if tip:
+            editor.callTipShow(editor.getCurrentPos(), tip)
+            self._shown('callTipShow', tip)
+        else:
+            editor.callTipCancel()
+
+
+    def on_receive(self, message, first_byte_ns=None, server=None):
         ''' called from process manager if message was read from msg_queue
             message is a dict created by json.loads
+            first_byte_ns is the time.perf_counter_ns() timestamp when the message started to arrive
+            server is the language of the server which sent the message
         '''
+        read_ns = time.perf_counter_ns()
         if message:
             log(message)
             decoded_message, error = self.lsp_msg.decode(message)
             if error:
                 log(decoded_message)
             else:
+                if self.recorder is not None:
+                    self.recorder.message_received(server or self.current_language, decoded_message)
                 if decoded_message:
+                    if 'id' in decoded_message and 'method' not in decoded_message:
+                        self.metrics.response_decoded(decoded_message['id'], first_byte_ns,
+                                                      read_ns, time.perf_counter_ns())
                     if 'result' in decoded_message:
                         if not decoded_message['result'] is None and 'capabilities' in decoded_message['result']:
-                            self.com_manager.send_initialized(self.lsp_msg.initialized())
-                            for k, v in self._get_trigger_chars(decoded_message, ['signatureHelpProvider',
-                                                                                  'completionProvider']):
-                                triggers = [ord(x) for x in v.get('triggerCharacters', [])]
-                                if k == 'signatureHelpProvider':
-                                    self.current_triggers[self.current_language]['signatureHelpProvider'] = triggers
-                                elif k == 'completionProvider':
-                                    self.current_triggers[self.current_language]['completionProvider'] = triggers
+                            _server = server or self.current_language
+                            # reads and paints the editor, sends requests
+                            self.ui.post(lambda: self._on_initialize_result(decoded_message, _server))
                         else:
-                            self._result_handler(decoded_message)
+                            self._result_handler(decoded_message, server)
                     elif 'error' in decoded_message:
-                        self._result_handler(decoded_message)
+                        self._result_handler(decoded_message, server)
+                    elif decoded_message.get('method') == '$/progress':
+                        # aggregated here, the status bar gets updated at most a few times per second
+                        if not self.progress.progress(server or self.current_language, decoded_message['params']):
+                            log(f'unsupported progress: {decoded_message}')
+                    elif decoded_message.get('method') == 'window/progress':
+                        self.progress.legacy_progress(server or self.current_language, decoded_message['params'])
                     elif 'id' not in decoded_message:
-                        self._notification_handler(decoded_message)
+                        _server = server or self.current_language
+                        self.ui.post(lambda: self._notification_handler(decoded_message, _server),
+                                     self._notification_key(decoded_message, _server))
                     else:
-                        self.com_manager.send(self.lsp_msg.response(decoded_message))
+                        self._server_request_handler(decoded_message, server or self.current_language)
         else:
             log(f'got corrupted message:{message}')
 
@@ -562,36 +1495,64 @@ class LSPCLIENT():
     def on_buffer_activated(self, args):
         log(f'{args}')
         self.current_language = notepad.getLanguageName(notepad.getLangType()).upper()
-        if args['bufferID'] not in self.open_files_dict:
-            self.current_file = notepad.getCurrentFilename()
-            self.open_files_dict[args['bufferID']] = self.current_file
-        else:
-            self.current_file = self.open_files_dict[args['bufferID']]
+        _path = notepad.getBufferFilename(args['bufferID'])
+        previous = self.documents.lookup(args['bufferID'])
+        if previous is not None and previous.path != _path and previous.is_open:
+            # saved under a new name, the server only knows the old one
+            self.com_manager.send(self.lsp_msg.didClose(previous.uri))
+            self.symbol_index.remove(previous.uri)
+        document = self.current_document = self.documents.get(args['bufferID'], _path, self.current_language.lower())
+
+        # the document might have been changed while it was not visible, e.g. by replace in all open documents
+        self.snapshots.invalidate(document)
+        if document.position_codec is not None:
+            document.position_codec.clear()
 
         # temporary files are not supported
-        if self.current_file.rpartition('\\')[0] == '':
+        if document.path.rpartition('\\')[0] == '':
             log('temporary files are not supported (yet?)')
             self.lsp_doc_flag = False
             return
 
         if self.current_language in self.available_lsp_servers:
             self.lsp_doc_flag = True
-            if not self.com_manager.already_initialized(self.current_language):
-                self.current_triggers[self.current_language] = {'signatureHelpProvider': [],
-                                                                'completionProvider': []}
-                self.com_manager.send(self.lsp_msg.initialize(self.current_file.rpartition('\\')[0], os.getpid()))
-                self.com_manager.waiting_for_initialize_result = True
-
-            _version = self._get_file_version()
-
-            if _version == 0:
-                log(f'file {self.current_file} first seen')
-                self.com_manager.send(self.lsp_msg.didOpen(self.current_file,
-                                                           self.current_language.lower(),
-                                                           _version,
-                                                           editor.getText()
+            if document.root is None:
+                document.root = self.roots.root_of(document.path)
+            # notepad++ turned the folding of the lexer on again, it would overwrite the server's levels
+            if document.folding_ranges.restore(editor):
+                self._shown_folding(document)
+            if not self.com_manager.already_initialized(self._workspace_servers(document)):
+                self.current_triggers.setdefault(self.current_language, {'signatureHelpProvider': [],
+                                                                         'completionProvider': []})
+                # the same position params go to all servers of a language, they must agree on the encoding
+                _encodings = [UTF16] if len(self.com_manager.servers_of(self.current_language)) > 1 else None
+                self.com_manager.send_initialize(self.lsp_msg.initialize(document.root, os.getpid(),
+                                                                         [workspace_folder(document.root)],
+                                                                         _encodings))
+
+            self.suspension.activated(document)
+            if not document.is_open:
+                if document.snapshot_hash is None:
+                    log(f'file {document.path} first seen')
+                else:
+                    self.suspension.record_resumed(document)
+                _text = self.snapshots.text(editor, document)
+                self.com_manager.send(self.lsp_msg.didOpen(document.uri,
+                                                           document.language_id,
+                                                           document.version,
+                                                           _text
                                                            ))
-                self.sent_didopen_files.append(args['bufferID'])
+                document.is_open = True
+                _first_seen = document.snapshot_hash is None
+                document.snapshot_hash = hash(_text)
+                self._update_content_digest(document, _text)
+                if _first_seen:
+                    self._serve_cached_results(document)
+                self._send_foldingRange()
+            self._request_semantic_tokens()
+            self._request_eol_annotations()
+            self._index_symbols()
+            self._suspend_documents()
         else:
             log(f'{self.current_language} not in {self.available_lsp_servers}')
             self.lsp_doc_flag = False
@@ -599,24 +1560,29 @@ class LSPCLIENT():
 
     def on_file_before_save(self, args):
         if self.lsp_doc_flag:
-            _version = self._set_file_version()
             _reason = TextDocumentSaveReason.Manual
-            self.com_manager.send(self.lsp_msg.willSave(self.current_file, _version, _reason))
+            self.com_manager.send(self.lsp_msg.willSave(*self.__TextDocumentIdentifier(), _reason))
 
 
     def on_file_saved(self, args):
+        self.results.preview.invalidate(notepad.getBufferFilename(args['bufferID']))
         if self.lsp_doc_flag:
-            _version = self._set_file_version()
-            self._send_did_change(_version)
-            self.com_manager.send(self.lsp_msg.didSave(self.current_file, _version))
+            _version = self._send_did_change()
+            self.com_manager.send(self.lsp_msg.didSave(self.current_document.uri, _version))
 
 
     def on_file_closed(self, args):
-        if args['bufferID'] in self.sent_didopen_files:
-            self.sent_didopen_files.remove(args['bufferID'])
-            self.com_manager.send(self.lsp_msg.didClose(self.open_files_dict[args['bufferID']]))
+        document = self.documents.release(args['bufferID'])
+        if document is None:
+            return
+        if document is self.current_document:
+            self.current_document = None
+            self.lsp_doc_flag = False
+        if document.is_open:
+            self.com_manager.send_to_servers(self._document_servers(document), self.lsp_msg.didClose(document.uri))
+            self.symbol_index.remove(document.uri)
             # if self._dialog:
-                # self._dialog.sci_ctrl.SetDiagnostics(self.open_files_dict[args['bufferID']], '')
+                # self._dialog.sci_ctrl.SetDiagnostics(document.path, '')
 
 
     def on_char_added(self, args):
@@ -627,25 +1593,90 @@ class LSPCLIENT():
             elif (args['ch'] in self.current_triggers[self.current_language]['signatureHelpProvider'] or
                   args['ch'] in self.current_triggers[self.current_language]['completionProvider']):
 
-                cur_pos = editor.getCurrentPos()
-                _line = editor.lineFromPosition(cur_pos)
-                _character_pos = cur_pos - editor.positionFromLine(_line)
-                _version = self._set_file_version()
-
-                self._send_did_change(_version)
+                self._send_did_change()
 
                 if args['ch'] in self.current_triggers[self.current_language]['signatureHelpProvider']:
-                    self.com_manager.send(self.lsp_msg.signatureHelp(self.current_file,
-                                                                     self.current_language.lower(),
-                                                                     _version,
-                                                                     editor.getText(),
-                                                                     _line,
-                                                                     _character_pos))
-                    self.open_results[self.lsp_msg.request_id] = self.signature_response_handler
+                    if self._send_request(self.lsp_msg.signatureHelp(*self.__TextDocumentPositionParams())):
+                        self._register_response_handler(self.signature_response_handler, 'signature', self.current_document)
 
                 else:
-                    self.com_manager.send(self.lsp_msg.completion(*self.__TextDocumentPositionParams()))
-                    self.open_results[self.lsp_msg.request_id] = self.completion_response_handler
+                    self._send_completion(editor.getCurrentPos())
+
+            elif self.completion_items.items and editor.autoCActive():
+                if self.completion_items.incomplete:
+                    # the items typed since the trigger character are ranked against the new list
+                    self._send_did_change()
+                    self._send_completion(self.completion_start)
+                else:
+                    self._filter_completion_list()
+
+
+    def _send_completion(self, completion_start):
+        if self._send_request(self.lsp_msg.completion(*self.__TextDocumentPositionParams())):
+            self.completion_start = completion_start
+            self.completion_items.started(self.lsp_msg.request_id)
+            self._register_response_handler(self.completion_response_handler, 'completion', self.current_document)
+
+
+    def on_modified(self, args):
+        if args['modificationType'] & (MODIFICATIONFLAGS.INSERTTEXT | MODIFICATIONFLAGS.DELETETEXT):
+            document = self.edited_document or self.current_document
+            if document is None:
+                return
+            self.snapshots.invalidate(document)
+            self.prefetcher.invalidate(document.uri)
+            _line = editor.lineFromPosition(args['position'])
+            if document.position_codec is not None:
+                document.position_codec.lines_changed(_line, args['linesAdded'])
+            if document is not self.current_document:
+                # a workspace edit of another document, which sends its didChange itself
+                if args['linesAdded']:
+                    document.folding_ranges.lines_changed(_line, args['linesAdded'])
+            elif self.lsp_doc_flag:
+                if args['linesAdded']:
+                    document.folding_ranges.lines_changed(_line, args['linesAdded'])
+                self.document_changed.trigger(document)
+
+
+    def on_update_ui(self, args):
+        self.ui.drain()
+        if self.lsp_doc_flag and args['updated'] & UPDATE.V_SCROLL:
+            if not self._paint_semantic_tokens():
+                self.visible_range_changed.trigger()
+            self._paint_eol_annotations()
+            self.scroll_settled.trigger()
+        if self.prefetch_enabled and self.lsp_doc_flag and args['updated'] & UPDATE.SELECTION:
+            self.caret_idle.trigger()
+
+
+    def on_autoc_selection_change(self, args):
+        # user lists, like the one of goto symbol, have a list type
+        if args.get('listType', 0) or not self.lsp_doc_flag:
+            return
+        index = editor.autoCGetCurrent()
+        tip = self.completion_items.tip(index)
+        if tip is None:
+            self.selection_rested.trigger(index)
+        else:
+            self.selection_rested.cancel()
+            self._show_completion_tip(tip)
+
+
+    def on_autoc_selection(self, args):
+        if args.get('listType', 0):
+            return
+        if self.completion_items.is_more(args['text']):
+            # cancelled within the notification the entry doesn't get inserted
+            editor.autoCCancel()
+            self.ui.post(lambda: self._filter_completion_list(more=True))
+        else:
+            self.completion_items.used(args['text'])
+
+
+    def on_user_list_selection(self, args):
+        if args['listType'] == SYMBOL_LIST_TYPE and args['text'] in self.symbol_list_items:
+            symbol = self.symbol_list_items[args['text']]
+            self._goto_location(symbol[URI], symbol[LINE], symbol[CHARACTER])
 
 
     def on_dwell_end(self, args):
@@ -655,3 +1686,5 @@ class LSPCLIENT():
     def on_dwell_start(self, args):
         if args['position'] != -1:
             self._send_hover(args['position'])
+            if self.prefetch_enabled:
+                self._prefetch_definition(args['position'])
@@ -0,0 +1,263 @@
+'''
+    The items of the shown completion list, ranked, capped and resolved one at a time
+
+    Long lists, e.g. 30000 items of c++ with a large include set, are not
+    shown completely. The items get ordered by sortText, or label, once per
+    response, the list shows the recently completed ones first, then the ones
+    starting with the typed prefix in the same case, then the others starting
+    with it ignoring case, at most max_shown of them. The last entry, like
+    "... 29800 more", shows the next max_shown on selection. Typing a further
+    character filters the list again, the rendered string is reused and the
+    list not shown again as long as the entries stay the same.
+
+    The client advertises resolveSupport for documentation and detail,
+    servers leave them out of the completion response then, which keeps it
+    small for long lists. Only the item highlighted in the autocompletion
+    list gets resolved, once the selection rested for a moment, and is shown
+    as a calltip. Resolved tips are cached per item, going back and forth in
+    the list or completing the same name again doesn't ask again.
+
+    An item is resolved by the server which sent it, responses of a fan out
+    are recorded as they arrive, merge_completions keeps the first item of
+    the same label and insert text, that is the server recorded first.
+'''
+import time
+from itertools import islice
+from collections import OrderedDict
+import logging
+log = logging.info
+
+# seconds the highlighted item must stay selected before it gets resolved
+RESOLVE_DELAY = 0.15
+MAX_TIPS = 512
+MAX_TIP_LENGTH = 1000
+MAX_SHOWN = 200
+MAX_RECENT = 256
+MORE = '... {} more'
+
+
+def completion_tip(item):
+    ''' returns the detail and the documentation of a CompletionItem, None if it has neither '''
+    documentation = item.get('documentation')
+    if isinstance(documentation, dict):
+        # MarkupContent
+        documentation = documentation.get('value')
+    parts = [part for part in (item.get('detail'), documentation) if part and part.strip()]
+    if not parts:
+        return None
+    return '\n\n'.join(parts)[:MAX_TIP_LENGTH]
+
+
+class COMPLETION_ITEMS:
+    def __init__(self, max_tips=MAX_TIPS, max_shown=MAX_SHOWN):
+        self.max_tips = max_tips
+        self.max_shown = max_shown
+        self.request_id = None
+        self.origins = dict()  # (label, insertText) -> server, of the pending request
+        self.items = []  # CompletionItems of the response, as the server sent them
+        self.item_origins = dict()  # (label, insertText) -> server, of the shown response
+        self.default_server = None
+        self.texts = []  # text of each item
+        self.lowered = None  # lower case filterText of each item, once a prefix has been typed
+        self.order = []  # item indices ordered by sortText
+        self.positions = dict()  # text -> index of an item with it
+        self.matches = []  # item indices matching matched_prefix, ordered by sortText
+        self.matched_prefix = ''
+        self.shown = []  # item indices of the list entries, in list order
+        self.hidden = 0  # matching items beyond the shown ones
+        self.prefix = ''
+        self.incomplete = False
+        self.limit = max_shown
+        self.rendered = None  # (shown, hidden) of the rendered string
+        self.rendered_text = ''
+        self.recent = OrderedDict()  # completed text -> None, most recently used last
+        self.tips = OrderedDict()  # (server, label, insertText) -> tip, least recently used first
+        self.resolved = 0
+        self.hits = 0
+        self.eager = 0
+        self.renders = 0
+        self.reused = 0
+        self.render_seconds = 0
+
+
+    def started(self, request_id):
+        ''' a completion request has been sent, the origins of a previous one are of no interest anymore '''
+        self.request_id = request_id
+        self.origins = dict()
+
+
+    def received(self, request_id, server, result):
+        ''' records which server sent the items of a completion response, called on the reader threads '''
+        if request_id != self.request_id or not result:
+            return
+        for item in result.get('items', []) if isinstance(result, dict) else result:
+            self.origins.setdefault((item.get('label'), item.get('insertText')), server)
+
+
+    def show(self, items, default_server, prefix='', incomplete=False):
+        '''
+            Keeps and orders the items of a completion response
+
+            Args:
+                items: CompletionItem dicts, merged if several servers answered
+                default_server: server of items without a recorded origin
+                prefix: the text typed since the completion was requested
+                incomplete: the isIncomplete flag of the response, typing asks the servers again then
+
+            Returns: the list to show, separated by newlines
+            Raises: Nothing
+        '''
+        start = time.perf_counter()
+        self.items = items
+        self.incomplete = incomplete
+        self.item_origins = self.origins
+        self.default_server = default_server
+        self.origins = dict()
+        # shown in the list and inserted
+        self.texts = [item.get('insertText') or item['label'] for item in items]
+        keys = [item.get('sortText') or item['label'] for item in items]
+        self.order = sorted(range(len(items)), key=keys.__getitem__)
+        self.positions = dict(zip(self.texts, range(len(items))))
+        self.lowered = None
+        self.matches = self.order
+        self.matched_prefix = ''
+        self.limit = self.max_shown
+        self.rendered = None
+        self.render_seconds += time.perf_counter() - start
+        return self.render(prefix)
+
+
+    def render(self, prefix, more=False):
+        '''
+            Filters and ranks the items for prefix
+
+            Args:
+                prefix: the text typed since the completion was requested
+                more: True to show max_shown entries more than before
+
+            Returns: the list to show, separated by newlines, None if it is the one shown already
+            Raises: Nothing
+        '''
+        start = time.perf_counter()
+        self.renders += 1
+        if more:
+            self.limit += self.max_shown
+        self.prefix = prefix
+        lowered = prefix.lower()
+        texts = self.texts
+        matches = self._matches(lowered)
+        # recently completed first, most recent first, then the ones in the same case as typed
+        recent = [self.positions[text] for text in reversed(self.recent)
+                  if text in self.positions and (not lowered or self.lowered[self.positions[text]].startswith(lowered))]
+        taken = set(recent)
+        same_case = (index for index in matches if index not in taken and texts[index].startswith(prefix))
+        ranked = recent + list(islice(same_case, self.limit))
+        if len(ranked) < self.limit and lowered:
+            taken.update(ranked)
+            ranked.extend(islice((index for index in matches if index not in taken), self.limit - len(ranked)))
+        shown = ranked[:self.limit]
+        # the recent ones match the prefix too
+        hidden = len(matches) - len(shown)
+        self.render_seconds += time.perf_counter() - start
+        if self.rendered == (shown, hidden):
+            self.reused += 1
+            return None
+        self.shown = shown
+        self.hidden = hidden
+        self.rendered = (shown, hidden)
+        entries = [texts[index] for index in shown]
+        if hidden > 0:
+            entries.append(MORE.format(hidden))
+        self.rendered_text = '\n'.join(entries)
+        return self.rendered_text
+
+
+    def _matches(self, lowered):
+        ''' the item indices whose filterText starts with lowered, in sortText order '''
+        if not lowered:
+            return self.order
+        if self.lowered is None:
+            self.lowered = [(item.get('filterText') or text).lower() for item, text in zip(self.items, self.texts)]
+        # typing further characters filters the previous matches only
+        candidates = self.matches if lowered.startswith(self.matched_prefix) else self.order
+        _lowered = self.lowered
+        self.matches = [index for index in candidates if _lowered[index].startswith(lowered)]
+        self.matched_prefix = lowered
+        return self.matches
+
+
+    def is_more(self, text):
+        ''' True if text is the entry showing more items '''
+        return self.hidden > 0 and text == MORE.format(self.hidden)
+
+
+    def used(self, text):
+        ''' a list entry has been completed, it is ranked first from now on '''
+        self.recent.pop(text, None)
+        self.recent[text] = None
+        while len(self.recent) > MAX_RECENT:
+            self.recent.popitem(last=False)
+
+
+    @staticmethod
+    def _key(server, item):
+        return server, item.get('label'), item.get('insertText')
+
+
+    def _store(self, key, tip):
+        self.tips[key] = tip
+        self.tips.move_to_end(key)
+        while len(self.tips) > self.max_tips:
+            self.tips.popitem(last=False)
+
+
+    def item(self, index):
+        ''' returns (server, CompletionItem) of a list entry, (None, None) if there is no such entry, e.g. "more" '''
+        if 0 <= index < len(self.shown):
+            item = self.items[self.shown[index]]
+            return self.item_origins.get((item.get('label'), item.get('insertText')), self.default_server), item
+        return None, None
+
+
+    def tip(self, index):
+        '''
+            Returns: the cached tip of a list entry, '' if it is known to have none, None if it needs to be resolved
+        '''
+        server, item = self.item(index)
+        if item is None:
+            return ''
+        key = self._key(server, item)
+        tip = self.tips.get(key)
+        if tip is not None:
+            self.tips.move_to_end(key)
+            self.hits += 1
+        elif 'documentation' in item or 'detail' in item:
+            # a server ignoring resolveSupport sent it eagerly
+            self.eager += 1
+            tip = completion_tip(item) or ''
+            self._store(key, tip)
+        return tip
+
+
+    def resolved_item(self, server, item, resolved):
+        ''' caches the tip of a completionItem/resolve result, returns it, '' if it has none '''
+        self.resolved += 1
+        tip = completion_tip(resolved or {}) or ''
+        self._store(self._key(server, item), tip)
+        return tip
+
+
+    def reset(self):
+        self.resolved = 0
+        self.hits = 0
+        self.eager = 0
+        self.renders = 0
+        self.reused = 0
+        self.render_seconds = 0
+
+
+    def report(self):
+        return (f'completion items: {len(self.shown)} of {len(self.items)} shown, {self.renders} renders '
+                f'{self.render_seconds / self.renders * 1000 if self.renders else 0:.2f}ms avg, {self.reused} reused, '
+                f'{self.resolved} resolved, {self.hits} cached tips shown, {self.eager} sent eagerly, '
+                f'{len(self.tips)} tips cached')
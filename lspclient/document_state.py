@@ -0,0 +1,110 @@
+'''
+    In memory state of the documents known to the client
+
+    Notepad++ identifies a document by its buffer id, which doesn't change
+    when the document is moved to the other view or saved under a new name.
+    Everything the client needs to know about a document is kept in one
+    DOCUMENT_STATE object, the registry finds it by buffer id or by uri in O(1)
+    and drops it, including its caches, once the document gets closed.
+'''
+from urllib.request import pathname2url, url2pathname
+from .semantic_tokens import SEMANTIC_TOKENS
+from .folding import FOLDING_RANGES
+from .eol_annotations import EOL_ANNOTATIONS
+
+
+def path_to_uri(path):
+    return f'file:{pathname2url(path)}'
+
+
+def uri_to_path(uri):
+    return url2pathname(uri.replace('file:', ''))
+
+
+class DOCUMENT_STATE:
+    __slots__ = ('buffer_id', 'path', 'uri', 'language_id', 'version', 'is_open',
+                 'text', 'snapshot_hash', 'position_codec', 'semantic_tokens', 'folding_ranges', 'last_activated',
+                 'content_digest', 'eol_annotations', 'root')
+
+    def __init__(self, buffer_id, path, language_id):
+        self.buffer_id = buffer_id
+        self.path = path
+        self.uri = path_to_uri(path)
+        self.language_id = language_id
+        # incremented on every change sent to the server
+        self.version = 0
+        # didOpen has been sent and not yet been followed by didClose
+        self.is_open = False
+        # current text, None if it has been modified since it was fetched, see snapshot.py
+        self.text = None
+        # hash of the text last sent with didOpen/didChange
+        self.snapshot_hash = None
+        # created by the client as it depends on the encoding negotiated with the server
+        self.position_codec = None
+        self.semantic_tokens = SEMANTIC_TOKENS()
+        self.folding_ranges = FOLDING_RANGES()
+        self.eol_annotations = EOL_ANNOTATIONS()
+        # time.monotonic() of the last activation, see suspension.py
+        self.last_activated = 0
+        # (version, digest of its text) for the persistent result cache, see result_cache.py
+        self.content_digest = None
+        # workspace root, it selects the server instances of the document, see workspace.py
+        self.root = None
+
+
+    def __repr__(self):
+        return f'DOCUMENT_STATE({self.buffer_id}, {self.path!r}, version={self.version}, open={self.is_open})'
+
+
+class DOCUMENT_REGISTRY:
+    def __init__(self):
+        self.by_buffer_id = dict()
+        self.by_uri = dict()
+
+
+    def get(self, buffer_id, path, language_id):
+        '''
+            Returns the state of the document, a new one if the buffer is not known yet
+            or if its path changed, e.g. after save as.
+
+            Args:
+                buffer_id: notepad++ buffer id
+                path: the current file name of the buffer
+                language_id: lsp language identifier, e.g. python
+
+            Returns: DOCUMENT_STATE
+            Raises: Nothing
+        '''
+        document = self.by_buffer_id.get(buffer_id)
+        if document is None or document.path != path:
+            self.release(buffer_id)
+            document = self.by_buffer_id[buffer_id] = DOCUMENT_STATE(buffer_id, path, language_id)
+            self.by_uri[document.uri] = document
+        document.language_id = language_id
+        return document
+
+
+    def lookup(self, buffer_id):
+        ''' returns the state of the buffer or None '''
+        return self.by_buffer_id.get(buffer_id)
+
+
+    def find(self, uri):
+        ''' returns the state of the document with the given uri or None '''
+        return self.by_uri.get(uri)
+
+
+    def release(self, buffer_id):
+        ''' forgets the document, returns its state or None if it wasn't known '''
+        document = self.by_buffer_id.pop(buffer_id, None)
+        if document is not None:
+            self.by_uri.pop(document.uri, None)
+        return document
+
+
+    def __len__(self):
+        return len(self.by_buffer_id)
+
+
+    def __iter__(self):
+        return iter(list(self.by_buffer_id.values()))
@@ -0,0 +1,141 @@
+'''
+    Inlay hints and code lenses, shown as end of line annotations
+
+    Inlay hints are requested for the visible lines plus a margin only, once
+    scrolling has settled. Lines outside of the requested ranges are never
+    asked for, which keeps huge files responsive. Code lenses can only be
+    requested for a whole document, that happens once per version.
+    The labels are kept per document together with the version and the line
+    ranges they were received for, scrolling back or switching documents shows
+    them again without a request. Only the visible lines get annotated.
+'''
+import logging
+from Npp import editor1, editor2
+try:
+    from Npp import EOLANNOTATIONVISIBLE
+except ImportError:  # end of line annotations need a PythonScript built with scintilla 5
+    EOLANNOTATIONVISIBLE = None
+log = logging.info
+
+INLAY_HINT = 'textDocument/inlayHint'
+CODE_LENS = 'textDocument/codeLens'
+EOL_ANNOTATION_STYLE = 61
+
+
+def setup_eol_annotations(fore, back):
+    if EOLANNOTATIONVISIBLE is None:
+        log('end of line annotations not supported by this PythonScript, no inlay hints and code lenses')
+        return
+    for _editor in (editor1, editor2):
+        _editor.styleSetFore(EOL_ANNOTATION_STYLE, fore)
+        _editor.styleSetBack(EOL_ANNOTATION_STYLE, back)
+        _editor.styleSetItalic(EOL_ANNOTATION_STYLE, True)
+        _editor.eOLAnnotationSetVisible(EOLANNOTATIONVISIBLE.STANDARD)
+
+
+def inlay_hint_labels(hints):
+    ''' returns (line, character, label) of the InlayHint dicts of a response '''
+    labels = []
+    for hint in hints or []:
+        label = hint['label']
+        if not isinstance(label, str):
+            label = ''.join(part['value'] for part in label)
+        labels.append((hint['position']['line'], hint['position']['character'], label.strip()))
+    return labels
+
+
+def code_lens_labels(lenses):
+    ''' returns (line, character, title) of the CodeLens dicts of a response, unresolved lenses have no title yet '''
+    return [(lens['range']['start']['line'], lens['range']['start']['character'], lens['command']['title'])
+            for lens in lenses or [] if lens.get('command')]
+
+
+class EOL_ANNOTATIONS:
+    '''
+        Inlay hint and code lens labels of one document, valid for a single version
+    '''
+    def __init__(self):
+        self.version = -1
+        self.requested = {INLAY_HINT: [], CODE_LENS: []}  # method -> [(first line, last line)] asked for
+        self.received = {INLAY_HINT: [], CODE_LENS: []}  # method -> [(first line, last line)] answered
+        self.labels = {INLAY_HINT: dict(), CODE_LENS: dict()}  # method -> {line: [(character, label)]}
+
+
+    def _set_version(self, version):
+        if version != self.version:
+            self.version = version
+            for method in self.labels:
+                self.requested[method] = []
+                self.received[method] = []
+                self.labels[method] = dict()
+
+
+    def needs_request(self, method, version, first_line, last_line):
+        ''' returns False if the lines have already been requested for version '''
+        self._set_version(version)
+        return not any(first <= first_line and last_line <= last for first, last in self.requested[method])
+
+
+    def request_sent(self, method, version, first_line, last_line):
+        self._set_version(version)
+        self.requested[method].append((first_line, last_line))
+
+
+    def set(self, method, version, first_line, last_line, labels):
+        '''
+            Stores the labels of a response
+
+            Args:
+                method: INLAY_HINT or CODE_LENS
+                version: the document version the request was sent for
+                first_line, last_line: the lines the request was sent for
+                labels: list of (line, character, label)
+
+            Returns: False if the response is outdated
+            Raises: Nothing
+        '''
+        if version != self.version:
+            return False
+        _labels = self.labels[method]
+        for line in [line for line in _labels if first_line <= line <= last_line]:
+            del _labels[line]
+        for line, character, label in labels:
+            if label:
+                _labels.setdefault(line, []).append((character, label))
+        self.received[method].append((first_line, last_line))
+        return True
+
+
+    def _received(self, line):
+        return any(first <= line <= last for ranges in self.received.values() for first, last in ranges)
+
+
+    def text(self, line):
+        ''' inlay hints in the order of their position, followed by the code lenses '''
+        hints = ' '.join(label for _character, label in sorted(self.labels[INLAY_HINT].get(line, ())))
+        lenses = ' | '.join(label for _character, label in sorted(self.labels[CODE_LENS].get(line, ())))
+        return '  '.join(part for part in (hints, lenses) if part)
+
+
+    def paint(self, _editor, first_line, last_line):
+        '''
+            Annotates the lines which have been answered for the current version,
+            the other ones keep their annotation until their response arrives.
+            Only annotations whose text changed are sent to scintilla.
+
+            Returns: number of updated lines
+            Raises: Nothing
+        '''
+        if EOLANNOTATIONVISIBLE is None:
+            return 0
+        updated = 0
+        for line in range(first_line, last_line + 1):
+            if not self._received(line):
+                continue
+            text = self.text(line)
+            if _editor.eOLAnnotationGetText(line) != text:
+                _editor.eOLAnnotationSetText(line, text)
+                if text:
+                    _editor.eOLAnnotationSetStyle(line, EOL_ANNOTATION_STYLE)
+                updated += 1
+        return updated
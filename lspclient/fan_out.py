@@ -0,0 +1,170 @@
+'''
+    Merges the responses of several servers of one language
+
+    A request whose results can be combined, like completion or references,
+    is sent to all servers of the document language which provide it, at once
+    and with the same id. Their responses are collected here and the handler
+    gets called once, with the merged result, when the last one arrived.
+    The servers work in parallel, a second server only adds latency if it is
+    slower than the first one. Error responses count as empty results.
+    A server which doesn't answer within the timeout, or gets stopped, isn't
+    waited for, the responses received so far are merged and delivered.
+'''
+import threading
+import logging
+log = logging.info
+
+# seconds a fan out waits for the slowest server
+TIMEOUT = 2.0
+
+
+def merge_completions(results):
+    '''
+        Merges CompletionList and CompletionItem[] results into one CompletionList,
+        items with the same label and insert text are kept once, in the order of the servers
+    '''
+    items = []
+    seen = set()
+    incomplete = False
+    for result in results:
+        if isinstance(result, dict):
+            incomplete = incomplete or result.get('isIncomplete', False)
+            result = result.get('items', [])
+        for item in result:
+            key = (item.get('label'), item.get('insertText'))
+            if key not in seen:
+                seen.add(key)
+                items.append(item)
+    return {'isIncomplete': incomplete, 'items': items}
+
+
+def _item_key(item):
+    # Location, LocationLink, SymbolInformation, WorkspaceSymbol, CodeAction, Command and CodeLens
+    location = item.get('location', item)
+    _range = location.get('range') or location.get('targetSelectionRange') or {}
+    _start = _range.get('start', {})
+    _title = item.get('title') or item.get('name') or (item.get('command') or {}).get('title')
+    return _title, location.get('uri', location.get('targetUri')), _start.get('line'), _start.get('character')
+
+
+def merge_lists(results):
+    ''' concatenates list results, items at the same location with the same title or name are kept once '''
+    merged = []
+    seen = set()
+    for result in results:
+        for item in result if isinstance(result, list) else [result]:
+            key = _item_key(item)
+            if key not in seen:
+                seen.add(key)
+                merged.append(item)
+    return merged
+
+
+# request method -> merge function, other requests only go to the first server providing them
+MERGED_METHODS = {
+    'textDocument/completion': merge_completions,
+    'textDocument/references': merge_lists,
+    'textDocument/codeAction': merge_lists,
+    'textDocument/codeLens': merge_lists,
+    'workspace/symbol': merge_lists,
+}
+
+
+class FAN_OUT:
+    def __init__(self, deliver, timeout=TIMEOUT):
+        '''
+            Args:
+                deliver: called with the merged response of a fan out the last server
+                         didn't answer in time, or got stopped, on a timer or the gui thread
+                timeout: seconds to wait for the slowest server
+        '''
+        self.deliver = deliver
+        self.timeout = timeout
+        self.pending = dict()  # request id -> [outstanding servers, responses, merge, timer]
+        self.lock = threading.Lock()
+        self.merged = 0
+        self.timed_out = 0
+
+
+    def started(self, request_id, servers, merge):
+        timer = threading.Timer(self.timeout, self._timed_out, (request_id,))
+        timer.daemon = True
+        with self.lock:
+            self.pending[request_id] = [set(servers), [], merge, timer]
+        timer.start()
+
+
+    def collect(self, decoded_message, server):
+        '''
+            Called from the reader threads with each response
+
+            Args:
+                decoded_message: a response dict
+                server: the server instance which sent it
+
+            Returns: decoded_message if it isn't part of a fan out,
+                     None while responses are outstanding,
+                     the response with the merged result once the last one arrived
+            Raises: Nothing
+        '''
+        request_id = decoded_message['id']
+        with self.lock:
+            entry = self.pending.get(request_id)
+            if entry is None:
+                return decoded_message
+            entry[0].discard(server)
+            entry[1].append(decoded_message)
+            if entry[0]:
+                return None
+            del self.pending[request_id]
+        return self._merge(request_id, entry)
+
+
+    def stopped(self, server):
+        ''' a server instance has been stopped, the fan outs waiting only for it get delivered '''
+        completed = []
+        with self.lock:
+            for request_id, entry in list(self.pending.items()):
+                entry[0].discard(server)
+                if not entry[0]:
+                    del self.pending[request_id]
+                    completed.append((request_id, entry))
+        for request_id, entry in completed:
+            self._deliver(request_id, entry)
+
+
+    def _timed_out(self, request_id):
+        with self.lock:
+            entry = self.pending.pop(request_id, None)
+        if entry is not None:
+            log(f'fan out {request_id}: {entry[0]} did not answer in time')
+            self.timed_out += 1
+            self._deliver(request_id, entry)
+
+
+    def _deliver(self, request_id, entry):
+        self.deliver(self._merge(request_id, entry))
+
+
+    def _merge(self, request_id, entry):
+        ''' returns the response with the merged results of entry, an empty one if no server answered '''
+        _outstanding, responses, merge, timer = entry
+        timer.cancel()
+        if not responses:
+            # the response handler is waiting for it
+            return {'jsonrpc': '2.0', 'id': request_id, 'result': None}
+        results = [response['result'] for response in responses if response.get('result')]
+        if not results:
+            return responses[0]
+        self.merged += 1
+        return {'jsonrpc': '2.0', 'id': request_id, 'result': merge(results)}
+
+
+    def reset(self):
+        self.merged = 0
+        self.timed_out = 0
+
+
+    def report(self):
+        return (f'fan out: {self.merged} merged responses, {self.timed_out} timed out, '
+                f'{len(self.pending)} outstanding')
@@ -0,0 +1,625 @@
+'''
+    Reports files changed outside of notepad++ to the servers
+
+    Servers register file system watchers, glob patterns and the kinds of
+    changes they are interested in, with workspace/didChangeWatchedFiles.
+    Every workspace root of a subscribed server gets a FILE_WATCHER thread
+    which keeps an index of the modification time and size of all files
+    below the root. The change notifications of the system, inotify on linux
+    and ReadDirectoryChangesW on windows, tell which directories to rescan,
+    a new scan follows them at once. Where they aren't available, e.g. on a
+    network drive, or there are too many directories for inotify, the watcher
+    falls back to polling, a full scan every interval seconds, less often if
+    the scans of a large tree take long.
+
+    The directory of a file outside of any project, e.g. the home or the
+    downloads directory, is watched without its subdirectories. An index
+    keeps at most max_files files, further directories aren't entered once
+    it is full, so a root like C:\\ doesn't keep a watcher busy scanning.
+
+    Changes are coalesced until a scan finds nothing new for debounce seconds,
+    but are sent at least every max_wait seconds while files keep changing.
+    A checkout of thousands of files ends up in a single notification per
+    server, e.g. created and deleted again is dropped, deleted and created
+    again becomes changed.
+'''
+import os
+import re
+import time
+import ctypes
+import select
+import struct
+import threading
+from .document_state import path_to_uri, uri_to_path
+import logging
+log = logging.info
+
+POLL_INTERVAL = 2.0
+# polling waits at least that many times the duration of the last scan
+POLL_LOAD = 20
+# files an index keeps at most, further directories are left out
+MAX_FILES = 200000
+DEBOUNCE = 0.5
+MAX_WAIT = 5.0
+# never of interest and often huge
+IGNORED_DIRECTORIES = {'.git', '.hg', '.svn', '__pycache__'}
+
+# lsp FileChangeType
+CREATED = 1
+CHANGED = 2
+DELETED = 3
+# lsp WatchKind bits, indexed by FileChangeType
+WATCH_KINDS = {CREATED: 1, CHANGED: 2, DELETED: 4}
+ALL_KINDS = 7
+
+
+def glob_to_regex(pattern):
+    ''' translates a lsp glob pattern, *, **, ?, {a,b} and [...], to a regular expression string '''
+    translated = []
+    braces = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith('**/', i):
+            translated.append('(?:.*/)?')
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            translated.append('.*')
+            i += 2
+            continue
+        if char == '*':
+            translated.append('[^/]*')
+        elif char == '?':
+            translated.append('[^/]')
+        elif char == '{':
+            braces += 1
+            translated.append('(?:')
+        elif char == '}' and braces:
+            braces -= 1
+            translated.append(')')
+        elif char == ',' and braces:
+            translated.append('|')
+        elif char == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                translated.append(re.escape(char))
+            else:
+                body = pattern[i + 1:end]
+                translated.append('[^' + body[1:] + ']' if body.startswith('!') else '[' + body + ']')
+                i = end
+        else:
+            translated.append(re.escape(char))
+        i += 1
+    return ''.join(translated)
+
+
+def compile_watchers(watchers):
+    '''
+        Args:
+            watchers: lsp FileSystemWatcher dicts
+
+        Returns: [(compiled pattern, base directory or None, kind)]
+        Raises: Nothing, invalid patterns get logged and skipped
+    '''
+    compiled = []
+    for watcher in watchers:
+        pattern = watcher.get('globPattern')
+        base = None
+        if isinstance(pattern, dict):
+            # RelativePattern, its baseUri is an uri or a WorkspaceFolder
+            base_uri = pattern.get('baseUri')
+            base_uri = base_uri.get('uri') if isinstance(base_uri, dict) else base_uri
+            base = uri_to_path(base_uri).replace('\\', '/').rstrip('/') + '/'
+            pattern = pattern.get('pattern', '')
+        try:
+            # paths on windows are case insensitive
+            regex = re.compile(glob_to_regex(pattern), re.IGNORECASE if os.name == 'nt' else 0)
+        except (re.error, TypeError) as e:
+            log(f'invalid glob pattern {pattern}: {e}')
+            continue
+        compiled.append((regex, base, watcher.get('kind', ALL_KINDS)))
+    return compiled
+
+
+def watched(compiled, path, relative_path, change_type):
+    '''
+        True if one of the compiled watchers wants to know about the change
+
+        Args:
+            compiled: see compile_watchers
+            path: full path with / as separator
+            relative_path: path relative to the workspace root
+            change_type: CREATED, CHANGED or DELETED
+    '''
+    kind = WATCH_KINDS[change_type]
+    for regex, base, kinds in compiled:
+        if not kinds & kind:
+            continue
+        if base is not None:
+            if path.startswith(base) and regex.fullmatch(path[len(base):]):
+                return True
+        elif regex.fullmatch(relative_path) or regex.fullmatch(path):
+            return True
+    return False
+
+
+class FILE_INDEX:
+    '''
+        Modification time and size of all files below root, or only of the files in root if not recursive,
+        paths are relative to root with / as separator, the root itself is ''
+    '''
+    def __init__(self, root, recursive=True, max_files=MAX_FILES):
+        self.root = root
+        self.recursive = recursive
+        self.max_files = max_files
+        self.files = dict()  # directory -> {name: (mtime_ns, size)}
+        self.directories = dict()  # directory -> set of subdirectory names
+        self.count = 0  # files of all directories
+        self.full = False
+
+
+    def scan(self, directory='', recursive=True):
+        '''
+            Rescans directory, with recursive=False only its files and its new subdirectories
+
+            Returns: list of (relative path, change type) compared to the previous scan
+            Raises: Nothing, a directory which cannot be read counts as empty
+        '''
+        changes = []
+        if directory and not self.recursive:
+            return changes
+        stack = [(directory, recursive)]
+        while stack:
+            directory, recursive = stack.pop()
+            if directory not in self.files and self.count >= self.max_files:
+                # not entered, as if it didn't exist
+                if not self.full:
+                    log(f'more than {self.max_files} files below {self.root}, {directory} and others are not watched')
+                    self.full = True
+                continue
+            files, subdirectories = self._read(directory)
+            prefix = f'{directory}/' if directory else ''
+            known = self.files.get(directory, {})
+            for name, signature in files.items():
+                previous = known.get(name)
+                if previous is None:
+                    changes.append((prefix + name, CREATED))
+                elif previous != signature:
+                    changes.append((prefix + name, CHANGED))
+            for name in known.keys() - files.keys():
+                changes.append((prefix + name, DELETED))
+            self.files[directory] = files
+            self.count += len(files) - len(known)
+            known_directories = self.directories.get(directory, set())
+            for name in known_directories - subdirectories:
+                self._remove(prefix + name, changes)
+            self.directories[directory] = subdirectories
+            for name in subdirectories:
+                if recursive or name not in known_directories:
+                    stack.append((prefix + name, True))
+        return changes
+
+
+    def _read(self, directory):
+        files = dict()
+        subdirectories = set()
+        try:
+            with os.scandir(os.path.join(self.root, *directory.split('/')) if directory else self.root) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.recursive and entry.name not in IGNORED_DIRECTORIES:
+                                subdirectories.add(entry.name)
+                        else:
+                            # cached by scandir on windows, a stat call on linux
+                            stat = entry.stat(follow_symlinks=False)
+                            files[entry.name] = (stat.st_mtime_ns, stat.st_size)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return files, subdirectories
+
+
+    def _remove(self, directory, changes):
+        ''' a directory has gone, all its files have been deleted '''
+        files = self.files.pop(directory, {})
+        self.count -= len(files)
+        for name in files:
+            changes.append((f'{directory}/{name}', DELETED))
+        for name in self.directories.pop(directory, set()):
+            self._remove(f'{directory}/{name}', changes)
+
+
+    def __len__(self):
+        return self.count
+
+
+class INOTIFY:
+    ''' the directories with changes, linux only '''
+    # IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    MASK = 0x002 | 0x004 | 0x008 | 0x040 | 0x080 | 0x100 | 0x200
+    IN_Q_OVERFLOW = 0x4000
+    IN_NONBLOCK_CLOEXEC = 0o4000 | 0o2000000
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self):
+        self.libc = ctypes.CDLL('libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.directories = dict()  # watch descriptor -> relative directory
+        self.watched = set()
+
+
+    @classmethod
+    def create(cls):
+        ''' returns None where inotify isn't available '''
+        if not hasattr(ctypes, 'CDLL') or not os.path.exists('/proc/sys/fs/inotify'):
+            return None
+        try:
+            return cls()
+        except (OSError, AttributeError) as e:
+            log(f'inotify not available: {e}')
+            return None
+
+
+    def watch(self, root, directories):
+        '''
+            Watches the directories not watched yet
+
+            Returns: False if the watch limit has been reached
+        '''
+        for directory in directories:
+            if directory in self.watched:
+                continue
+            path = os.path.join(root, *directory.split('/')) if directory else root
+            descriptor = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+            if descriptor < 0:
+                if ctypes.get_errno() == 28:  # ENOSPC, max_user_watches reached
+                    return False
+                continue  # removed meanwhile
+            self.directories[descriptor] = directory
+            self.watched.add(directory)
+        return True
+
+
+    def wait(self, timeout):
+        '''
+            Returns: set of the directories with changes, None if events have been lost
+        '''
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        dirty = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return dirty
+            offset = 0
+            while offset < len(data):
+                descriptor, mask, _cookie, length = self.EVENT.unpack_from(data, offset)
+                offset += self.EVENT.size + length
+                if mask & self.IN_Q_OVERFLOW:
+                    dirty = None
+                elif dirty is not None and descriptor in self.directories:
+                    dirty.add(self.directories[descriptor])
+
+
+    def close(self):
+        os.close(self.fd)
+
+
+class OVERLAPPED(ctypes.Structure):
+    _fields_ = [('Internal', ctypes.c_void_p), ('InternalHigh', ctypes.c_void_p),
+                ('Offset', ctypes.c_uint32), ('OffsetHigh', ctypes.c_uint32), ('hEvent', ctypes.c_void_p)]
+
+
+class DIRECTORY_CHANGES:
+    ''' the directories with changes, windows only, a single ReadDirectoryChangesW watches the whole tree '''
+    FILE_LIST_DIRECTORY = 0x0001
+    # FILE_SHARE_READ | FILE_SHARE_WRITE | FILE_SHARE_DELETE
+    SHARE_ALL = 0x1 | 0x2 | 0x4
+    OPEN_EXISTING = 3
+    # FILE_FLAG_BACKUP_SEMANTICS | FILE_FLAG_OVERLAPPED
+    FLAGS = 0x02000000 | 0x40000000
+    # FILE_NOTIFY_CHANGE_FILE_NAME | FILE_NOTIFY_CHANGE_DIR_NAME | FILE_NOTIFY_CHANGE_SIZE | FILE_NOTIFY_CHANGE_LAST_WRITE
+    FILTER = 0x001 | 0x002 | 0x008 | 0x010
+    INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
+    BUFFER_SIZE = 65536
+    # NextEntryOffset, Action, FileNameLength of a FILE_NOTIFY_INFORMATION, followed by the utf-16 name
+    HEADER = struct.Struct('III')
+
+    def __init__(self, root, recursive=True):
+        self.recursive = recursive
+        self.kernel32 = kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        kernel32.CreateFileW.restype = ctypes.c_void_p
+        kernel32.CreateFileW.argtypes = [ctypes.c_wchar_p, ctypes.c_uint32, ctypes.c_uint32, ctypes.c_void_p,
+                                         ctypes.c_uint32, ctypes.c_uint32, ctypes.c_void_p]
+        kernel32.CreateEventW.restype = ctypes.c_void_p
+        kernel32.CreateEventW.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_wchar_p]
+        kernel32.ReadDirectoryChangesW.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint32, ctypes.c_int,
+                                                   ctypes.c_uint32, ctypes.c_void_p, ctypes.POINTER(OVERLAPPED),
+                                                   ctypes.c_void_p]
+        kernel32.GetOverlappedResult.argtypes = [ctypes.c_void_p, ctypes.POINTER(OVERLAPPED),
+                                                 ctypes.POINTER(ctypes.c_uint32), ctypes.c_int]
+        kernel32.WaitForSingleObject.restype = ctypes.c_uint32
+        kernel32.WaitForSingleObject.argtypes = [ctypes.c_void_p, ctypes.c_uint32]
+        kernel32.ResetEvent.argtypes = [ctypes.c_void_p]
+        kernel32.CancelIoEx.argtypes = [ctypes.c_void_p, ctypes.POINTER(OVERLAPPED)]
+        kernel32.CloseHandle.argtypes = [ctypes.c_void_p]
+        self.handle = kernel32.CreateFileW(root, self.FILE_LIST_DIRECTORY, self.SHARE_ALL, None,
+                                           self.OPEN_EXISTING, self.FLAGS, None)
+        if self.handle in (None, self.INVALID_HANDLE_VALUE):
+            raise ctypes.WinError(ctypes.get_last_error())
+        self.overlapped = OVERLAPPED()
+        self.overlapped.hEvent = kernel32.CreateEventW(None, True, False, None)
+        self.buffer = ctypes.create_string_buffer(self.BUFFER_SIZE)
+        if not self._read():
+            error = ctypes.get_last_error()
+            self.close(pending=False)
+            raise ctypes.WinError(error)
+
+
+    @classmethod
+    def create(cls, root, recursive=True):
+        ''' returns None where ReadDirectoryChangesW isn't available, e.g. for some network drives '''
+        if not hasattr(ctypes, 'WinDLL'):
+            return None
+        try:
+            return cls(root, recursive)
+        except (OSError, AttributeError) as e:
+            log(f'ReadDirectoryChangesW not available for {root}: {e}')
+            return None
+
+
+    def _read(self):
+        self.kernel32.ResetEvent(self.overlapped.hEvent)
+        return self.kernel32.ReadDirectoryChangesW(self.handle, self.buffer, self.BUFFER_SIZE, self.recursive,
+                                                   self.FILTER, None, ctypes.byref(self.overlapped), None)
+
+
+    def watch(self, root, directories):
+        ''' the whole tree is watched already, returns True '''
+        return True
+
+
+    def wait(self, timeout):
+        '''
+            Returns: set of the directories with changes, None if events have been lost
+        '''
+        if self.kernel32.WaitForSingleObject(self.overlapped.hEvent, int(timeout * 1000)) != 0:
+            return set()
+        transferred = ctypes.c_uint32(0)
+        completed = self.kernel32.GetOverlappedResult(self.handle, ctypes.byref(self.overlapped),
+                                                      ctypes.byref(transferred), False)
+        data = self.buffer.raw[:transferred.value]
+        if not self._read():
+            raise ctypes.WinError(ctypes.get_last_error())
+        if not completed or not data:
+            # the buffer overflowed
+            return None
+        dirty = set()
+        offset = 0
+        while True:
+            next_offset, _action, length = self.HEADER.unpack_from(data, offset)
+            start = offset + self.HEADER.size
+            parts = data[start:start + length].decode('utf-16-le').split('\\')
+            if not IGNORED_DIRECTORIES.intersection(parts[:-1]):
+                dirty.add('/'.join(parts[:-1]))
+            if not next_offset:
+                return dirty
+            offset += next_offset
+
+
+    def close(self, pending=True):
+        kernel32 = self.kernel32
+        if pending and kernel32.CancelIoEx(self.handle, ctypes.byref(self.overlapped)):
+            # the buffer must not be freed before the read has been cancelled
+            kernel32.GetOverlappedResult(self.handle, ctypes.byref(self.overlapped),
+                                         ctypes.byref(ctypes.c_uint32(0)), True)
+        kernel32.CloseHandle(self.overlapped.hEvent)
+        kernel32.CloseHandle(self.handle)
+
+
+class FILE_WATCHER(threading.Thread):
+    def __init__(self, root, on_changes, interval=POLL_INTERVAL, debounce=DEBOUNCE, notifications=True,
+                 max_wait=MAX_WAIT, recursive=True, max_files=MAX_FILES):
+        super().__init__(daemon=True)
+        self.root = root
+        self.on_changes = on_changes
+        self.interval = interval
+        self.debounce = debounce
+        self.max_wait = max_wait
+        self.notifications = notifications
+        self.index = FILE_INDEX(root, recursive, max_files)
+        self.stopped = threading.Event()
+        self.pending = dict()  # relative path -> coalesced change type
+        self.scans = 0
+        self.scan_seconds = 0
+        self.last_scan_seconds = 0
+        self.sent = 0
+        self.changes = 0
+
+
+    def stop(self):
+        self.stopped.set()
+
+
+    def coalesce(self, changes):
+        pending = self.pending
+        for path, change in changes:
+            previous = pending.get(path)
+            if previous is None or previous == CHANGED:
+                pending[path] = change
+            elif previous == CREATED and change == DELETED:
+                del pending[path]
+            elif previous == DELETED and change == CREATED:
+                pending[path] = CHANGED
+            # created and changed stays created
+
+
+    def _scan(self, directories=None):
+        start = time.perf_counter()
+        if directories is None:
+            changes = self.index.scan()
+        else:
+            changes = []
+            for directory in directories:
+                changes.extend(self.index.scan(directory, recursive=False))
+        self.last_scan_seconds = time.perf_counter() - start
+        self.scans += 1
+        self.scan_seconds += self.last_scan_seconds
+        return changes
+
+
+    def _notifier(self):
+        ''' the change notifications of the system for the tree, None to poll '''
+        if not self.notifications:
+            return None
+        notifier = DIRECTORY_CHANGES.create(self.root, self.index.recursive) if os.name == 'nt' else INOTIFY.create()
+        if notifier is not None and not notifier.watch(self.root, self.index.directories):
+            log(f'too many directories below {self.root} for inotify, polling')
+            notifier.close()
+            notifier = None
+        return notifier
+
+
+    def _send(self):
+        batch = list(self.pending.items())
+        self.pending = dict()
+        self.sent += 1
+        self.changes += len(batch)
+        try:
+            self.on_changes(self.root, batch)
+        except Exception as e:  # pylint: disable=W0703
+            log(f'reporting the changes below {self.root} failed: {e}')
+
+
+    def run(self):
+        self.index.scan()  # the initial state, nothing to report
+        notifier = self._notifier()
+        first_change = last_change = 0
+        poll_interval = self.interval
+        try:
+            while not self.stopped.is_set():
+                if self.pending:
+                    # until the debounce or the maximum wait is over
+                    timeout = max(0, min(last_change + self.debounce, first_change + self.max_wait) - time.monotonic())
+                else:
+                    timeout = self.interval if notifier is not None else poll_interval
+                if notifier is not None:
+                    try:
+                        dirty = notifier.wait(timeout)
+                    except OSError as e:
+                        log(f'change notifications below {self.root} failed, polling: {e}')
+                        notifier.close()
+                        notifier = None
+                        dirty = None
+                    changes = self._scan(dirty) if dirty != set() else []
+                    if notifier is not None and not notifier.watch(self.root, self.index.directories):
+                        log(f'too many directories below {self.root} for inotify, polling')
+                        notifier.close()
+                        notifier = None
+                else:
+                    self.stopped.wait(timeout)
+                    changes = self._scan()
+                    # a large tree must not keep the gil busy
+                    poll_interval = max(self.interval, POLL_LOAD * self.last_scan_seconds)
+                if self.stopped.is_set():
+                    break
+                now = time.monotonic()
+                if changes:
+                    if not self.pending:
+                        first_change = now
+                    self.coalesce(changes)
+                    last_change = now
+                if self.pending and (now - last_change >= self.debounce or now - first_change >= self.max_wait):
+                    self._send()
+        finally:
+            if notifier is not None:
+                notifier.close()
+
+
+class WATCHED_FILES:
+    '''
+        The file watchers of the workspace roots and the servers subscribed to them,
+        send(server, lsp FileEvent list) is called on the watcher threads,
+        is_project(root) tells whether the subdirectories of root are watched too
+    '''
+    def __init__(self, send, interval=POLL_INTERVAL, debounce=DEBOUNCE, is_project=None):
+        self.send = send
+        self.is_project = is_project
+        self.interval = interval
+        self.debounce = debounce
+        self.watchers = dict()  # root -> FILE_WATCHER
+        self.subscriptions = dict()  # server -> (roots, compiled watchers)
+        self.lock = threading.Lock()
+
+
+    def update(self, server, roots, watchers):
+        '''
+            Sets the roots and the lsp FileSystemWatchers of server,
+            starts and stops the watchers of the roots accordingly
+
+            Args:
+                server: server instance
+                roots: the workspace roots of server
+                watchers: of all its didChangeWatchedFiles registrations, empty to unsubscribe
+
+            Returns: None
+            Raises: Nothing
+        '''
+        if self.interval <= 0:
+            return
+        compiled = compile_watchers(watchers)
+        with self.lock:
+            if compiled and roots:
+                self.subscriptions[server] = (set(roots), compiled)
+            else:
+                self.subscriptions.pop(server, None)
+            needed = {root for roots, _compiled in self.subscriptions.values() for root in roots}
+            for root in needed - self.watchers.keys():
+                recursive = self.is_project is None or self.is_project(root)
+                log(f'watching {root}{"" if recursive else " without its subdirectories"}')
+                watcher = self.watchers[root] = FILE_WATCHER(root, self._on_changes, self.interval, self.debounce,
+                                                             recursive=recursive)
+                watcher.start()
+            for root in self.watchers.keys() - needed:
+                log(f'no longer watching {root}')
+                self.watchers.pop(root).stop()
+
+
+    def _on_changes(self, root, changes):
+        with self.lock:
+            subscriptions = [(server, compiled) for server, (roots, compiled) in self.subscriptions.items()
+                             if root in roots]
+        for server, compiled in subscriptions:
+            events = []
+            for relative_path, change_type in changes:
+                path = os.path.join(root, *relative_path.split('/'))
+                if watched(compiled, path.replace('\\', '/'), relative_path, change_type):
+                    events.append({'uri': path_to_uri(path), 'type': change_type})
+            if events:
+                log(f'{len(events)} watched files of {server} changed below {root}')
+                self.send(server, events)
+
+
+    def stop(self):
+        with self.lock:
+            for watcher in self.watchers.values():
+                watcher.stop()
+            self.watchers.clear()
+            self.subscriptions.clear()
+
+
+    def report(self):
+        watchers = list(self.watchers.values())
+        scans = sum(watcher.scans for watcher in watchers)
+        seconds = sum(watcher.scan_seconds for watcher in watchers)
+        return (f'file watchers: {len(watchers)} roots, {sum(len(watcher.index) for watcher in watchers)} files, '
+                f'{scans} scans {seconds / scans * 1000 if scans else 0:.1f}ms avg, '
+                f'{sum(watcher.sent for watcher in watchers)} notifications with '
+                f'{sum(watcher.changes for watcher in watchers)} changes')
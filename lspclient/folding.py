@@ -0,0 +1,140 @@
+'''
+    Converts lsp folding ranges into scintilla fold levels
+
+    The fold levels of the last response are cached per document, so that only
+    the lines whose level really changed need to be sent to scintilla.
+    The folding of the lexer gets turned off for documents with server folding,
+    otherwise restyling, e.g. after typing, would overwrite the levels again.
+    Notepad++ turns it on again when a document gets activated, the cached
+    levels are restored then, only the lines the lexer refolded meanwhile.
+    Stopping the client turns the folding of the lexer on again.
+'''
+import time
+import logging
+from array import array
+from Npp import FOLDLEVEL
+log = logging.info
+
+_BASE = int(FOLDLEVEL.BASE)
+_HEADERFLAG = int(FOLDLEVEL.HEADERFLAG)
+
+
+def fold_levels(ranges, line_count):
+    '''
+        Calculates the fold level of each line.
+        The start line of a range becomes a fold header,
+        the following lines up to and including the end line are its children.
+
+        Args:
+            ranges: list of FoldingRange dicts as sent by the server
+            line_count: number of lines of the document
+
+        Returns: array of fold levels, one per line
+        Raises: Nothing
+    '''
+    depth_change = array('l', [0]) * (line_count + 1)
+    headers = set()
+    for _range in ranges:
+        start_line = _range['startLine']
+        end_line = min(_range['endLine'], line_count - 1)
+        if end_line <= start_line:
+            continue
+        depth_change[start_line + 1] += 1
+        depth_change[end_line + 1] -= 1
+        headers.add(start_line)
+
+    levels = array('L', [_BASE]) * line_count
+    depth = 0
+    for line in range(line_count):
+        depth += depth_change[line]
+        levels[line] = _BASE + depth | (_HEADERFLAG if line in headers else 0)
+    return levels
+
+
+class FOLDING_RANGES:
+    '''
+        Fold levels of one document as set by the last folding range response
+    '''
+    def __init__(self):
+        self.levels = array('L')
+        self.lexer_fold = None  # the fold property of the lexer before it got turned off
+
+
+    def lines_changed(self, line, lines_added):
+        '''
+            Keeps the cached levels in line with the document,
+            added lines inherit the level of the line they were added to
+        '''
+        if line >= len(self.levels):
+            return
+        if lines_added > 0:
+            self.levels[line + 1:line + 1] = array('L', [self.levels[line]]) * lines_added
+        else:
+            del self.levels[line + 1:line + 1 - lines_added]
+
+
+    def _disable_lexer_folding(self, _editor):
+        ''' returns False if it was off already, the lexer didn't fold since then '''
+        fold = _editor.getProperty('fold')
+        if fold == '0':
+            return False
+        self.lexer_fold = fold
+        _editor.setProperty('fold', '0')
+        return True
+
+
+    def restore(self, _editor):
+        '''
+            Sets the cached levels again, after the lexer of the activated document folded it
+
+            Returns: number of updated lines
+            Raises: Nothing
+        '''
+        if not self.levels or len(self.levels) != _editor.getLineCount():
+            return 0
+        if not self._disable_lexer_folding(_editor):
+            return 0
+        updated = 0
+        for line, level in enumerate(self.levels):
+            if _editor.getFoldLevel(line) != level:
+                _editor.setFoldLevel(line, level)
+                updated += 1
+        return updated
+
+
+    def release(self, _editor):
+        ''' turns the folding of the lexer on again, if it got turned off for the levels shown by _editor '''
+        if self.lexer_fold is not None and _editor.getProperty('fold') == '0':
+            _editor.setProperty('fold', self.lexer_fold)
+            # the lexer folds the whole document again
+            _editor.colourise(0, -1)
+        self.lexer_fold = None
+
+
+    def apply(self, _editor, ranges):
+        '''
+            Sets the fold levels calculated from ranges in one pass,
+            only for the lines whose level differs from the last response
+
+            Returns: number of updated lines
+            Raises: Nothing
+        '''
+        start_time = time.perf_counter()
+        if not ranges and not self.levels:
+            # the lexer keeps folding documents without server ranges
+            return 0
+        self._disable_lexer_folding(_editor)
+        line_count = _editor.getLineCount()
+        levels = fold_levels(ranges, line_count)
+        previous = self.levels if len(self.levels) == line_count else None
+        if previous == levels:
+            return 0
+        updated = 0
+        for line in range(line_count):
+            level = levels[line]
+            if previous is None or previous[line] != level:
+                _editor.setFoldLevel(line, level)
+                updated += 1
+        self.levels = levels
+        log(f'updated {updated} of {line_count} fold levels in {(time.perf_counter() - start_time) * 1000:.2f}ms')
+        return updated
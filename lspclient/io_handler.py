@@ -5,6 +5,7 @@
 '''
 
 import os
+import json
 import threading
 import subprocess
 import queue
@@ -39,11 +40,8 @@ class TCP_OBJECT:
             return _socket
 
         executable = self.config['executable']
-        args = self.config.get('args', None)
-        if args is None:
-            args = [executable]
-        else:
-            args.insert(0, executable)
+        # the config is shared by all instances of the server, see workspace.py
+        args = [executable] + self.config.get('args', [])
 
         max_tcp_retries = self.config['tcpretries']
         port = self.config.get('port', 2087)
@@ -96,12 +94,9 @@ class PIPE_OBJECT:
         ''' start_process '''
         log(f'{self.config["executable"]}')
         executable = self.config['executable']
-        args = self.config.get('args', None)
+        # the config is shared by all instances of the server, see workspace.py
+        args = [executable] + self.config.get('args', [])
         env = self.config.get('env', '')
-        if args is None:
-            args = [executable]
-        else:
-            args.insert(0, executable)
 
         _env = os.environ.copy()
         if env:
@@ -109,15 +104,18 @@ class PIPE_OBJECT:
                 k, v = var.split('=', 1)
                 _env[k] = v
 
-        si = subprocess.STARTUPINFO()
-        si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        si = None
+        # not available outside of windows, e.g. when a session gets replayed, see __tests__/replay_session.py
+        if hasattr(subprocess, 'STARTUPINFO'):
+            si = subprocess.STARTUPINFO()
+            si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
 
         try:
             self.process = subprocess.Popen(args,
                                             stdin=subprocess.PIPE,
                                             stdout=subprocess.PIPE,
                                             startupinfo=si,
-                                            cwd=executable.rpartition('\\')[0],
+                                            cwd=executable.rpartition('\\')[0] or None,
                                             close_fds=False,
                                             env=_env)
             log(f'{self.process.pid}')
@@ -141,8 +139,74 @@ class PIPE_OBJECT:
         raise NotImplementedError
 
 
+class PROXY_OBJECT:
+    '''
+        Connection to a server owned by the lsp proxy, see lsp_proxy.py.
+        The proxy gets started if it isn't running yet and outlives notepad++,
+        the client authenticates with the token the proxy wrote to token_file.
+    '''
+    SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lsp_proxy.py')
+    CONNECT_RETRIES = 20
+
+    def __init__(self, proc_config, proxy_config):
+        log('PROXY_OBJECT')
+        self.config = proc_config
+        self.proxy_config = proxy_config
+        self.port = proxy_config.get('port', 2088)
+        self.process = None
+        self.socket = None
+        self.reader = None
+
+
+    def start(self):
+        ''' start_process '''
+        try:
+            self.socket = self._connect()
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.reader = self.socket.makefile('rb')
+            # the proxy shares a server between all clients with the same server config and root
+            _config = {key: self.config[key] for key in ('executable', 'args', 'env') if key in self.config}
+            with open(self.proxy_config['token_file']) as f:
+                _token = f.read().strip()
+            _body = json.dumps({'jsonrpc': '2.0', 'method': '$/proxy/connect',
+                                'params': {'config': _config, 'token': _token}})
+            self.send_to(f'Content-Length: {len(_body)}\r\n\r\n{_body}')
+        except Exception as e:  # pylint: disable=W0703
+            log(f'{e}')
+            return None, None
+        return self, None
+
+
+    def _connect(self):
+        try:
+            return socket.create_connection(('127.0.0.1', self.port))
+        except ConnectionRefusedError:
+            log(f'starting lsp proxy on port {self.port}')
+            args = [self.proxy_config['python'], self.SCRIPT, '--port', str(self.port),
+                    '--token-file', self.proxy_config['token_file']]
+            if 'idle_minutes' in self.proxy_config:
+                args += ['--idle-minutes', str(self.proxy_config['idle_minutes'])]
+            if 'logpath' in self.proxy_config:
+                args += ['--log', self.proxy_config['logpath']]
+            subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                             close_fds=True, creationflags=getattr(subprocess, 'DETACHED_PROCESS', 0) |
+                             getattr(subprocess, 'CREATE_NEW_PROCESS_GROUP', 0))
+        for _ in range(self.CONNECT_RETRIES):
+            time.sleep(0.1)
+            try:
+                return socket.create_connection(('127.0.0.1', self.port))
+            except ConnectionRefusedError:
+                continue
+        raise ConnectionRefusedError(f'lsp proxy on port {self.port} not reachable')
+
+
+    def send_to(self, message):
+        log(f"{message.encode('UTF-8')}")
+        self.socket.sendall(message.encode('UTF-8'))
+
+
 class PROCESS_MONITOR(threading.Thread):
-    def __init__(self, queue_obj=None, com_obj=None, callback=None, ready_event=None):
+    def __init__(self, queue_obj=None, com_obj=None, callback=None, ready_event=None, server=None):
         log('PROCESS_MONITOR')
         super(PROCESS_MONITOR, self).__init__()
         self.keep_reading = True
@@ -150,6 +214,8 @@ class PROCESS_MONITOR(threading.Thread):
         self.com_obj = com_obj
         self.callback = callback
         self.ready = ready_event
+        # passed to the callback, tells the client which server sent the message
+        self.server = server
 
 
     def enqueue_io_messsage(self, out):
@@ -157,8 +223,9 @@ class PROCESS_MONITOR(threading.Thread):
         log(f'{out}')
         self.ready.set()
         while self.keep_reading:
-            for line in iter(out.readline, ''):
-                time.sleep(0.1)
+            # stdout is a binary stream, readline returns b'' once the server closed it
+            for line in iter(out.readline, b''):
+                first_byte_ns = time.perf_counter_ns()
                 if line == b'\r\n' or not line:
                     continue
                 log(f'{line=}')
@@ -175,21 +242,32 @@ class PROCESS_MONITOR(threading.Thread):
 
                     while (start_json := content.find(b'{')) == -1:
                         log(f'{start_json=}')
-                        content += out.read(expected_content_length)
+                        chunk = out.read(expected_content_length)
+                        if not chunk:
+                            log('server closed its output')
+                            return
+                        content += chunk
 
                     while (content_length := len(content[start_json:])) != expected_content_length:
                         log(f'{content_length=}')
                         missing = expected_content_length - content_length
                         # log(f'{missing=}')
-                        content += out.read(missing)
+                        chunk = out.read(missing)
+                        if not chunk:
+                            log('server closed its output')
+                            return
+                        content += chunk
                     log(f'full: {content=}')
                 else:
                     log(f'Content header without length !! ???? {parts}')
                     break
 
                 log(f'callback: {content.decode()[-expected_content_length:]}')
-                self.callback(content.decode()[-expected_content_length:])
+                self.callback(content.decode()[-expected_content_length:], first_byte_ns, self.server)
                 break
+            else:
+                log('server closed its output')
+                return
 
 
     def enqueue_tcp_messsage(self, _socket, queue):
@@ -237,6 +315,9 @@ class PROCESS_MONITOR(threading.Thread):
         log('process monitor started')
         if isinstance(self.com_obj, PIPE_OBJECT):
             self.enqueue_io_messsage(self.com_obj.process.stdout)
+        elif isinstance(self.com_obj, PROXY_OBJECT):
+            # the proxy frames messages like a server does on stdout
+            self.enqueue_io_messsage(self.com_obj.reader)
         # elif isinstance(self.com_obj, socket._socketobject):
             # self.enqueue_tcp_messsage(self.com_obj, self.queue)
         else:
@@ -244,22 +325,53 @@ class PROCESS_MONITOR(threading.Thread):
 
 
 class COMMUNICATION_MANAGER:
-    def __init__(self, lsp_server_configs, on_receive_callback):
+    '''
+        Servers are identified by the key of their config. A language can have several servers,
+        the first one is keyed by the language itself, further ones by language/name.
+        A server can run as several instances, one per workspace root, see workspace.py,
+        the first one is identified by the key of the config too.
+        Notifications go to the current servers, requests to the servers given.
+    '''
+    def __init__(self, lsp_server_configs, on_receive_callback, proxy_config=None):
         log('communication manager')
         self.available_servers = lsp_server_configs
+        # io servers get shared between notepad++ instances by the lsp proxy if configured
+        self.proxy_config = proxy_config
+        self.languages = dict()  # language -> servers, in config order
+        for server, config in lsp_server_configs.items():
+            self.languages.setdefault(config.get('language', server), []).append(server)
         self.running_servers = dict()
+        self.server_processes = dict()
         self.callback = on_receive_callback
         self.com_obj = None
+        self.current_servers = []
         self.current_queue = None
         self.max_queue_wait_time = 2.0
-        self.waiting_for_initialize_result = False
-        self.backlog = []
+        # server -> messages waiting for its initialize result
+        self.backlogs = dict()
+        # SESSION_RECORDER, set by the client while a session gets recorded
+        self.recorder = None
+        self.backlog_lock = threading.Lock()
+        # servers started by already_initialized, waiting for send_initialize
+        self.starting = []
+
+
+    @property
+    def waiting_for_initialize_result(self):
+        return bool(self.backlogs)
+
+
+    def servers_of(self, language):
+        ''' returns the servers configured for language, in config order '''
+        return self.languages.get(language, [])
 
 
     def start_process(self, proc_config):
         ''' start_process '''
         log(f'{proc_config}')
-        if proc_config['pipe'] == 'io':
+        if proc_config['pipe'] == 'io' and self.proxy_config:
+            process, _socket = PROXY_OBJECT(proc_config, self.proxy_config).start()
+        elif proc_config['pipe'] == 'io':
             process, _socket = PIPE_OBJECT(proc_config).start()
         else:
             process, _socket = TCP_OBJECT(proc_config).start()
@@ -268,49 +380,112 @@ class COMMUNICATION_MANAGER:
 
 
     def send(self, lspmessage):
-        ''' Called by client on various notepad++ and scintilla events '''
-        if self.waiting_for_initialize_result:
-            self.backlog.append(lspmessage)
-        else:
-            self.com_obj.send_to(lspmessage)
-
-
-    def send_initialized(self, lspmessage):
-        ''' Called by client after initialize result has been received '''
-        self.com_obj.send_to(lspmessage)
-        self.waiting_for_initialize_result = False
-        if self.backlog:
-            log(f'backlog message:{self.backlog}')
-            while self.backlog:
-                msg = self.backlog.pop(0)
-                self.com_obj.send_to(msg)
-
-
-    def already_initialized(self, language):
-        log(f'{language}')
-        if language in self.running_servers:
-            self.com_obj = self.running_servers[language][1]
-            self.current_queue = self.running_servers[language][0].queue
-            return True
+        ''' Called by client on various notepad++ and scintilla events, sends to all servers of the current language '''
+        for server in self.current_servers:
+            self.send_to_server(server, lspmessage)
+
+
+    def send_to_server(self, server, lspmessage):
+        ''' sends lspmessage to server, it waits in the backlog until the server has been initialized '''
+        with self.backlog_lock:
+            backlog = self.backlogs.get(server)
+            if backlog is not None:
+                backlog.append(lspmessage)
+                return
+        if server in self.running_servers:
+            self._write(server, self.running_servers[server][1], lspmessage)
+
+
+    def _write(self, server, com_obj, lspmessage):
+        if self.recorder is not None:
+            self.recorder.message_sent(server, lspmessage)
+        com_obj.send_to(lspmessage)
+
+
+    def send_to_servers(self, servers, lspmessage):
+        for server in servers:
+            self.send_to_server(server, lspmessage)
+
+
+    def server_pid(self, server):
+        ''' returns the process id of server, None if unknown '''
+        process = self.server_processes.get(server)
+        return process.pid if process is not None else None
+
+
+    def send_initialize(self, lspmessage):
+        ''' sends the initialize request to the servers just started, other messages to them wait in their backlog '''
+        for server in self.starting:
+            self._write(server, self.running_servers[server][1], lspmessage)
+            with self.backlog_lock:
+                self.backlogs[server] = []
+        self.starting = []
+
+
+    def send_initialized(self, server, lspmessage):
+        ''' Called by client after the initialize result of server has been received '''
+        com_obj = self.running_servers[server][1]
+        self._write(server, com_obj, lspmessage)
+        with self.backlog_lock:
+            backlog = self.backlogs.pop(server, [])
+            if backlog:
+                log(f'backlog message:{backlog}')
+            # sent while holding the lock, a message posted meanwhile must not overtake the backlog
+            for msg in backlog:
+                self._write(server, com_obj, msg)
+
+
+    def already_initialized(self, servers):
+        '''
+            Makes servers the current ones and starts those which aren't running
+
+            Args:
+                servers: [(instance, server)] the server instances for the current document and their config keys
+
+            Returns: False if a server has been started and needs send_initialize
+        '''
+        log(f'{servers}')
+        self.current_servers = [instance for instance, _server in servers]
+        for instance, server in servers:
+            if instance not in self.running_servers and self._start_server(instance, server):
+                self.starting.append(instance)
+        primary = self.running_servers.get(self.current_servers[0]) if self.current_servers else None
+        if primary is not None:
+            self.com_obj = primary[1]
+            self.current_queue = primary[0].queue
+        return not self.starting
+
+
+    def _start_server(self, instance, server):
+        obj, _socket = self.start_process(self.available_servers[server])
+        if not obj:
+            return False
+        if _socket:
+            com_obj = _socket
+            self.server_processes[instance] = obj
         else:
-            obj, _socket = self.start_process(self.available_servers[language])
-            if obj:
-                if _socket:
-                    self.com_obj = _socket
-                else:
-                    self.com_obj = obj
-                self.current_queue = queue.Queue()
-                ready = threading.Event()
-                process_monitor = PROCESS_MONITOR(self.current_queue, self.com_obj, self.callback, ready)
-                process_monitor.setDaemon(True)
-                start = time.time()
-                process_monitor.start()
-                ready.wait(2)
-                log(f'thread start took {time.time() - start}')
-                log(f'self.com_obj:{type(self.com_obj)}')
-                self.running_servers[language] = (process_monitor, self.com_obj)
-                # self.running_servers[f'{language}_intialized'] = False
-        return False
+            com_obj = obj
+            self.server_processes[instance] = obj.process
+        ready = threading.Event()
+        process_monitor = PROCESS_MONITOR(queue.Queue(), com_obj, self.callback, ready, instance)
+        process_monitor.setDaemon(True)
+        start = time.time()
+        process_monitor.start()
+        ready.wait(2)
+        log(f'thread start of {instance} took {time.time() - start}')
+        log(f'com_obj:{type(com_obj)}')
+        self.running_servers[instance] = (process_monitor, com_obj)
+        return True
+
+
+    def forget(self, instance):
+        ''' drops a server instance which is being shut down, returns its (monitor, com_obj, process) '''
+        with self.backlog_lock:
+            self.backlogs.pop(instance, None)
+        if instance in self.current_servers:
+            self.current_servers.remove(instance)
+        monitor, com_obj = self.running_servers.pop(instance)
+        return monitor, com_obj, self.server_processes.pop(instance, None)
 
 
     def stop_monitoring_thread(self, language):
@@ -87,6 +87,12 @@ class MarkupKind:
     Markdown = 'markdown'
 
 
+class PositionEncodingKind:
+    UTF8 = 'utf-8'
+    UTF16 = 'utf-16'
+    UTF32 = 'utf-32'
+
+
 class ResourceOperationKind:
     Create = 'create'
     Rename = 'rename'
@@ -153,6 +159,16 @@ class DiagnosticSeverity(enum.IntEnum):
     Hint = 4
 
 
+SemanticTokenTypes = ['namespace', 'type', 'class', 'enum', 'interface', 'struct',
+                      'typeParameter', 'parameter', 'variable', 'property', 'enumMember',
+                      'event', 'function', 'method', 'macro', 'keyword', 'modifier',
+                      'comment', 'string', 'number', 'regexp', 'operator', 'decorator']
+
+
+SemanticTokenModifiers = ['declaration', 'definition', 'readonly', 'static', 'deprecated',
+                          'abstract', 'async', 'modification', 'documentation', 'defaultLibrary']
+
+
 class MESSAGES:
     '''
         Implements request, response and notification messages as per specifiaction
@@ -165,6 +181,7 @@ class MESSAGES:
         self.request_skeleton = {'jsonrpc': '2.0', 'id': None, 'method': None, 'params': None}
         self.empty_dict = dict()
         self.request_id = 0
+        self.request_method = None
 
 
     def _next_id(self):
@@ -208,6 +225,7 @@ class MESSAGES:
             Raises: Nothing
         '''
         self.request_skeleton['id'] = self._next_id()
+        self.request_method = method
         self.request_skeleton['method'] = method
         self.request_skeleton['params'] = params if params is not None else self.empty_dict
         return self._create_lsp_message(self.request_skeleton)
@@ -229,13 +247,14 @@ class MESSAGES:
             Returns: Nothing
             Raises: Nothing
         '''
-        # self.response_skeleton = {'jsonrpc': '2.0'}
-        self.response_skeleton['id'] = id
+        # a new dict each time, a result must not be sent along with the error of a former response,
+        # and responses are created on the reader threads
+        response = {'jsonrpc': '2.0', 'id': id}
         if error is None:
-            self.response_skeleton['result'] = result
+            response['result'] = result
         else:  # error class provided
-            self.response_skeleton['error'] = error
-        return self._create_lsp_message(self.response_skeleton)
+            response['error'] = error
+        return self._create_lsp_message(response)
 
 
     def decode(self, msg):
@@ -250,8 +269,12 @@ class MESSAGES:
     # Response
 
 
-    def response(self, message):
-        return self._response(message.get('id'))
+    def response(self, message, result=None):
+        return self._response(message.get('id'), result)
+
+
+    def error_response(self, message, code, error_message):
+        return self._response(message.get('id'), error={'code': code, 'message': error_message})
 
 
     # --------------------------------------------------------------------------------------------------------------------
@@ -262,9 +285,9 @@ class MESSAGES:
         return self._notif('initialized', None)
 
 
-    def didOpen(self, _file, _languageId, _version, _text):
+    def didOpen(self, _uri, _languageId, _version, _text):
         params = {'textDocument': {
-                  'uri': f'file:{pathname2url(_file)}',
+                  'uri': _uri,
                   'languageId': _languageId,
                   'version': _version,  # increase after each change, including undo/redo
                   'text': _text
@@ -273,9 +296,9 @@ class MESSAGES:
         return self._notif('textDocument/didOpen', params)
 
 
-    def didChange(self, _file, _languageId, _version, _changes):
+    def didChange(self, _uri, _languageId, _version, _changes):
         params = {'textDocument': {
-            'uri': f'file:{pathname2url(_file)}',
+            'uri': _uri,
             'languageId': _languageId,
             'version': _version  # increase after each change, including undo/redo
         },
@@ -284,18 +307,18 @@ class MESSAGES:
         return self._notif('textDocument/didChange', params)
 
 
-    def didSave(self, _file, _version):
+    def didSave(self, _uri, _version):
         params = {'textDocument': {
-            'uri': f'file:{pathname2url(_file)}',
+            'uri': _uri,
             'version': _version  # increase after each change, including undo/redo
         }
         }
         return self._notif('textDocument/didSave', params)
 
 
-    def willSave(self, _file, _version, _reason):
+    def willSave(self, _uri, _version, _reason):
         params = {'textDocument': {
-            'uri': f'file:{pathname2url(_file)}',
+            'uri': _uri,
             'version': _version
         },
             'reason': _reason
@@ -306,9 +329,9 @@ class MESSAGES:
     def exit(self): return self._notif('exit', None)
 
 
-    def didClose(self, _file):
+    def didClose(self, _uri):
         params = {'textDocument': {
-            'uri': f'file:{pathname2url(_file)}'
+            'uri': _uri
         }
         }
         return self._notif('textDocument/didClose', params)
@@ -318,9 +341,24 @@ class MESSAGES:
         params = {'settings': _settings}
         return self._notif('workspace/didChangeConfiguration', params)
 
+    def didChangeWorkspaceFolders(self, added, removed=None):
+        params = {'event': {
+            'added': added,
+            'removed': removed or []
+        }
+        }
+        return self._notif('workspace/didChangeWorkspaceFolders', params)
+
+    def didChangeWatchedFiles(self, changes):
+        params = {'changes': changes}
+        return self._notif('workspace/didChangeWatchedFiles', params)
+
     # --------------------------------------------------------------------------------------------------------------------
     # Requests
-    def initialize(self, rootUri, pid):
+    def initialize(self, rootUri, pid, workspace_folders=None, position_encodings=None):
+        if position_encodings is None:
+            # in order of preference, utf-8 positions are scintilla positions and need no conversion
+            position_encodings = [PositionEncodingKind.UTF8, PositionEncodingKind.UTF32, PositionEncodingKind.UTF16]
         params = {
             # The process Id of the parent process that started
             # the server. Is null if the process has not been started by another process.
@@ -354,15 +392,16 @@ class MESSAGES:
             # capabilities: ClientCapabilities;
             'capabilities': {
                 'workspace': {
-                    'applyEdit': False,
+                    'applyEdit': True,
                     'workspaceEdit': {
-                        'documentChanges': False
+                        'documentChanges': True
                     },
                     'didChangeConfiguration': {
-                        'dynamicRegistration': False
+                        'dynamicRegistration': True
                     },
                     'didChangeWatchedFiles': {
-                        'dynamicRegistration': False
+                        'dynamicRegistration': True,
+                        'relativePatternSupport': True
                     },
                     'symbol': {
                         'dynamicRegistration': False,
@@ -417,7 +456,9 @@ class MESSAGES:
                             'snippetSupport': False,
                             'commitCharactersSupport': True,
                             'documentationFormat': ['plaintext'],
-                            'deprecatedSupport': True
+                            'deprecatedSupport': True,
+                            # resolved for the highlighted item only, see completion_items.py
+                            'resolveSupport': {'properties': ['documentation', 'detail']}
                         },
                         'completionItemKind': {
                             'valueSet': [# CompletionItemKind.Text,
@@ -495,6 +536,7 @@ class MESSAGES:
                     },
                     'codeAction': {'dynamicRegistration': False},
                     'codeLens': {'dynamicRegistration': False},
+                    'inlayHint': {'dynamicRegistration': False},
                     'formatting': {'dynamicRegistration': False},
                     'rangeFormatting': {'dynamicRegistration': False},
                     'onTypeFormatting': {'dynamicRegistration': False},
@@ -507,7 +549,25 @@ class MESSAGES:
                         'dynamicRegistration': False,
                         'rangeLimit': 5000,
                         'lineFoldingOnly': True
+                    },
+                    'semanticTokens': {
+                        'dynamicRegistration': False,
+                        'requests': {
+                            'range': True,
+                            'full': {'delta': True}
+                        },
+                        'tokenTypes': SemanticTokenTypes,
+                        'tokenModifiers': SemanticTokenModifiers,
+                        'formats': ['relative'],
+                        'overlappingTokenSupport': False,
+                        'multilineTokenSupport': False
                     }
+                },
+                'general': {
+                    'positionEncodings': position_encodings
+                },
+                'window': {
+                    'workDoneProgress': True
                 }
             },
 
@@ -527,14 +587,14 @@ class MESSAGES:
             #
             # workspaceFolders?: WorkspaceFolder[] | null;
             # params += '"workspaceFolders": [{"uri": "file:///Users/octref/Code/css-test", "name": "css-test"}]'
-            'workspaceFolders': None
+            'workspaceFolders': workspace_folders
 
         }
         return self._request('initialize', params)
 
 
-    def completion(self, _file, _version, _line, _character):
-        params = {'textDocument': {'uri': f'file:{pathname2url(_file)}',
+    def completion(self, _uri, _version, _line, _character):
+        params = {'textDocument': {'uri': _uri,
                                    'version': _version
                                    },
                   'position': {'line': _line,
@@ -545,11 +605,9 @@ class MESSAGES:
         return self._request('textDocument/completion', params)
 
 
-    def signatureHelp(self, _file, _languageId, _version, _text, _line, _character):
-        params = {'textDocument': {'uri': f'file:{pathname2url(_file)}',
-                                   'languageId': _languageId,
-                                   'version': _version,  # increase after each change, including undo/redo
-                                   'text': _text
+    def signatureHelp(self, _uri, _version, _line, _character):
+        params = {'textDocument': {'uri': _uri,
+                                   'version': _version
                                    },
                   'position': {'line': _line,
                                'character': _character
@@ -567,14 +625,14 @@ class MESSAGES:
         return self._request('$/cancelRequest', params)
 
 
-    def documentSymbol(self, _file, _version):
-        params = {'textDocument': {'uri': f'file:{pathname2url(_file)}',
+    def documentSymbol(self, _uri, _version):
+        params = {'textDocument': {'uri': _uri,
                                    'version': _version}}
         return self._request('textDocument/documentSymbol', params)
 
 
-    def formatting(self, _file, _version, tabSize=4, insertSpaces=True):
-        params = {'textDocument': {'uri': f'file:{pathname2url(_file)}',
+    def formatting(self, _uri, _version, tabSize=4, insertSpaces=True):
+        params = {'textDocument': {'uri': _uri,
                                    'version': _version},
                   'options': {
                         # Size of a tab in spaces.
@@ -591,8 +649,8 @@ class MESSAGES:
         return self._request('textDocument/formatting', params)
 
 
-    def definition(self, _file, _version, _line, _character):
-        params = {'textDocument': {'uri': f'file:{pathname2url(_file)}',
+    def definition(self, _uri, _version, _line, _character):
+        params = {'textDocument': {'uri': _uri,
                                    'version': _version
                                    },
                   'position': {'line': _line,
@@ -602,8 +660,8 @@ class MESSAGES:
         return self._request('textDocument/definition', params)
 
 
-    def hover(self, _file, _version, _line, _character):
-        params = {'textDocument': {'uri': f'file:{pathname2url(_file)}',
+    def hover(self, _uri, _version, _line, _character):
+        params = {'textDocument': {'uri': _uri,
                                    'version': _version
                                    },
                   'position': {'line': _line,
@@ -613,8 +671,8 @@ class MESSAGES:
         return self._request('textDocument/hover', params)
 
 
-    def references(self, _file, _version, _line, _character, _includeDeclaration=True):
-        params = {'textDocument': {'uri': f'file:{pathname2url(_file)}',
+    def references(self, _uri, _version, _line, _character, _includeDeclaration=True):
+        params = {'textDocument': {'uri': _uri,
                                    'version': _version
                                    },
                   'position': {'line': _line,
@@ -625,16 +683,16 @@ class MESSAGES:
         return self._request('textDocument/references', params)
 
 
-    def codeLens(self, _file, _version):
-        params = {'textDocument': {'uri': f'file:{pathname2url(_file)}',
+    def codeLens(self, _uri, _version):
+        params = {'textDocument': {'uri': _uri,
                                    'version': _version
                                    }
                   }
         return self._request('textDocument/codeLens', params)
 
 
-    def rename(self, _file, _version, _line, _character, _new_name):
-        params = {'textDocument': {'uri': f'file:{pathname2url(_file)}',
+    def rename(self, _uri, _version, _line, _character, _new_name):
+        params = {'textDocument': {'uri': _uri,
                                    'version': _version
                                    },
                   'position': {'line': _line,
@@ -645,8 +703,8 @@ class MESSAGES:
         return self._request('textDocument/rename', params)
 
 
-    def prepareRename(self, _file, _version, _line, _character):
-        params = {'textDocument': {'uri': f'file:{pathname2url(_file)}',
+    def prepareRename(self, _uri, _version, _line, _character):
+        params = {'textDocument': {'uri': _uri,
                                    'version': _version
                                    },
                   'position': {'line': _line,
@@ -656,16 +714,16 @@ class MESSAGES:
         return self._request('textDocument/prepareRename', params)
 
 
-    def foldingRange(self, _file, _version):
-        params = {'textDocument': {'uri': f'file:{pathname2url(_file)}',
+    def foldingRange(self, _uri, _version):
+        params = {'textDocument': {'uri': _uri,
                                    'version': _version
                                    }
                   }
         return self._request('textDocument/foldingRange', params)
 
 
-    def declaration(self, _file, _version, _line, _character):
-        params = {'textDocument': {'uri': f'file:{pathname2url(_file)}',
+    def declaration(self, _uri, _version, _line, _character):
+        params = {'textDocument': {'uri': _uri,
                                    'version': _version
                                    },
                   'position': {'line': _line,
@@ -675,8 +733,8 @@ class MESSAGES:
         return self._request('textDocument/declaration', params)
 
 
-    def typeDefinition(self, _file, _version, _line, _character):
-        params = {'textDocument': {'uri': f'file:{pathname2url(_file)}',
+    def typeDefinition(self, _uri, _version, _line, _character):
+        params = {'textDocument': {'uri': _uri,
                                    'version': _version
                                    },
                   'position': {'line': _line,
@@ -686,9 +744,9 @@ class MESSAGES:
         return self._request('textDocument/typeDefinition', params)
 
 
-    def documentHighlight(self, _file, _version, _line, _character):
+    def documentHighlight(self, _uri, _version, _line, _character):
         params = {'textDocument': {
-                  'uri': f'file:{pathname2url(_file)}',
+                  'uri': _uri,
                   'version': _version},
                   'position': {
                   'line': _line,
@@ -698,12 +756,13 @@ class MESSAGES:
 
 
     def workspace_symbol(self, _query):
-        params = {'WorkspaceSymbolParams ': {'query': _query}}
+        params = {'query': _query}
         return self._request('workspace/symbol', params)
 
 
-    def resolve(self, _label):
-        params = {'CompletionItem ': {'label': _label}}
+    def resolve(self, _item):
+        # the params are the CompletionItem as the server sent it, data included
+        params = _item
         # label: string;
         # kind?: number;
         # detail?: string;
@@ -722,8 +781,8 @@ class MESSAGES:
         return self._request('completionItem/resolve', params)
 
 
-    def rangeFormatting(self, _file, _version, start, end, tabSize=4, insertSpaces=True):
-        params = {'textDocument': {'uri': f'file:{pathname2url(_file)}',
+    def rangeFormatting(self, _uri, _version, start, end, tabSize=4, insertSpaces=True):
+        params = {'textDocument': {'uri': _uri,
                                    'version': _version},
                   'range': {'start': {'line': start[0], 'character': start[1]},
                             'end': {'line': end[0], 'character': end[1]}},
@@ -742,6 +801,33 @@ class MESSAGES:
         return self._request('textDocument/rangeFormatting', params)
 
 
+    def semanticTokensFull(self, _uri):
+        params = {'textDocument': {'uri': _uri}}
+        return self._request('textDocument/semanticTokens/full', params)
+
+
+    def semanticTokensFullDelta(self, _uri, _previousResultId):
+        params = {'textDocument': {'uri': _uri},
+                  'previousResultId': _previousResultId}
+        return self._request('textDocument/semanticTokens/full/delta', params)
+
+
+    def semanticTokensRange(self, _uri, start, end):
+        params = {'textDocument': {'uri': _uri},
+                  'range': {'start': {'line': start[0], 'character': start[1]},
+                            'end': {'line': end[0], 'character': end[1]}}
+                  }
+        return self._request('textDocument/semanticTokens/range', params)
+
+
+    def inlayHint(self, _uri, start, end):
+        params = {'textDocument': {'uri': _uri},
+                  'range': {'start': {'line': start[0], 'character': start[1]},
+                            'end': {'line': end[0], 'character': end[1]}}
+                  }
+        return self._request('textDocument/inlayHint', params)
+
+
     # not implemented yet
 
 
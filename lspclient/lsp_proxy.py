@@ -0,0 +1,487 @@
+'''
+    Local lsp proxy, shares language servers between notepad++ instances
+
+    Runs as a separate python process, the client starts it on first use,
+    see PROXY_OBJECT in io_handler. Each client connection tells the proxy
+    the config of the server it wants with a $/proxy/connect notification,
+    the initialize request adds the root. The proxy owns one server per
+    (server config, root) and keeps it running after the clients are gone,
+    a client connecting later gets the cached initialize result at once
+    instead of waiting for the server to start and index again.
+
+    Request ids of the clients are rewritten to ids unique per server and
+    restored in the responses. Documents are reference counted, the server
+    sees a didOpen only for the first client and a didClose for the last one,
+    versions are renumbered per server and mapped back to the numbers of the
+    client in diagnostics and workspace edits, a version of another client's
+    text is left out of diagnostics and makes a versioned edit fail. Diagnostics
+    go to the clients which have the document open, other notifications to all
+    clients of the server.
+    shutdown and exit of a client only end its connection.
+
+    The proxy starts servers on behalf of its clients, any local process could
+    connect to the port. On start it writes a random token to the token file,
+    in the config directory of the user, a client must send it with its
+    $/proxy/connect notification, connections which don't are closed.
+
+    Only uses the standard library, it must not import anything of notepad++:
+        python lsp_proxy.py --port 2088 --token-file C:\\Users\\me\\lsp_proxy.token --idle-minutes 60
+'''
+import os
+import sys
+import json
+import time
+import socket
+import hmac
+import secrets
+import argparse
+import threading
+import subprocess
+import logging
+log = logging.info
+
+PORT = 2088
+# the proxy ends once no client was connected for that long
+IDLE_MINUTES = 60
+CONNECT_METHOD = '$/proxy/connect'
+TOKEN_FILE = os.path.join(os.path.expanduser('~'), '.lsp_proxy.token')
+# keeps the servers started by a proxy without a console from opening a window
+CREATE_NO_WINDOW = 0x08000000 if os.name == 'nt' else 0
+# server versions of a document which can still be mapped back to the version of a client
+MAX_VERSIONS = 64
+# requests whose results may contain versioned workspace edits
+VERSIONED_RESULTS = {'textDocument/rename', 'textDocument/codeAction', 'codeAction/resolve',
+                     'workspace/executeCommand', 'workspace/willRenameFiles', 'workspace/willCreateFiles',
+                     'workspace/willDeleteFiles'}
+
+
+def read_message(stream):
+    ''' reads one message from a binary stream, returns the decoded dict or None once the stream ended '''
+    content_length = None
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            if content_length is not None:
+                break
+            continue
+        name, _, value = line.partition(b':')
+        if name.strip().lower() == b'content-length':
+            content_length = int(value)
+    body = stream.read(content_length)
+    if len(body) < content_length:
+        return None
+    return json.loads(body)
+
+
+def write_token(path):
+    ''' writes a new random token to path, only readable by the user, returns it '''
+    token = secrets.token_hex(32)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), 'w') as f:
+        f.write(token)
+    return token
+
+
+def encode_message(message):
+    body = json.dumps(message).encode('utf-8')
+    return b'Content-Length: %d\r\n\r\n%s' % (len(body), body)
+
+
+class BACKEND:
+    ''' a server process shared by the clients with the same server config and root '''
+    def __init__(self, key, config):
+        self.key = key
+        args = [config['executable']] + list(config.get('args') or [])
+        env = os.environ.copy()
+        for var in config.get('env') or []:
+            k, v = var.split('=', 1)
+            env[k] = v
+        self.process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        cwd=os.path.dirname(config['executable']) or None, env=env,
+                                        creationflags=CREATE_NO_WINDOW)
+        self.write_lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.clients = []  # in order of attaching, server requests go to the last one
+        self.next_id = 0
+        self.requests = dict()  # server side id -> (client, client id, method)
+        self.request_ids = dict()  # (client, client id) -> server side id, for $/cancelRequest
+        self.initialize_id = None
+        self.initialize_result = None
+        self.initialize_waiting = []  # (client, client id) waiting for the initialize result
+        self.initialized_sent = False
+        self.open_documents = dict()  # uri -> clients which have it open
+        self.versions = dict()  # uri -> last version sent to the server
+        self.client_versions = dict()  # uri -> {server version: (client, client version)}, oldest first
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+        log(f'server {args} started, pid {self.process.pid}')
+
+
+    def alive(self):
+        return self.process.poll() is None
+
+
+    def send(self, message):
+        with self.write_lock:
+            self.process.stdin.write(encode_message(message))
+            self.process.stdin.flush()
+
+
+    def attach(self, client):
+        with self.lock:
+            self.clients.append(client)
+
+
+    def detach(self, client):
+        ''' closes the documents only client had open and forgets its pending requests '''
+        closed = []
+        with self.lock:
+            if client in self.clients:
+                self.clients.remove(client)
+            for uri, clients in list(self.open_documents.items()):
+                clients.discard(client)
+                if not clients:
+                    del self.open_documents[uri]
+                    self.versions.pop(uri, None)
+                    self.client_versions.pop(uri, None)
+                    closed.append(uri)
+            for server_id, (_client, client_id, _method) in list(self.requests.items()):
+                if _client is client:
+                    del self.requests[server_id]
+                    self.request_ids.pop((client, client_id), None)
+        for uri in closed:
+            self.send({'jsonrpc': '2.0', 'method': 'textDocument/didClose', 'params': {'textDocument': {'uri': uri}}})
+
+
+    def initialize(self, client, message):
+        ''' answers from the cache once the server has been initialized, the server sees a single initialize '''
+        with self.lock:
+            if self.initialize_result is not None:
+                client.send({'jsonrpc': '2.0', 'id': message['id'], 'result': self.initialize_result})
+                return
+            self.initialize_waiting.append((client, message['id']))
+            if self.initialize_id is not None:
+                return
+            self.next_id += 1
+            self.initialize_id = self.next_id
+        self.send(dict(message, id=self.initialize_id))
+
+
+    def request(self, client, message):
+        with self.lock:
+            self.next_id += 1
+            server_id = self.next_id
+            self.requests[server_id] = (client, message['id'], message['method'])
+            self.request_ids[(client, message['id'])] = server_id
+        self.send(dict(message, id=server_id))
+
+
+    def notification(self, client, message):
+        method = message['method']
+        params = message.get('params') or {}
+        if method == 'initialized':
+            with self.lock:
+                if self.initialized_sent:
+                    return
+                self.initialized_sent = True
+        elif method == '$/cancelRequest':
+            server_id = self.request_ids.get((client, params.get('id')))
+            if server_id is None:
+                return
+            message = dict(message, params=dict(params, id=server_id))
+        elif method in ('textDocument/didOpen', 'textDocument/didChange', 'textDocument/didClose'):
+            message = self._document_notification(client, method, params)
+            if message is None:
+                return
+        self.send(message)
+
+
+    def _document_notification(self, client, method, params):
+        document = params['textDocument']
+        uri = document['uri']
+        with self.lock:
+            clients = self.open_documents.setdefault(uri, set())
+            if method == 'textDocument/didClose':
+                clients.discard(client)
+                if clients:
+                    return None
+                del self.open_documents[uri]
+                self.versions.pop(uri, None)
+                self.client_versions.pop(uri, None)
+                return {'jsonrpc': '2.0', 'method': method, 'params': params}
+            version = self.versions.get(uri, 0) + 1
+            self.versions[uri] = version
+            client_versions = self.client_versions.setdefault(uri, dict())
+            client_versions[version] = (client, document.get('version'))
+            if len(client_versions) > MAX_VERSIONS:
+                del client_versions[next(iter(client_versions))]
+            already_open = bool(clients)
+            clients.add(client)
+        if method == 'textDocument/didOpen' and already_open:
+            # another client opened it too, its text replaces the one the server knows
+            return {'jsonrpc': '2.0', 'method': 'textDocument/didChange',
+                    'params': {'textDocument': {'uri': uri, 'version': version},
+                               'contentChanges': [{'text': document['text']}]}}
+        return {'jsonrpc': '2.0', 'method': method, 'params': dict(params, textDocument=dict(document, version=version))}
+
+
+    def _client_version(self, client, uri, version):
+        ''' the version number client used for the server version of uri, None if it is of another client's text '''
+        with self.lock:
+            _client, client_version = self.client_versions.get(uri, dict()).get(version, (None, None))
+        return client_version if _client is client else None
+
+
+    def _map_versions(self, client, message):
+        '''
+            Returns message with the server versions of documents replaced by the versions of client
+
+            Versioned documents are searched in diagnostics and workspace edits. A version
+            which isn't one of client becomes -1, an edit for it fails in the client.
+        '''
+        params = message.get('params')
+        if message.get('method') == 'textDocument/publishDiagnostics':
+            if params.get('version') is None:
+                return message
+            version = self._client_version(client, params['uri'], params['version'])
+            params = dict(params, version=version)
+            if version is None:
+                del params['version']
+            return dict(message, params=params)
+        if message.get('method') == 'workspace/applyEdit':
+            return dict(message, params=dict(params, edit=self._map_edit(client, params['edit'])))
+        result = message.get('result')
+        if not isinstance(result, (dict, list)):
+            return message
+        if isinstance(result, list):
+            # code actions and commands
+            return dict(message, result=[dict(item, edit=self._map_edit(client, item['edit']))
+                                         if isinstance(item, dict) and 'edit' in item else item for item in result])
+        if 'edit' in result:
+            return dict(message, result=dict(result, edit=self._map_edit(client, result['edit'])))
+        return dict(message, result=self._map_edit(client, result))
+
+
+    def _map_edit(self, client, edit):
+        ''' returns the WorkspaceEdit with the versions of its documentChanges mapped to client '''
+        if not isinstance(edit, dict) or not edit.get('documentChanges'):
+            return edit
+        changes = []
+        for change in edit['documentChanges']:
+            document = change.get('textDocument') if isinstance(change, dict) else None
+            if document is not None and document.get('version') is not None:
+                version = self._client_version(client, document['uri'], document['version'])
+                change = dict(change, textDocument=dict(document, version=-1 if version is None else version))
+            changes.append(change)
+        return dict(edit, documentChanges=changes)
+
+
+    def _read(self):
+        while True:
+            message = read_message(self.process.stdout)
+            if message is None:
+                log(f'server {self.key[0]} closed its output')
+                return
+            try:
+                self._on_server_message(message)
+            except Exception as e:  # pylint: disable=W0703
+                log(f'{e} while routing {message}')
+
+
+    def _on_server_message(self, message):
+        if 'id' in message and 'method' not in message:
+            if message['id'] == self.initialize_id:
+                with self.lock:
+                    self.initialize_result = message.get('result')
+                    waiting, self.initialize_waiting = self.initialize_waiting, []
+                for client, client_id in waiting:
+                    client.send(dict(message, id=client_id))
+                return
+            with self.lock:
+                target = self.requests.pop(message['id'], None)
+                if target is not None:
+                    self.request_ids.pop(target[:2], None)
+            if target is not None:
+                client, client_id, method = target
+                if method in VERSIONED_RESULTS:
+                    message = self._map_versions(client, message)
+                client.send(dict(message, id=client_id))
+        elif 'id' in message:
+            # a request of the server, answered by the client which attached last
+            with self.lock:
+                client = self.clients[-1] if self.clients else None
+            if client is not None:
+                client.send(self._map_versions(client, message))
+            else:
+                self.send({'jsonrpc': '2.0', 'id': message['id'], 'result': None})
+        else:
+            with self.lock:
+                clients = list(self.clients)
+                if message.get('method') == 'textDocument/publishDiagnostics':
+                    clients = [client for client in clients
+                               if client in self.open_documents.get(message['params']['uri'], clients)]
+            for client in clients:
+                client.send(self._map_versions(client, message))
+
+
+    def stop(self):
+        try:
+            self.send({'jsonrpc': '2.0', 'id': 0, 'method': 'shutdown', 'params': None})
+            self.send({'jsonrpc': '2.0', 'method': 'exit', 'params': None})
+            self.process.wait(2)
+        except Exception:  # pylint: disable=W0703
+            self.process.kill()
+
+
+class CLIENT:
+    ''' a connection of a notepad++ instance '''
+    def __init__(self, proxy, connection):
+        self.proxy = proxy
+        self.connection = connection
+        self.reader = connection.makefile('rb')
+        self.write_lock = threading.Lock()
+        self.config = None
+        self.backend = None
+
+
+    def send(self, message):
+        try:
+            with self.write_lock:
+                self.connection.sendall(encode_message(message))
+        except OSError as e:
+            log(f'client gone: {e}')
+
+
+    def run(self):
+        try:
+            while True:
+                message = read_message(self.reader)
+                if message is None or not self._on_client_message(message):
+                    break
+        except (OSError, ValueError) as e:
+            log(f'client connection failed: {e}')
+        finally:
+            if self.backend is not None:
+                self.backend.detach(self)
+            # the socket stays open as long as its file is
+            self.reader.close()
+            self.connection.close()
+            self.proxy.client_closed(self)
+
+
+    def _on_client_message(self, message):
+        ''' returns False once the client sent exit or didn't authenticate with its first message '''
+        method = message.get('method')
+        if self.config is None:
+            params = message.get('params') or {}
+            if method != CONNECT_METHOD or not self.proxy.authenticated(params.get('token')):
+                log(f'connection without a valid token closed, first message {method}')
+                return False
+            self.config = params['config']
+        elif method == CONNECT_METHOD:
+            log(f'{method} of a connected client dropped')
+        elif method == 'initialize':
+            params = message.get('params') or {}
+            self.backend = self.proxy.backend(self.config, params.get('rootUri') or params.get('rootPath'))
+            self.backend.attach(self)
+            self.backend.initialize(self, message)
+        elif method == 'shutdown':
+            # the server stays warm for the next client
+            self.send({'jsonrpc': '2.0', 'id': message['id'], 'result': None})
+        elif method == 'exit':
+            return False
+        elif self.backend is None:
+            log(f'{method} before initialize dropped')
+        elif method is None:
+            # the answer to a request of the server
+            self.backend.send(message)
+        elif 'id' in message:
+            self.backend.request(self, message)
+        else:
+            self.backend.notification(self, message)
+        return True
+
+
+class LSP_PROXY:
+    def __init__(self, port=PORT, idle_minutes=IDLE_MINUTES, token_file=TOKEN_FILE):
+        self.port = port
+        self.token_file = token_file
+        self.token = None
+        self.idle_seconds = idle_minutes * 60
+        self.backends = dict()  # (server config, root) -> BACKEND
+        self.clients = set()
+        self.lock = threading.Lock()
+        self.last_client = time.monotonic()
+
+
+    def backend(self, config, root):
+        key = (json.dumps(config, sort_keys=True), root)
+        with self.lock:
+            backend = self.backends.get(key)
+            if backend is None or not backend.alive():
+                backend = self.backends[key] = BACKEND(key, config)
+        return backend
+
+
+    def authenticated(self, token):
+        return isinstance(token, str) and hmac.compare_digest(token.encode(), self.token.encode())
+
+
+    def client_closed(self, client):
+        with self.lock:
+            self.clients.discard(client)
+            self.last_client = time.monotonic()
+
+
+    def serve(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', self.port))
+        # written once the port is ours, a proxy which lost the race leaves the token of the running one alone
+        self.token = write_token(self.token_file)
+        listener.listen()
+        listener.settimeout(10)
+        log(f'lsp proxy listening on port {self.port}')
+        try:
+            while True:
+                try:
+                    connection, _address = listener.accept()
+                except socket.timeout:
+                    with self.lock:
+                        idle = not self.clients and time.monotonic() - self.last_client > self.idle_seconds
+                    if idle:
+                        log('no clients, lsp proxy ends')
+                        break
+                    continue
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                client = CLIENT(self, connection)
+                with self.lock:
+                    self.clients.add(client)
+                threading.Thread(target=client.run, daemon=True).start()
+        finally:
+            listener.close()
+            for backend in self.backends.values():
+                backend.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='shares language servers between notepad++ instances')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--idle-minutes', type=float, default=IDLE_MINUTES)
+    parser.add_argument('--token-file', default=TOKEN_FILE, help='file the clients read the token from')
+    parser.add_argument('--log', default=None, help='log file, no logging if omitted')
+    args = parser.parse_args(argv)
+    if args.log:
+        logging.basicConfig(filename=args.log, level=logging.INFO,
+                            format='[%(asctime)-15s] [%(thread)-5d] %(funcName)-20s  %(message)s')
+    LSP_PROXY(args.port, args.idle_minutes, args.token_file).serve()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
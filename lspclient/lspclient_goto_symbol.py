@@ -0,0 +1,6 @@
+import lspclient
+from Npp import console
+try:
+    lspclient.goto_symbol()
+except Exception as e:
+    console.writeError(f'error while going to symbol: {e}')
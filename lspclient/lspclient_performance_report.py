@@ -0,0 +1,6 @@
+import lspclient
+from Npp import console
+try:
+    lspclient.performance_report()
+except Exception as e:
+    console.writeError(f'error while creating the performance report: {e}')
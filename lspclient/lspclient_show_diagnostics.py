@@ -0,0 +1,6 @@
+import lspclient
+from Npp import console
+try:
+    lspclient.show_diagnostics()
+except Exception as e:
+    console.writeError(f'error while showing the diagnostics: {e}')
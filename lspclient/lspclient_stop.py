@@ -1,6 +1,8 @@
 import lspclient
 from Npp import console
 try:
-    lspclient.stop()
+    report = lspclient.stop()
+    if report:
+        print(report)
 except Exception as e:
     console.writeError(f'error stoping lspclient: {e}')
@@ -0,0 +1,149 @@
+'''
+    Per request latency measurement
+
+    Every request is timestamped when it is sent, when the first byte of the
+    response has been read, when the response has been read completely,
+    when it has been decoded and when its handler has finished.
+    The differences are recorded in HDR style histograms per server, method and stage.
+'''
+import time
+import threading
+from array import array
+
+STAGES = ('wait', 'read', 'decode', 'handler', 'total')
+
+# 2**SUB_BUCKET_BITS linear sub buckets per power of two, ~6% relative precision
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+_DIRECT_LIMIT = SUB_BUCKETS * 2
+
+
+class LATENCY_HISTOGRAM:
+    '''
+        Logarithmic histogram of microsecond values.
+        Values below 32 are counted exactly, larger values are counted
+        in 16 equally sized buckets per power of two.
+    '''
+    def __init__(self):
+        self.counts = array('L', [0]) * (64 * SUB_BUCKETS)
+        self.count = 0
+        self.max = 0
+
+
+    def record(self, value):
+        if value < _DIRECT_LIMIT:
+            index = value if value > 0 else 0
+        else:
+            shift = value.bit_length() - SUB_BUCKET_BITS - 1
+            index = (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+        self.counts[index] += 1
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+
+    @staticmethod
+    def bucket_value(index):
+        ''' returns the middle of the bucket '''
+        if index < _DIRECT_LIMIT:
+            return index
+        shift = index // SUB_BUCKETS - 1
+        return ((index % SUB_BUCKETS + SUB_BUCKETS) << shift) + (1 << shift) // 2
+
+
+    def percentiles(self, *percents):
+        ''' returns the values for the given percents, e.g. percentiles(50, 90, 99) '''
+        results = []
+        targets = [max(1, round(self.count * percent / 100)) for percent in percents]
+        seen = 0
+        target_index = 0
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            seen += count
+            while target_index < len(targets) and seen >= targets[target_index]:
+                results.append(min(self.bucket_value(index), self.max))
+                target_index += 1
+            if target_index == len(targets):
+                break
+        return results + [self.max] * (len(targets) - len(results))
+
+
+class LATENCY_METRICS:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.pending = dict()
+        self.histograms = dict()
+        self.lock = threading.Lock()
+
+
+    def request_sent(self, request_id, server, method):
+        if self.enabled:
+            self.pending[request_id] = [server, method, time.perf_counter_ns(), 0, 0, 0]
+
+
+    def response_decoded(self, request_id, first_byte_ns, read_ns, decoded_ns):
+        if self.enabled and request_id in self.pending:
+            timestamps = self.pending[request_id]
+            timestamps[3] = first_byte_ns or read_ns
+            timestamps[4] = read_ns
+            timestamps[5] = decoded_ns
+
+
+    def response_handled(self, request_id):
+        if not self.enabled:
+            return
+        handled_ns = time.perf_counter_ns()
+        timestamps = self.pending.pop(request_id, None)
+        if timestamps is None or not timestamps[5]:
+            return
+        server, method, sent_ns, first_byte_ns, read_ns, decoded_ns = timestamps
+        with self.lock:
+            histograms = self.histograms.get((server, method))
+            if histograms is None:
+                histograms = self.histograms[(server, method)] = tuple(LATENCY_HISTOGRAM() for _ in STAGES)
+            histograms[0].record((first_byte_ns - sent_ns) // 1000)
+            histograms[1].record((read_ns - first_byte_ns) // 1000)
+            histograms[2].record((decoded_ns - read_ns) // 1000)
+            histograms[3].record((handled_ns - decoded_ns) // 1000)
+            histograms[4].record((handled_ns - sent_ns) // 1000)
+
+
+    def response_dropped(self, request_id):
+        ''' the response was outdated or superseded, its handler never ran '''
+        self.pending.pop(request_id, None)
+
+
+    def record(self, server, name, microseconds):
+        ''' records a value which is not related to a single request, e.g. a batch of ui updates '''
+        if not self.enabled:
+            return
+        with self.lock:
+            histograms = self.histograms.get((server, name))
+            if histograms is None:
+                histograms = self.histograms[(server, name)] = tuple(LATENCY_HISTOGRAM() for _ in STAGES)
+            histograms[4].record(int(microseconds))
+
+
+    def reset(self):
+        with self.lock:
+            self.pending.clear()
+            self.histograms.clear()
+
+
+    def report(self):
+        ''' returns the collected latencies as text table, values in milliseconds '''
+        if not self.enabled:
+            return 'latency metrics are disabled, set "metrics": true in the config file'
+        lines = [f'{"server":<12} {"method":<40} {"stage":<8} {"count":>7} '
+                 f'{"p50":>9} {"p90":>9} {"p99":>9} {"max":>9}']
+        with self.lock:
+            for server, method in sorted(self.histograms):
+                for stage, histogram in zip(STAGES, self.histograms[(server, method)]):
+                    if not histogram.count:
+                        continue
+                    p50, p90, p99 = histogram.percentiles(50, 90, 99)
+                    lines.append(f'{server:<12} {method:<40} {stage:<8} {histogram.count:>7} '
+                                 f'{p50 / 1000:>9.3f} {p90 / 1000:>9.3f} {p99 / 1000:>9.3f} '
+                                 f'{histogram.max / 1000:>9.3f}')
+        return '\n'.join(lines)
@@ -0,0 +1,134 @@
+'''
+    Converts between scintilla positions and lsp positions
+
+    Scintilla positions are byte offsets into the UTF-8 encoded document,
+    lsp positions are (line, character) pairs where character counts code units
+    of the negotiated position encoding, UTF-16 unless the server chose otherwise.
+    Tabs count as one character, unlike editor.getColumn which expands them.
+
+    For each line which has been used for a conversion, a table mapping byte offsets
+    to code unit offsets is cached. Pure ASCII lines, which are the majority,
+    and UTF-8 positions don't need a table as code units and bytes are identical.
+    The cache gets invalidated by the MODIFIED notification via lines_changed.
+'''
+import bisect
+from array import array
+from .lsp_protocol import PositionEncodingKind
+
+UTF8 = PositionEncodingKind.UTF8
+UTF16 = PositionEncodingKind.UTF16
+UTF32 = PositionEncodingKind.UTF32
+SUPPORTED_ENCODINGS = [UTF8, UTF32, UTF16]
+
+
+def _unit_length(char, encoding):
+    if encoding == UTF8:
+        return len(char.encode('utf-8'))
+    if encoding == UTF16:
+        return 2 if ord(char) > 0xFFFF else 1
+    return 1
+
+
+def index_from_units(text, units, encoding=UTF16):
+    '''
+        Returns the python string index of text which corresponds
+        to the given number of code units of encoding
+    '''
+    if text.isascii() or encoding == UTF32:
+        return min(units, len(text))
+    consumed = 0
+    for index, char in enumerate(text):
+        if consumed >= units:
+            return index
+        consumed += _unit_length(char, encoding)
+    return len(text)
+
+
+class LINE_TABLE:
+    '''
+        byte offset -> code unit offset mapping of a non ASCII line,
+        one entry per character plus the end of line
+    '''
+    __slots__ = ('byte_offsets', 'unit_offsets')
+
+    def __init__(self, text, encoding):
+        self.byte_offsets = array('L', [0])
+        self.unit_offsets = array('L', [0])
+        byte_offset = 0
+        unit_offset = 0
+        for char in text:
+            byte_offset += len(char.encode('utf-8'))
+            unit_offset += _unit_length(char, encoding)
+            self.byte_offsets.append(byte_offset)
+            self.unit_offsets.append(unit_offset)
+
+
+    def units(self, byte_offset):
+        return self.unit_offsets[bisect.bisect_right(self.byte_offsets, byte_offset) - 1]
+
+
+    def bytes(self, units):
+        index = bisect.bisect_left(self.unit_offsets, units)
+        return self.byte_offsets[min(index, len(self.byte_offsets) - 1)]
+
+
+class POSITION_CODEC:
+    '''
+        Position conversion for one document
+    '''
+    def __init__(self, encoding=UTF16):
+        self.encoding = encoding if encoding in SUPPORTED_ENCODINGS else UTF16
+        # line -> (content length in bytes, LINE_TABLE or None for ASCII lines)
+        self.lines = dict()
+
+
+    def _line(self, _editor, line):
+        entry = self.lines.get(line)
+        if entry is None:
+            text = _editor.getLine(line).rstrip('\r\n')
+            if text.isascii():
+                entry = (len(text), None)
+            elif self.encoding == UTF8:
+                entry = (len(text.encode('utf-8')), None)
+            else:
+                table = LINE_TABLE(text, self.encoding)
+                entry = (table.byte_offsets[-1], table)
+            self.lines[line] = entry
+        return entry
+
+
+    def lines_changed(self, line, lines_added):
+        ''' called on MODIFIED notifications with the first modified line '''
+        if lines_added:
+            self.lines = {k: v for k, v in self.lines.items() if k < line}
+        else:
+            self.lines.pop(line, None)
+
+
+    def clear(self):
+        self.lines = dict()
+
+
+    def to_lsp(self, _editor, position):
+        ''' returns the (line, character) tuple of a scintilla position '''
+        line = _editor.lineFromPosition(position)
+        byte_offset = position - _editor.positionFromLine(line)
+        length, table = self._line(_editor, line)
+        if table is None:
+            return line, min(byte_offset, length)
+        return line, table.units(byte_offset)
+
+
+    def byte_offset(self, _editor, line, character):
+        ''' returns the byte offset of character within line '''
+        length, table = self._line(_editor, line)
+        if table is None:
+            return min(character, length)
+        return table.bytes(character)
+
+
+    def from_lsp(self, _editor, line, character):
+        ''' returns the scintilla position of an lsp (line, character) position '''
+        if line >= _editor.getLineCount():
+            return _editor.getTextLength()
+        return _editor.positionFromLine(line) + self.byte_offset(_editor, line, character)
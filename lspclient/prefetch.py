@@ -0,0 +1,112 @@
+'''
+    Speculative go to definition
+
+    While the caret rests on an identifier, or the mouse dwells over one,
+    the definition gets requested in the background. The results are cached
+    per (uri, document version, start of the identifier), goto and peek definition
+    use a cached result instead of waiting for the server.
+    Any modification of a document drops its cached results.
+    Responses complete on the reader threads, the requests and lookups are
+    made on the gui thread, the cache and the requests in flight are locked.
+'''
+import threading
+import logging
+log = logging.info
+
+# prefetch requests which may be outstanding at the same time
+MAX_IN_FLIGHT = 2
+MAX_ENTRIES = 256
+
+
+class DEFINITION_PREFETCHER:
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT, max_entries=MAX_ENTRIES):
+        self.max_in_flight = max_in_flight
+        self.max_entries = max_entries
+        self.cache = dict()  # key -> [result, used]
+        self.in_flight = dict()  # request id -> key
+        self.lock = threading.Lock()
+        self.issued = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted = 0
+
+
+    @staticmethod
+    def key(document, word_start):
+        return document.uri, document.version, word_start
+
+
+    def should_prefetch(self, key):
+        ''' True if key is neither cached nor requested and the budget allows another request '''
+        with self.lock:
+            return (key not in self.cache and
+                    len(self.in_flight) < self.max_in_flight and
+                    key not in self.in_flight.values())
+
+
+    def started(self, request_id, key):
+        with self.lock:
+            self.in_flight[request_id] = key
+            self.issued += 1
+
+
+    def is_prefetch(self, request_id):
+        with self.lock:
+            return request_id in self.in_flight
+
+
+    def completed(self, request_id, result):
+        ''' stores the result of a prefetch request, None for errors '''
+        with self.lock:
+            key = self.in_flight.pop(request_id, None)
+            if key is None:
+                return
+            if result is None or key[1] is None:
+                self.wasted += 1
+                return
+            if len(self.cache) >= self.max_entries:
+                self._evict(next(iter(self.cache)))
+            self.cache[key] = [result, False]
+
+
+    def lookup(self, key):
+        ''' returns the cached result or None, an empty list means no definition '''
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry[1] = True
+            return entry[0]
+
+
+    def _evict(self, key):
+        ''' called with the lock held '''
+        result, used = self.cache.pop(key)
+        if not used:
+            self.wasted += 1
+
+
+    def invalidate(self, uri):
+        ''' drops the cached results of uri, requests in flight are marked as outdated '''
+        with self.lock:
+            for key in [key for key in self.cache if key[0] == uri]:
+                self._evict(key)
+            for request_id, key in self.in_flight.items():
+                if key[0] == uri:
+                    self.in_flight[request_id] = (key[0], None, key[2])
+
+
+    def reset(self):
+        self.issued = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted = 0
+
+
+    def report(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups * 100 if lookups else 0
+        return (f'definition prefetch: {self.issued} requests, {self.hits} hits, {self.misses} misses '
+                f'({hit_rate:.1f}% hit rate), {self.wasted} wasted, {len(self.cache)} cached')
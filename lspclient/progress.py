@@ -0,0 +1,153 @@
+'''
+    Work done progress of the servers, shown in the status bar
+
+    Servers report progress with $/progress begin, report and end notifications,
+    during indexing thousands of them. They are aggregated per token on the
+    reader thread, the status bar gets updated at most updates_per_second
+    times. An update which comes too early is delayed until the interval has
+    passed, so the last report always gets shown. The end of the last running
+    progress is shown immediately.
+'''
+import time
+import threading
+import logging
+log = logging.info
+
+UPDATES_PER_SECOND = 4
+
+
+class PROGRESS_REPORTER:
+    def __init__(self, on_update, updates_per_second=UPDATES_PER_SECOND):
+        '''
+            Args:
+                on_update: called without arguments when the status should be shown again,
+                           called from the reader or a timer thread
+                updates_per_second: 0 means no limit
+        '''
+        self.on_update = on_update
+        self.interval = 1 / updates_per_second if updates_per_second else 0
+        self.tokens = dict()  # (server, token) -> [title, message, percentage], in order of begin
+        self.created = dict()  # token -> server, tokens created by window/workDoneProgress/create
+        self.lock = threading.Lock()
+        self.last_update = 0
+        self.timer = None
+        self.notifications = 0
+        self.updates = 0
+
+
+    def create(self, server, token):
+        with self.lock:
+            self.created[token] = server
+
+
+    def progress(self, server, params):
+        '''
+            Processes the params of a $/progress notification
+
+            Args:
+                server: language of the server which sent it
+                params: ProgressParams dict
+
+            Returns: False if it isn't a work done progress, e.g. a partial result
+            Raises: Nothing
+        '''
+        value = params.get('value')
+        kind = value.get('kind') if isinstance(value, dict) else None
+        if kind not in ('begin', 'report', 'end'):
+            return False
+        key = (server, params['token'])
+        with self.lock:
+            self.notifications += 1
+            if kind == 'begin':
+                self.tokens[key] = [value.get('title', ''), value.get('message'), value.get('percentage')]
+            elif kind == 'report':
+                entry = self.tokens.get(key)
+                if entry is None:
+                    return True
+                if 'message' in value:
+                    entry[1] = value['message']
+                if 'percentage' in value:
+                    entry[2] = value['percentage']
+            else:
+                self.tokens.pop(key, None)
+                self.created.pop(params['token'], None)
+            update = self._schedule(kind == 'end' and not self.tokens)
+        if update:
+            self.on_update()
+        return True
+
+
+    def legacy_progress(self, server, params):
+        ''' processes the params of the obsolete window/progress notification '''
+        token = params.get('id', params.get('title'))
+        if params.get('done'):
+            value = {'kind': 'end'}
+        elif (server, token) in self.tokens:
+            value = {'kind': 'report', 'message': params.get('message'), 'percentage': params.get('percentage')}
+        else:
+            value = {'kind': 'begin', 'title': params.get('title', ''), 'message': params.get('message'),
+                     'percentage': params.get('percentage')}
+        self.progress(server, {'token': token, 'value': value})
+
+
+    def _schedule(self, immediately):
+        ''' returns True if the status should be updated now, the lock is held by the caller '''
+        now = time.monotonic()
+        due = self.last_update + self.interval
+        if immediately or now >= due:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self.last_update = now
+            return True
+        if self.timer is None:
+            self.timer = threading.Timer(due - now, self._flush)
+            self.timer.daemon = True
+            self.timer.start()
+        return False
+
+
+    def _flush(self):
+        with self.lock:
+            self.timer = None
+            self.last_update = time.monotonic()
+        self.on_update()
+
+
+    def status(self):
+        '''
+            Returns the text for the status bar, None if no progress is running
+            and the previous status should be restored
+        '''
+        with self.lock:
+            self.updates += 1
+            if not self.tokens:
+                return None
+            (server, _token), (title, message, percentage) = next(iter(self.tokens.items()))
+            others = len(self.tokens) - 1
+        text = f'{server}: {title}'
+        if percentage is not None:
+            text += f' {percentage}%'
+        if message:
+            text += f' - {message}'
+        if others:
+            text += f' (+{others} more)'
+        return text
+
+
+    def cancel(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+
+    def reset(self):
+        with self.lock:
+            self.notifications = 0
+            self.updates = 0
+
+
+    def report(self):
+        return (f'progress: {self.notifications} notifications, {self.updates} status bar updates, '
+                f'{len(self.tokens)} running')
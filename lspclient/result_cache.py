@@ -0,0 +1,207 @@
+'''
+    Persistent cache of per file results
+
+    documentSymbol, foldingRange and full semanticTokens results only depend on
+    the text of a file and on the server. They are stored in an sqlite database
+    keyed by (server, method, digest of the text). A document opened with an
+    unchanged text gets its outline, folding and coloring at once, even before
+    the server has been started. The requests are sent anyway once the server
+    is ready and their results replace the cached ones.
+
+    Lookups run on the gui thread, a single indexed select. Writes are queued
+    and done in batches by a thread of their own, with a connection of its own,
+    the write ahead log lets lookups read while a batch gets committed. The size
+    of the stored results is summed up once at opening and kept up to date by
+    the writer, once it exceeds max_megabytes the least recently used results
+    get deleted.
+'''
+import json
+import time
+import queue
+import hashlib
+import threading
+import logging
+try:
+    import sqlite3
+except ImportError:  # not every python distribution ships it, the cache is disabled then
+    sqlite3 = None
+log = logging.info
+
+MAX_MEGABYTES = 64
+# the cache is trimmed to this part of the maximum size, evicting doesn't happen on every write then
+TRIM_RATIO = 0.9
+
+
+def content_digest(text):
+    ''' digest of a document text, unlike hash() it is the same in every session '''
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+
+class RESULT_CACHE:
+    def __init__(self, path, max_megabytes=MAX_MEGABYTES):
+        '''
+            Args:
+                path: the sqlite database, created if it doesn't exist
+                max_megabytes: size of the stored results which triggers the eviction
+        '''
+        self.path = path
+        self.max_bytes = int(max_megabytes * 1048576)
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evicted = 0
+        self.lookup_time = 0
+        # guards the lookup connection against close, the writer has a connection of its own
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.writer = None
+        self.connection = None
+        self.write_connection = None
+        self.total_bytes = 0
+        if sqlite3 is None:
+            log('sqlite3 not available, result cache disabled')
+            return
+        try:
+            self.write_connection = sqlite3.connect(path, check_same_thread=False)
+            self.write_connection.execute('PRAGMA journal_mode=WAL')
+            self.write_connection.execute('CREATE TABLE IF NOT EXISTS results (server TEXT, method TEXT, digest TEXT, '
+                                          'result TEXT, size INTEGER, used REAL, '
+                                          'PRIMARY KEY (server, method, digest))')
+            self.write_connection.execute('CREATE INDEX IF NOT EXISTS results_used ON results (used)')
+            self.write_connection.commit()
+            self.total_bytes = self.write_connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+        except sqlite3.Error as e:
+            log(f'result cache {path} disabled: {e}')
+            if self.write_connection is not None:
+                self.write_connection.close()
+            self.connection = self.write_connection = None
+
+
+    @property
+    def enabled(self):
+        return self.connection is not None
+
+
+    def get(self, server, method, digest):
+        '''
+            Returns the cached result or None
+            Raises: Nothing
+        '''
+        if self.connection is None:
+            return None
+        start_time = time.perf_counter()
+        try:
+            with self.lock:
+                row = self.connection.execute('SELECT result FROM results WHERE server=? AND method=? AND digest=?',
+                                              (server, method, digest)).fetchone()
+        except sqlite3.Error as e:
+            log(f'result cache lookup failed: {e}')
+            row = None
+        if row is None:
+            self.misses += 1
+            self.lookup_time += time.perf_counter() - start_time
+            return None
+        self.hits += 1
+        # the access time is updated by the writer, not on the gui thread
+        self._queue(('used', server, method, digest))
+        result = json.loads(row[0])
+        self.lookup_time += time.perf_counter() - start_time
+        return result
+
+
+    def put(self, server, method, digest, result):
+        ''' queues result for writing, it must not be changed afterwards, arrays get stored as lists '''
+        if self.connection is not None:
+            self._queue(('put', server, method, digest, result))
+
+
+    def _queue(self, entry):
+        self.queue.put(entry)
+        if self.writer is None:
+            self.writer = threading.Thread(target=self._write, daemon=True)
+            self.writer.start()
+
+
+    def _write(self):
+        while True:
+            entries = [self.queue.get()]
+            while not self.queue.empty():
+                entries.append(self.queue.get_nowait())
+            stop = None in entries
+            try:
+                self._write_batch([entry for entry in entries if entry is not None])
+            except sqlite3.Error as e:
+                log(f'result cache write failed: {e}')
+            if stop:
+                self.write_connection.close()
+                return
+
+
+    def _write_batch(self, entries):
+        ''' runs on the writer thread, the only user of write_connection '''
+        now = time.time()
+        connection = self.write_connection
+        for entry in entries:
+            if entry[0] == 'put':
+                _kind, server, method, digest, result = entry
+                text = json.dumps(result, default=list)
+                replaced = connection.execute('SELECT size FROM results WHERE server=? AND method=? AND digest=?',
+                                              (server, method, digest)).fetchone()
+                connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)',
+                                   (server, method, digest, text, len(text), now))
+                self.total_bytes += len(text) - (replaced[0] if replaced else 0)
+                self.writes += 1
+            else:
+                _kind, server, method, digest = entry
+                connection.execute('UPDATE results SET used=? WHERE server=? AND method=? AND digest=?',
+                                   (now, server, method, digest))
+        connection.commit()
+        if self.total_bytes > self.max_bytes:
+            self._evict(self.total_bytes - int(self.max_bytes * TRIM_RATIO))
+
+
+    def _evict(self, excess):
+        ''' deletes the least recently used results until excess bytes have been freed, on the writer thread '''
+        rowids = []
+        freed = 0
+        for rowid, size in self.write_connection.execute('SELECT rowid, size FROM results ORDER BY used'):
+            if freed >= excess:
+                break
+            rowids.append((rowid,))
+            freed += size
+        self.write_connection.executemany('DELETE FROM results WHERE rowid=?', rowids)
+        self.write_connection.commit()
+        self.total_bytes -= freed
+        self.evicted += len(rowids)
+
+
+    def close(self):
+        ''' writes the queued results and closes the database '''
+        if self.connection is None:
+            return
+        if self.writer is not None:
+            self.queue.put(None)
+            self.writer.join(2)
+        else:
+            self.write_connection.close()
+        with self.lock:
+            self.connection.close()
+            self.connection = None
+
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evicted = 0
+        self.lookup_time = 0
+
+
+    def report(self):
+        if self.connection is None:
+            return 'result cache: disabled'
+        lookups = self.hits + self.misses
+        per_lookup = self.lookup_time / lookups * 1000 if lookups else 0
+        return (f'result cache: {self.hits} hits, {self.misses} misses ({per_lookup:.2f}ms per lookup), '
+                f'{self.writes} written, {self.evicted} evicted')
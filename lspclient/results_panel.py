@@ -0,0 +1,282 @@
+'''
+    Results panel for references, workspace symbols and diagnostics
+
+    A modeless dialog with an owner data (virtual) list view. The list view
+    only asks for the text of the rows it displays, 50k references cost the
+    same as 50. The rows stay in a RESULTS_MODEL, sorting and filtering
+    reorder a list of row indices instead of the list view items.
+    The preview text of a reference is read from its file the first time
+    one of its rows becomes visible.
+
+    The dialog runs its own message loop in a thread of its own, activating
+    a row calls on_activate from there, the client posts the jump to the
+    notepad++ gui thread.
+'''
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+from WinDialog import Dialog, ListView, TextBox
+from WinDialog.win_helper import SetWindowText, WindowStyle as WS
+from WinDialog.controls.listview import LVS, LVS_EX, LVNI
+from WinDialog.controls.textbox import ES
+log = logging.info
+
+URI, PATH, LINE, CHARACTER, TEXT = range(5)
+COLUMNS = [('File', 300), ('Line', 50), ('Text', 400)]
+FILE_COLUMN, LINE_COLUMN, TEXT_COLUMN = range(3)
+# files whose lines are kept for previews
+PREVIEW_FILES = 64
+PREVIEW_LENGTH = 200
+
+
+class RESULTS_MODEL:
+    '''
+        Rows are (uri, path, line, character, text) tuples, text None means
+        the preview of the line is shown. view holds the indices of the rows
+        passing the filter, in sort order.
+    '''
+    def __init__(self, rows=None):
+        self.rows = rows or []
+        self.view = list(range(len(self.rows)))
+        self.filter_text = ''
+        self.sort_column = None
+        self.descending = False
+
+
+    def __len__(self):
+        return len(self.view)
+
+
+    def row(self, index):
+        ''' returns the row shown at index or None if index is no longer valid '''
+        view = self.view
+        return self.rows[view[index]] if 0 <= index < len(view) else None
+
+
+    def sort(self, column):
+        ''' sorts by column, sorting again by the same column reverses the order '''
+        self.descending = not self.descending if column == self.sort_column else False
+        self.sort_column = column
+        self._sort()
+
+
+    def _sort(self):
+        rows = self.rows
+        if self.sort_column == LINE_COLUMN:
+            def key(i): return rows[i][LINE], rows[i][PATH]
+        elif self.sort_column == TEXT_COLUMN:
+            # previews aren't read just for sorting, rows without text keep the file order
+            def key(i): return (rows[i][TEXT] or '').lower(), rows[i][PATH].lower(), rows[i][LINE]
+        elif self.sort_column == FILE_COLUMN:
+            def key(i): return rows[i][PATH].lower(), rows[i][LINE], rows[i][CHARACTER]
+        else:
+            return
+        self.view.sort(key=key, reverse=self.descending)
+
+
+    def filter(self, text):
+        ''' keeps the rows whose path or text contains text, ignoring case '''
+        self.filter_text = text.lower()
+        if not self.filter_text:
+            self.view = list(range(len(self.rows)))
+        else:
+            _filter = self.filter_text
+            self.view = [i for i, row in enumerate(self.rows)
+                         if _filter in row[PATH].lower() or _filter in (row[TEXT] or '').lower()]
+        self._sort()
+
+
+class PREVIEW_CACHE:
+    ''' lines of the most recently previewed files, read on first use '''
+    def __init__(self, max_files=PREVIEW_FILES):
+        self.max_files = max_files
+        self.files = OrderedDict()  # path -> list of lines
+        self.lock = threading.Lock()
+        self.reads = 0
+
+
+    def line(self, path, line):
+        with self.lock:
+            lines = self.files.get(path)
+            if lines is None:
+                lines = self._read(path)
+                self.files[path] = lines
+                if len(self.files) > self.max_files:
+                    self.files.popitem(last=False)
+            else:
+                self.files.move_to_end(path)
+        return lines[line].strip()[:PREVIEW_LENGTH] if 0 <= line < len(lines) else ''
+
+
+    def _read(self, path):
+        self.reads += 1
+        try:
+            with open(path, encoding='utf-8', errors='replace') as f:
+                return f.read().splitlines()
+        except OSError as e:
+            log(f'no preview for {path}: {e}')
+            return []
+
+
+    def invalidate(self, path):
+        with self.lock:
+            self.files.pop(path, None)
+
+
+class RESULTS_DIALOG(Dialog):
+    def __init__(self, panel, title):
+        super().__init__(title=title, size=(450, 250), center=True, modeless=True)
+        self.panel = panel
+        self.filter = TextBox('', (440, 12), (5, 4),
+                              style=WS.CHILD | WS.VISIBLE | WS.BORDER | WS.TABSTOP | ES.LEFT | ES.AUTOHSCROLL)
+        self.listview = ListView('', (440, 226), (5, 20),
+                                 style=ListView.style | LVS.OWNERDATA | LVS.SINGLESEL | LVS.SHOWSELALWAYS |
+                                 WS.BORDER | WS.TABSTOP)
+        self.filter.onChange = self.panel._on_filter_changed
+        self.listview.onGetDispInfo = self.panel._on_get_disp_info
+        self.listview.onOdCacheHint = self.panel._on_cache_hint
+        self.listview.onColumnClick = self.panel._on_column_click
+        self.listview.onDblClk = self.panel._on_double_click
+        self.onIdOk = self.panel._on_return
+
+
+    def initialize(self):
+        self.listview.SetExtendedListViewStyle(LVS_EX.FULLROWSELECT | LVS_EX.GRIDLINES)
+        for index, (name, width) in enumerate(COLUMNS):
+            self.listview.insertColumn(index, name)
+            self.listview.setColumnWidth(index, width)
+        self.listview.setItemCount(len(self.panel.model))
+
+
+class RESULTS_PANEL:
+    def __init__(self, on_activate):
+        '''
+            Args:
+                on_activate: called with the row the user double clicked or pressed return on,
+                             called from the thread of the dialog
+        '''
+        self.on_activate = on_activate
+        self.model = RESULTS_MODEL()
+        self.kind = None
+        self.preview = PREVIEW_CACHE()
+        self.dialog = None
+        self.thread = None
+        self.disp_info_calls = 0
+        self.disp_info_time = 0
+
+
+    def show(self, title, rows, kind=None):
+        '''
+            Shows rows in the panel, opens it if needed
+
+            Args:
+                title: caption of the panel
+                rows: list of (uri, path, line, character, text) tuples
+                kind: identifies the content, see showing
+
+            Returns: None
+            Raises: Nothing
+        '''
+        model = RESULTS_MODEL(rows)
+        model.sort_column = self.model.sort_column
+        model.descending = self.model.descending
+        model.filter(self.model.filter_text)
+        self.model = model
+        self.kind = kind
+        dialog = self.dialog
+        if dialog is not None and dialog.hwnd:
+            SetWindowText(dialog.hwnd, title)
+            self._refresh(dialog.listview)
+        elif self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, args=(title,), daemon=True)
+            self.thread.start()
+
+
+    def showing(self, kind):
+        ''' True if the open panel shows results of kind '''
+        return self.kind == kind and self.dialog is not None and bool(self.dialog.hwnd)
+
+
+    def close(self):
+        if self.dialog is not None:
+            self.dialog.terminate()
+
+
+    def _run(self, title):
+        self.dialog = RESULTS_DIALOG(self, title)
+        try:
+            self.dialog.show()
+        except Exception as e:  # pylint: disable=W0703
+            log(f'results panel failed: {e}')
+        finally:
+            self.dialog = None
+
+
+    def _refresh(self, listview):
+        listview.setItemCount(len(self.model))
+        listview.redrawItems(listview.getTopIndex(), listview.getTopIndex() + listview.getCountPerPage())
+
+
+    def cell(self, index, column):
+        ''' returns the text the list view shows for row index and column '''
+        row = self.model.row(index)
+        if row is None:
+            return ''
+        if column == FILE_COLUMN:
+            return row[PATH]
+        if column == LINE_COLUMN:
+            return str(row[LINE] + 1)
+        return row[TEXT] if row[TEXT] is not None else self.preview.line(row[PATH], row[LINE])
+
+
+    def reset(self):
+        self.disp_info_calls = 0
+        self.disp_info_time = 0
+        self.preview.reads = 0
+
+
+    def report(self):
+        per_call = self.disp_info_time / self.disp_info_calls * 1000000 if self.disp_info_calls else 0
+        return (f'results panel: {len(self.model)} rows, {self.disp_info_calls} cells requested '
+                f'({per_call:.1f}us per cell), {self.preview.reads} files read for previews')
+
+
+    def _on_get_disp_info(self, dispinfo):
+        start_time = time.perf_counter()
+        ListView.setDispInfoText(dispinfo, self.cell(dispinfo.item.iItem, dispinfo.item.iSubItem))
+        self.disp_info_calls += 1
+        self.disp_info_time += time.perf_counter() - start_time
+
+
+    def _on_cache_hint(self, cache_hint):
+        # reads the files of the rows about to be shown in one go
+        for index in range(cache_hint.iFrom, cache_hint.iTo + 1):
+            row = self.model.row(index)
+            if row is not None and row[TEXT] is None:
+                self.preview.line(row[PATH], row[LINE])
+
+
+    def _on_column_click(self, nmlistview):
+        self.model.sort(nmlistview.iSubItem)
+        self._refresh(self.dialog.listview)
+
+
+    def _on_filter_changed(self):
+        self.model.filter(self.dialog.filter.getText())
+        self._refresh(self.dialog.listview)
+
+
+    def _activate(self, index):
+        row = self.model.row(index)
+        if row is not None:
+            self.on_activate(row)
+
+
+    def _on_double_click(self, item_activate):
+        self._activate(item_activate.iItem)
+
+
+    def _on_return(self):
+        self._activate(self.dialog.listview.getNextItem(-1, LVNI.SELECTED))
@@ -0,0 +1,254 @@
+'''
+    Decodes, stores and paints lsp semantic tokens
+
+    The tokens of a document are kept in compact arrays and painted with a single
+    indicator which uses the INDICFLAG.VALUEFORE flag, the color of a token is the
+    value of the indicator. Only the visible lines get painted.
+'''
+import time
+import bisect
+import logging
+from array import array
+from Npp import editor1, editor2, INDICATORSTYLE, INDICFLAG, INDICVALUE
+log = logging.info
+
+SEMANTIC_INDICATOR = 9
+
+# token type -> (r, g, b), token types not listed here are not painted
+TOKEN_COLORS = {
+    'namespace': (0, 128, 128),
+    'type': (38, 127, 153),
+    'class': (38, 127, 153),
+    'enum': (38, 127, 153),
+    'interface': (38, 127, 153),
+    'struct': (38, 127, 153),
+    'typeParameter': (38, 127, 153),
+    'parameter': (128, 64, 0),
+    'property': (0, 16, 128),
+    'enumMember': (0, 112, 193),
+    'function': (121, 94, 38),
+    'method': (121, 94, 38),
+    'macro': (175, 0, 219),
+    'decorator': (175, 0, 219),
+}
+
+
+def rgb(r, g, b):
+    return (b << 16) + (g << 8) + r
+
+
+def setup_indicator():
+    for _editor in (editor1, editor2):
+        _editor.indicSetStyle(SEMANTIC_INDICATOR, INDICATORSTYLE.TEXTFORE)
+        _editor.indicSetFlags(SEMANTIC_INDICATOR, INDICFLAG.VALUEFORE)
+
+
+def legend_colors(legend):
+    '''
+        Translates the token types of the legend sent by the server into
+        a list of indicator values, the token type index is the list index
+    '''
+    return [rgb(*TOKEN_COLORS[token_type]) | INDICVALUE.BIT if token_type in TOKEN_COLORS else None
+            for token_type in legend.get('tokenTypes', [])]
+
+
+class DECODED_TOKENS:
+    '''
+        Semantic tokens with absolute positions, one array per token property
+    '''
+    def __init__(self, data):
+        self.lines = array('L')
+        self.starts = array('L')
+        self.lengths = array('L')
+        self.types = array('L')
+        line = 0
+        start = 0
+        for i in range(0, len(data) - 4, 5):
+            if data[i]:
+                line += data[i]
+                start = data[i + 1]
+            else:
+                start += data[i + 1]
+            self.lines.append(line)
+            self.starts.append(start)
+            self.lengths.append(data[i + 2])
+            self.types.append(data[i + 3])
+
+
+    def __len__(self):
+        return len(self.lines)
+
+
+    def index_range(self, first_line, last_line):
+        ''' returns the first and the last+1 token index of the given lines '''
+        return (bisect.bisect_left(self.lines, first_line),
+                bisect.bisect_right(self.lines, last_line))
+
+
+class SEMANTIC_TOKENS:
+    '''
+        Semantic tokens of one document.
+
+        The raw data of the last full response is kept, together with its resultId,
+        to be able to apply the edits of a full/delta response.
+        Range responses are kept separately and are only used as long as
+        no full response for the same version is available.
+        At most one full or delta request is in flight, a delta response whose
+        base isn't the current resultId anymore would corrupt the data.
+    '''
+    def __init__(self):
+        self.result_id = None
+        self.data = array('L')
+        self.full = None
+        self.full_version = -1
+        self.range = None
+        self.range_version = -1
+        self.range_lines = (0, -1)
+        self.painted_version = -1
+        self.painted_lines = (0, -1)
+        # the full tokens came from the result cache, the server is asked anyway
+        self.cached = False
+        # version and base resultId of the full or delta request in flight
+        self.pending_version = None
+        self.pending_result_id = None
+
+
+    @property
+    def pending(self):
+        return self.pending_version is not None
+
+
+    def request_sent(self, version):
+        ''' a full or, if result_id is set, delta request has been sent for version '''
+        self.pending_version = version
+        self.pending_result_id = self.result_id
+
+
+    def request_ended(self):
+        ''' the request failed or its server stopped, another one may be sent '''
+        self.pending_version = None
+        self.pending_result_id = None
+
+
+    def apply_response(self, result, version, base_result_id):
+        '''
+            Applies a full or full/delta response
+
+            Args:
+                result: SemanticTokens or SemanticTokensDelta
+                version: document version the request has been sent for
+                base_result_id: the previousResultId of the delta request, None for a full request
+
+            Returns: False if the response has been dropped, it is older than the
+                     applied tokens or a delta based on data which has changed meanwhile
+            Raises: Nothing
+        '''
+        if version == self.pending_version and base_result_id == self.pending_result_id:
+            self.request_ended()
+        if version < self.full_version:
+            log(f'semantic tokens of version {version} dropped, version {self.full_version} is applied')
+            return False
+        if 'data' not in result and base_result_id != self.result_id:
+            log(f'semantic tokens delta based on {base_result_id} dropped, the current result is {self.result_id}')
+            return False
+        self.apply_delta(result, version)
+        return True
+
+
+    def set_full(self, result, version, cached=False):
+        self.data = array('L', result.get('data', []))
+        self.result_id = result.get('resultId')
+        self.full = DECODED_TOKENS(self.data)
+        self.full_version = version
+        self.cached = cached
+
+
+    def apply_delta(self, result, version):
+        if 'data' in result:
+            self.set_full(result, version)
+            return
+        for edit in sorted(result.get('edits', []), key=lambda x: x['start'], reverse=True):
+            self.data[edit['start']:edit['start'] + edit['deleteCount']] = array('L', edit.get('data', []))
+        self.result_id = result.get('resultId')
+        self.full = DECODED_TOKENS(self.data)
+        self.full_version = version
+        self.cached = False
+
+
+    def set_range(self, result, version, first_line, last_line):
+        self.range = DECODED_TOKENS(result.get('data', []))
+        self.range_version = version
+        self.range_lines = (first_line, last_line)
+
+
+    def tokens_for(self, version, first_line, last_line):
+        ''' returns the decoded tokens which are valid for version and the given lines, or None '''
+        if self.full is not None and self.full_version == version:
+            return self.full
+        if (self.range is not None and self.range_version == version and
+                self.range_lines[0] <= first_line and last_line <= self.range_lines[1]):
+            return self.range
+        return None
+
+
+    def invalidate_paint(self):
+        self.painted_version = -1
+        self.painted_lines = (0, -1)
+
+
+    def paint(self, _editor, version, first_line, last_line, colors, codec):
+        '''
+            Paints the tokens of the visible lines. If the lines which have
+            already been painted for this version overlap with the visible lines,
+            only the newly exposed lines get painted.
+            Token starts and lengths are converted to byte offsets by codec.
+
+            Returns: True if the lines have been painted, False if no tokens are available
+            Raises: Nothing
+        '''
+        tokens = self.tokens_for(version, first_line, last_line)
+        if tokens is None:
+            return False
+
+        painted_first, painted_last = self.painted_lines
+        if self.painted_version == version and painted_first <= last_line and first_line <= painted_last:
+            if first_line < painted_first:
+                self._paint_lines(_editor, tokens, first_line, painted_first - 1, colors, codec)
+            if last_line > painted_last:
+                self._paint_lines(_editor, tokens, painted_last + 1, last_line, colors, codec)
+            self.painted_lines = (min(first_line, painted_first), max(last_line, painted_last))
+        else:
+            self._paint_lines(_editor, tokens, first_line, last_line, colors, codec)
+            self.painted_version = version
+            self.painted_lines = (first_line, last_line)
+        return True
+
+
+    @staticmethod
+    def _paint_lines(_editor, tokens, first_line, last_line, colors, codec):
+        start_time = time.perf_counter()
+        start_position = _editor.positionFromLine(first_line)
+        _editor.setIndicatorCurrent(SEMANTIC_INDICATOR)
+        _editor.indicatorClearRange(start_position, _editor.getLineEndPosition(last_line) - start_position)
+
+        first_index, last_index = tokens.index_range(first_line, last_line)
+        number_of_colors = len(colors)
+        current_line = -1
+        line_position = 0
+        current_color = None
+        for i in range(first_index, last_index):
+            token_type = tokens.types[i]
+            color = colors[token_type] if token_type < number_of_colors else None
+            if color is None:
+                continue
+            if tokens.lines[i] != current_line:
+                current_line = tokens.lines[i]
+                line_position = _editor.positionFromLine(current_line)
+            if color != current_color:
+                current_color = color
+                _editor.setIndicatorValue(color)
+            start = codec.byte_offset(_editor, current_line, tokens.starts[i])
+            end = codec.byte_offset(_editor, current_line, tokens.starts[i] + tokens.lengths[i])
+            _editor.indicatorFillRange(line_position + start, end - start)
+        log(f'painted lines {first_line}-{last_line} ({last_index - first_index} tokens) '
+            f'in {(time.perf_counter() - start_time) * 1000:.2f}ms')
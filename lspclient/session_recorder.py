@@ -0,0 +1,100 @@
+'''
+    Records lsp sessions, to replay them outside of notepad++
+
+    Captures the messages exchanged with the servers and the editor
+    notifications the client reacts to, with the seconds since the recording
+    started. The file is gzip compressed json, one event per line:
+        [seconds, "send", server, message]        sent to server
+        [seconds, "receive", server, message]     received from server
+        [seconds, "editor", notification, args]   notepad++ or scintilla notification
+        [seconds, "ui", function, args]           a call which changed what the user sees
+    The first line holds the server configs and the client options.
+    A buffer activation also records the path, language and text of the
+    buffer, every notification the caret position and first visible line,
+    the replay needs nothing else to rebuild the editor state.
+    The calls showing something are recorded by the client, calltips, lists,
+    annotations and the status bar with their text, fold levels as checksum
+    and painted indicators as the painted line range, the replay compares them.
+
+    Enabled with the "record_session" option, the path of the file,
+    see __tests__/replay_session.py for replaying it.
+'''
+import gzip
+import json
+import time
+import threading
+import logging
+from Npp import editor, notepad
+log = logging.info
+
+FORMAT_VERSION = 1
+HEADER_SEPARATOR = '\r\n\r\n'
+
+
+def read_recording(path):
+    '''
+        Reads a recorded session
+
+        Returns: (header dict, list of events)
+        Raises: OSError, ValueError if path isn't a recording
+    '''
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get('format') != FORMAT_VERSION:
+            raise ValueError(f'{path} is not a session recording of format {FORMAT_VERSION}')
+        return header, [json.loads(line) for line in f]
+
+
+class SESSION_RECORDER:
+    def __init__(self, path, server_configs, options):
+        self.path = path
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.events = 0
+        self.file = gzip.open(path, 'wt', encoding='utf-8', compresslevel=6)
+        self._write({'format': FORMAT_VERSION, 'started': time.time(),
+                     'servers': server_configs, 'options': options})
+        log(f'recording session to {path}')
+
+
+    def _write(self, entry):
+        line = json.dumps(entry, separators=(',', ':'), default=str)
+        with self.lock:
+            if self.file is not None:
+                self.file.write(line)
+                self.file.write('\n')
+                self.events += 1
+
+
+    def message_sent(self, server, lspmessage):
+        ''' lspmessage is the framed message as created by lsp_msg '''
+        body = lspmessage[lspmessage.find(HEADER_SEPARATOR) + len(HEADER_SEPARATOR):]
+        self._write([time.perf_counter() - self.start, 'send', server, json.loads(body)])
+
+
+    def message_received(self, server, decoded_message):
+        self._write([time.perf_counter() - self.start, 'receive', server, decoded_message])
+
+
+    def editor_event(self, notification, args):
+        ''' called on the gui thread before the client handles the notification '''
+        args = dict(args, caret=editor.getCurrentPos(), first_line=editor.getFirstVisibleLine())
+        if notification == 'bufferactivated':
+            args.update(path=notepad.getBufferFilename(args['bufferID']),
+                        lang_type=int(notepad.getLangType()),
+                        language=notepad.getLanguageName(notepad.getLangType()),
+                        text=editor.getText())
+        self._write([time.perf_counter() - self.start, 'editor', notification, args])
+
+
+    def ui_event(self, function, args):
+        ''' called on the gui thread after function changed what the user sees '''
+        self._write([time.perf_counter() - self.start, 'ui', function, list(args)])
+
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+        log(f'{self.events} events recorded to {self.path}')
@@ -0,0 +1,129 @@
+'''
+    Shuts all language servers down in parallel, within a deadline
+
+    The protocol wants a shutdown request, its response and then the exit
+    notification. Every server gets its own thread doing that sequence,
+    a server which doesn't answer before the deadline gets the exit
+    notification anyway. Afterwards the reader thread is joined and a process
+    still running is terminated and finally killed. The whole shutdown takes
+    at most timeout + 2 * KILL_WAIT seconds, regardless of the number of servers.
+    A single server can be stopped in the background the same way.
+'''
+import time
+import threading
+import logging
+log = logging.info
+
+SHUTDOWN_TIMEOUT = 2.0
+# seconds to wait for the process after terminate and after kill
+KILL_WAIT = 0.5
+
+
+class SHUTDOWN_COORDINATOR:
+    def __init__(self, timeout=SHUTDOWN_TIMEOUT):
+        self.timeout = timeout
+        self.pending = dict()  # shutdown request id -> threading.Event
+        self.results = dict()  # language -> (seconds, how it ended)
+
+
+    def response_received(self, request_id):
+        ''' True if request_id is a shutdown request, the response is consumed then '''
+        event = self.pending.pop(request_id, None)
+        if event is None:
+            return False
+        event.set()
+        return True
+
+
+    def run(self, com_manager, lsp_msg):
+        '''
+            Shuts down all running servers of com_manager
+
+            Args:
+                com_manager: COMMUNICATION_MANAGER
+                lsp_msg: MESSAGES used to create the shutdown requests
+
+            Returns: report, str
+            Raises: Nothing
+        '''
+        start_time = time.perf_counter()
+        deadline = start_time + self.timeout
+        threads = []
+        for language, (monitor, com_obj) in list(com_manager.running_servers.items()):
+            # messages are created here, MESSAGES isn't thread safe
+            shutdown_request = lsp_msg.shutdown()
+            event = self.pending[lsp_msg.request_id] = threading.Event()
+            thread = threading.Thread(target=self._shutdown_server,
+                                      args=(language, monitor, com_obj, com_manager.server_processes.get(language),
+                                            shutdown_request, lsp_msg.exit(), event, deadline),
+                                      daemon=True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join(max(0, deadline + 2 * KILL_WAIT + 0.1 - time.perf_counter()))
+        com_manager.running_servers.clear()
+        com_manager.server_processes.clear()
+        com_manager.com_obj = None
+        self.pending.clear()
+        return self.report(time.perf_counter() - start_time)
+
+
+    def stop(self, server, com_manager, lsp_msg):
+        '''
+            Shuts a single server down in the background, e.g. a workspace server instance no longer needed
+
+            Returns: None
+            Raises: Nothing
+        '''
+        monitor, com_obj, process = com_manager.forget(server)
+        shutdown_request = lsp_msg.shutdown()
+        event = self.pending[lsp_msg.request_id] = threading.Event()
+        threading.Thread(target=self._shutdown_server,
+                         args=(server, monitor, com_obj, process, shutdown_request, lsp_msg.exit(), event,
+                               time.perf_counter() + self.timeout),
+                         daemon=True).start()
+
+
+    def _shutdown_server(self, language, monitor, com_obj, process, shutdown_request, exit_notification, event,
+                         deadline):
+        start_time = time.perf_counter()
+        outcome = 'exited'
+        try:
+            com_obj.send_to(shutdown_request)
+            if not event.wait(max(0, deadline - time.perf_counter())):
+                outcome = 'no shutdown response, exited'
+            com_obj.send_to(exit_notification)
+        except Exception as e:  # pylint: disable=W0703
+            log(f'{language}: {e}')
+            outcome = 'not reachable'
+
+        monitor.keep_reading = False
+        if process is not None:
+            try:
+                process.wait(max(0, deadline - time.perf_counter()))
+            except Exception:  # pylint: disable=W0703
+                outcome = 'terminated'
+                process.terminate()
+                try:
+                    process.wait(KILL_WAIT)
+                except Exception:  # pylint: disable=W0703
+                    outcome = 'killed'
+                    process.kill()
+                    try:
+                        process.wait(KILL_WAIT)
+                    except Exception:  # pylint: disable=W0703
+                        outcome = 'still running after kill'
+        # with the process gone the reader sees the end of its output
+        monitor.join(max(0, deadline - time.perf_counter()) or 0.1)
+        if monitor.is_alive():
+            outcome += ', reader thread still running'
+        self.results[language] = (time.perf_counter() - start_time, outcome)
+        log(f'{language} shut down: {outcome}')
+
+
+    def report(self, total_seconds):
+        lines = [f'shutdown of {len(self.results)} servers took {total_seconds * 1000:.0f}ms '
+                 f'(deadline {self.timeout * 1000:.0f}ms)']
+        for language, (seconds, outcome) in sorted(self.results.items()):
+            lines.append(f'    {language}: {outcome} after {seconds * 1000:.0f}ms')
+        return '\n'.join(lines)
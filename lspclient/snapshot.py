@@ -0,0 +1,52 @@
+'''
+    Text snapshots of the documents
+
+    editor.getText() crosses the python/scintilla boundary and copies the whole
+    document. The text is therefore fetched at most once between two modifications
+    and shared by everything that needs it, didOpen, didChange, the change detection
+    and the formatting diff. python strings are immutable, sharing them costs nothing.
+    The MODIFIED notification drops the snapshot of the document.
+'''
+
+
+class TEXT_SNAPSHOTS:
+    def __init__(self):
+        self.fetches = 0
+        self.fetched_chars = 0
+        self.served = 0
+
+
+    def text(self, _editor, document):
+        '''
+            Returns the text of document, fetches it from _editor only
+            if the document has been modified since the last call
+
+            Args:
+                _editor: the editor object showing document
+                document: DOCUMENT_STATE
+
+            Returns: str
+            Raises: Nothing
+        '''
+        self.served += 1
+        if document.text is None:
+            document.text = _editor.getText()
+            self.fetches += 1
+            self.fetched_chars += len(document.text)
+        return document.text
+
+
+    @staticmethod
+    def invalidate(document):
+        document.text = None
+
+
+    def reset(self):
+        self.fetches = 0
+        self.fetched_chars = 0
+        self.served = 0
+
+
+    def report(self):
+        return (f'text snapshots: {self.served} served, {self.fetches} fetched via getText, '
+                f'{self.fetched_chars} characters copied')
@@ -0,0 +1,205 @@
+'''
+    Suspends documents which haven't been activated for a while
+
+    Every opened document costs server memory, clangd for example keeps an AST
+    for each of them. Documents not activated for idle_minutes, and the least
+    recently activated ones beyond max_open per server instance, get a didClose.
+    The next activation sends didOpen with the current text again, which the
+    client does for every document not open on the server anyway.
+    Besides on activations and typing pauses the documents are checked every
+    CHECK_SECONDS, a timer posts the check to the gui thread, so documents get
+    suspended while notepad++ is just left open too.
+
+    The working set of the server processes is sampled before each round of
+    suspensions to show what they gave back.
+'''
+import time
+import ctypes
+import threading
+import logging
+log = logging.info
+
+IDLE_MINUTES = 30
+MAX_OPEN = 50
+CHECK_SECONDS = 60
+
+
+class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+    _fields_ = [('cb', ctypes.c_ulong),
+                ('PageFaultCount', ctypes.c_ulong),
+                ('PeakWorkingSetSize', ctypes.c_size_t),
+                ('WorkingSetSize', ctypes.c_size_t),
+                ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                ('PagefileUsage', ctypes.c_size_t),
+                ('PeakPagefileUsage', ctypes.c_size_t)]
+
+
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+PROCESS_VM_READ = 0x0010
+
+
+def process_memory(pid):
+    '''
+        Returns the working set of process pid in bytes,
+        None if it isn't available, e.g. for a server which isn't a child process
+    '''
+    if pid is None or not hasattr(ctypes, 'windll'):
+        return None
+    kernel32 = ctypes.windll.kernel32
+    kernel32.OpenProcess.restype = ctypes.c_void_p
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION | PROCESS_VM_READ, False, pid)
+    if not handle:
+        return None
+    try:
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.c_void_p(handle), ctypes.byref(counters), counters.cb):
+            return None
+        return counters.WorkingSetSize
+    finally:
+        kernel32.CloseHandle(ctypes.c_void_p(handle))
+
+
+class DOCUMENT_SUSPENSION:
+    def __init__(self, idle_minutes=IDLE_MINUTES, max_open=MAX_OPEN):
+        '''
+            Args:
+                idle_minutes: documents not activated for that long get suspended, 0 disables it
+                max_open: open documents per server, 0 means no limit
+        '''
+        self.idle_seconds = idle_minutes * 60
+        self.max_open = max_open
+        self.suspended = 0
+        self.resumed = 0
+        self.memory_before = dict()  # server instance -> working set before the last suspension
+        self.lock = threading.Lock()
+        self.timer = None
+        self.check = None
+        self.post = None
+
+
+    def start(self, check, post, interval=CHECK_SECONDS):
+        '''
+            Calls check every interval seconds on the gui thread, nothing if suspension is disabled
+
+            Args:
+                check: selects and closes the documents to suspend
+                post: queues a function for the gui thread, e.g. UI_DISPATCHER.post
+        '''
+        if not self.idle_seconds and not self.max_open:
+            return
+        with self.lock:
+            self.check = check
+            self.post = post
+            self.interval = interval
+            self._start_timer()
+
+
+    def _start_timer(self):
+        ''' the lock is held by the caller '''
+        self.timer = threading.Timer(self.interval, self._on_timer)
+        self.timer.daemon = True
+        self.timer.start()
+
+
+    def _on_timer(self):
+        with self.lock:
+            if self.timer is None:
+                return
+            # keyed, a check still queued isn't queued twice
+            self.post(self.check, self)
+            self._start_timer()
+
+
+    def stop(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+
+    @staticmethod
+    def activated(document):
+        document.last_activated = time.monotonic()
+
+
+    def record_suspended(self, document):
+        self.suspended += 1
+        log(f'{document.path} suspended')
+
+
+    def record_resumed(self, document):
+        self.resumed += 1
+        log(f'{document.path} resumed')
+
+
+    def candidates(self, documents, current=None, servers_of=None):
+        '''
+            Returns the documents which should be closed on the server
+
+            Args:
+                documents: iterable of DOCUMENT_STATE
+                current: the active document, never suspended
+                servers_of: returns the server instances a document is open on,
+                            by default a server per language is assumed
+
+            Returns: list of DOCUMENT_STATE, least recently activated first
+            Raises: Nothing
+        '''
+        if servers_of is None:
+            def servers_of(document): return (document.language_id,)
+        now = time.monotonic()
+        open_documents = sorted((document for document in documents
+                                 if document.is_open and document is not current),
+                                key=lambda document: document.last_activated)
+        excess = dict()  # server instance -> open documents beyond max_open
+        servers = dict()  # document -> its server instances
+        if self.max_open:
+            counted = open_documents + [current] if current is not None and current.is_open else open_documents
+            for document in counted:
+                servers[document] = _servers = servers_of(document)
+                for server in _servers:
+                    excess[server] = excess.get(server, -self.max_open) + 1
+
+        suspend = []
+        for document in open_documents:
+            _servers = servers.get(document, ())
+            if any(excess[server] > 0 for server in _servers):
+                # closed on all its servers, which frees a slot on each of them
+                for server in _servers:
+                    excess[server] -= 1
+                suspend.append(document)
+            elif self.idle_seconds and now - document.last_activated > self.idle_seconds:
+                suspend.append(document)
+        return suspend
+
+
+    def record_memory(self, server, memory):
+        ''' records the working set of the server instance before its documents get closed '''
+        if memory is not None:
+            self.memory_before[server] = memory
+
+
+    def reset(self):
+        self.suspended = 0
+        self.resumed = 0
+        self.memory_before = dict()
+
+
+    def report(self, current_memory=None):
+        '''
+            Args:
+                current_memory: dict server instance -> its current working set in bytes
+        '''
+        lines = [f'document suspension: {self.suspended} suspended, {self.resumed} resumed']
+        for server, memory in (current_memory or dict()).items():
+            if memory is None:
+                lines.append(f'    {server}: server memory not available')
+                continue
+            before = self.memory_before.get(server)
+            before_text = f', {before / 1048576:.1f}MB before the last suspension' if before else ''
+            lines.append(f'    {server}: server working set {memory / 1048576:.1f}MB{before_text}')
+        return '\n'.join(lines)
@@ -0,0 +1,137 @@
+'''
+    Index of the document symbols of all open documents
+
+    Symbols are stored as (name, kind, container, uri, line, character) tuples.
+    For lookups a sorted list of the lowercased names is used for prefix matches.
+    For fuzzy matches every character has a bitmask (a python int) of the symbols
+    whose name contains it, and-ing the masks of the query characters leaves only
+    the candidates which then get checked for the correct character order.
+    Everything is rebuilt lazily, on the first lookup after a document has been updated.
+'''
+import re
+import bisect
+import logging
+from array import array
+from itertools import compress, tee
+log = logging.info
+
+NAME, KIND, CONTAINER, URI, LINE, CHARACTER = range(6)
+ONE_BIT = re.compile('1')
+
+
+def flatten_symbols(uri, result):
+    '''
+        Converts either a DocumentSymbol tree or a SymbolInformation list
+        into a flat list of symbol tuples
+    '''
+    symbols = []
+    pending = [(item, None) for item in reversed(result or [])]
+    while pending:
+        item, container = pending.pop()
+        if 'location' in item:  # SymbolInformation or WorkspaceSymbol
+            _start = item['location'].get('range', {}).get('start', {'line': 0, 'character': 0})
+            symbols.append((item['name'], item['kind'], item.get('containerName') or container,
+                            item['location'].get('uri', uri), _start['line'], _start['character']))
+        else:  # DocumentSymbol
+            _start = item.get('selectionRange', item['range'])['start']
+            symbols.append((item['name'], item['kind'], container, uri, _start['line'], _start['character']))
+            pending.extend((child, item['name']) for child in reversed(item.get('children', [])))
+    return symbols
+
+
+class SYMBOL_INDEX:
+    def __init__(self):
+        self.documents = dict()
+        self._dirty = True
+        self._symbols = []
+        self._sorted_names = []
+        self._sorted_ids = array('L')
+        self._names = []
+        self._char_masks = dict()
+
+
+    def update(self, uri, version, result):
+        self.documents[uri] = (version, flatten_symbols(uri, result))
+        self._dirty = True
+
+
+    def remove(self, uri):
+        if self.documents.pop(uri, None) is not None:
+            self._dirty = True
+
+
+    def is_current(self, uri, version):
+        return uri in self.documents and self.documents[uri][0] == version
+
+
+    def symbols_of(self, uri):
+        return self.documents[uri][1] if uri in self.documents else []
+
+
+    def __len__(self):
+        return sum(len(symbols) for _, symbols in self.documents.values())
+
+
+    def _rebuild(self):
+        self._symbols = [symbol for _, symbols in self.documents.values() for symbol in symbols]
+        self._names = [symbol[NAME].lower() for symbol in self._symbols]
+        order = sorted(range(len(self._names)), key=self._names.__getitem__)
+        self._sorted_names = [self._names[i] for i in order]
+        self._sorted_ids = array('L', order)
+
+        char_bits = dict()
+        mask_length = len(self._names) // 8 + 1
+        for symbol_id, name in enumerate(self._names):
+            byte_index = symbol_id >> 3
+            bit = 1 << (symbol_id & 7)
+            for c in set(name):
+                if c not in char_bits:
+                    char_bits[c] = bytearray(mask_length)
+                char_bits[c][byte_index] |= bit
+        self._char_masks = {c: int.from_bytes(bits, 'little') for c, bits in char_bits.items()}
+        self._dirty = False
+
+
+    def find(self, query, limit=50):
+        '''
+            Returns up to limit symbols matching query.
+            Prefix matches come first, followed by symbols which contain
+            the characters of query in the same order, e.g. gtd -> goto_definition
+
+            Args:
+                query: the string to look for, case insensitive
+                limit: maximum number of returned symbols
+
+            Returns: list of symbol tuples
+            Raises: Nothing
+        '''
+        if self._dirty:
+            self._rebuild()
+        query = query.lower()
+        if not query:
+            return []
+
+        found = []
+        seen = set()
+        i = bisect.bisect_left(self._sorted_names, query)
+        while i < len(self._sorted_names) and len(found) < limit and self._sorted_names[i].startswith(query):
+            seen.add(self._sorted_ids[i])
+            found.append(self._symbols[self._sorted_ids[i]])
+            i += 1
+
+        if len(found) < limit:
+            mask = -1
+            for c in set(query):
+                mask &= self._char_masks.get(c, 0)
+            if mask <= 0:
+                return found
+            # [^x]*x[^y]*y - anchored, the first occurrences decide, no retries at later positions
+            pattern = re.compile(''.join(f'[^{re.escape(c)}]*{re.escape(c)}' for c in query))
+            # the candidates in symbol id order, lazily, the loops run in C until limit is reached
+            candidates, checked = tee(map(re.Match.start, ONE_BIT.finditer(bin(mask)[:1:-1])))
+            for symbol_id in compress(candidates, map(pattern.match, map(self._names.__getitem__, checked))):
+                if symbol_id not in seen:
+                    found.append(self._symbols[symbol_id])
+                    if len(found) >= limit:
+                        break
+        return found
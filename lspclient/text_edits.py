@@ -0,0 +1,191 @@
+'''
+    Applies lsp TextEdits to the scintilla document
+
+    Servers like pyls with black or yapf return a single TextEdit which
+    replaces the whole document. Instead of replacing the document,
+    the edits are applied to a copy of the text, the result is diffed
+    line by line against the current content and only the changed hunks
+    are replaced within the editor.
+'''
+import re
+import bisect
+import difflib
+import logging
+from .position_codec import UTF16, index_from_units
+log = logging.info
+
+# hunks where neither side is longer than this are replaced as they are,
+# without searching for further matching lines
+SMALL_HUNK_LINES = 3
+
+_LINE_SPLIT = re.compile('(?<=\n)|(?<=\r)(?!\n)')
+
+
+def split_lines(text):
+    '''
+        Splits text the way scintilla does, only at \\r\\n, \\r and \\n,
+        and keeps the line endings. A trailing newline results in an
+        additional empty line, which matches editor.getLineCount()
+    '''
+    return _LINE_SPLIT.split(text)
+
+
+def apply_text_edits(text, edits, encoding=UTF16):
+    '''
+        Applies a list of lsp TextEdits to text and returns the new text
+
+        Args:
+            text: the current document content
+            edits: list of TextEdit dicts as sent by the server, any order
+            encoding: the negotiated position encoding of the server
+
+        Returns: the new document content
+        Raises: Nothing
+    '''
+    lines = split_lines(text)
+    line_starts = [0]
+    for line in lines:
+        line_starts.append(line_starts[-1] + len(line))
+
+    def _offset(position):
+        _line = position['line']
+        if _line >= len(lines):
+            return len(text)
+        return line_starts[_line] + index_from_units(lines[_line].rstrip('\r\n'), position['character'], encoding)
+
+    # sorted is stable, so inserts at the same position keep the server order
+    _edits = sorted(((_offset(item['range']['start']), _offset(item['range']['end']), item['newText'])
+                     for item in edits), key=lambda x: x[0])
+    parts = []
+    last_end = 0
+    for _start, _end, _new_text in _edits:
+        if _start < last_end:
+            log(f'ABORTED - overlapping edits found:{edits}')
+            return text
+        parts.append(text[last_end:_start])
+        parts.append(_new_text)
+        last_end = _end
+    parts.append(text[last_end:])
+    return ''.join(parts)
+
+
+def diff_lines(old_lines, new_lines):
+    '''
+        Calculates the hunks needed to transform old_lines into new_lines.
+        Lines which exist only once on both sides are used as anchors,
+        only the ranges in between are compared in detail.
+
+        Returns: list of (old_start, old_end, new_start, new_end) tuples in ascending order
+        Raises: Nothing
+    '''
+    hunks = []
+    _diff_range(old_lines, 0, len(old_lines), new_lines, 0, len(new_lines), hunks)
+    return hunks
+
+
+def _unique_anchors(old_lines, old_start, old_end, new_lines, new_start, new_end):
+    '''
+        Returns the (old, new) index pairs of lines which occur exactly once
+        on both sides, reduced to the longest sequence in ascending order (patience diff)
+    '''
+    old_count = dict()
+    for i in range(old_start, old_end):
+        line = old_lines[i]
+        old_count[line] = -1 if line in old_count else i
+    new_count = dict()
+    for j in range(new_start, new_end):
+        line = new_lines[j]
+        new_count[line] = -1 if line in new_count else j
+
+    pairs = [(i, new_count[old_lines[i]]) for i in range(old_start, old_end)
+             if old_count[old_lines[i]] == i and new_count.get(old_lines[i], -1) >= 0]
+
+    # longest increasing subsequence of the new indices
+    tails = []
+    tail_index = []
+    predecessor = [-1] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        pos = bisect.bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_index.append(k)
+        else:
+            tails[pos] = j
+            tail_index[pos] = k
+        predecessor[k] = tail_index[pos - 1] if pos > 0 else -1
+    anchors = []
+    k = tail_index[-1] if tail_index else -1
+    while k != -1:
+        anchors.append(pairs[k])
+        k = predecessor[k]
+    anchors.reverse()
+    return anchors
+
+
+def _diff_range(old_lines, old_start, old_end, new_lines, new_start, new_end, hunks):
+    ''' appends the hunks of the given ranges to hunks '''
+    while old_start < old_end and new_start < new_end and old_lines[old_start] == new_lines[new_start]:
+        old_start += 1
+        new_start += 1
+    while old_start < old_end and new_start < new_end and old_lines[old_end - 1] == new_lines[new_end - 1]:
+        old_end -= 1
+        new_end -= 1
+    if old_start == old_end and new_start == new_end:
+        return
+    # fast path - a single small change, the most common case
+    if old_start == old_end or new_start == new_end or \
+            (old_end - old_start <= SMALL_HUNK_LINES and new_end - new_start <= SMALL_HUNK_LINES):
+        hunks.append((old_start, old_end, new_start, new_end))
+        return
+
+    anchors = _unique_anchors(old_lines, old_start, old_end, new_lines, new_start, new_end)
+    if not anchors:
+        # no unique lines to synchronize on, e.g. a block of repeated lines
+        matcher = difflib.SequenceMatcher(None, old_lines[old_start:old_end], new_lines[new_start:new_end])
+        hunks.extend((old_start + i1, old_start + i2, new_start + j1, new_start + j2)
+                     for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal')
+        return
+
+    for i, j in anchors:
+        _diff_range(old_lines, old_start, i, new_lines, new_start, j, hunks)
+        old_start = i + 1
+        new_start = j + 1
+    _diff_range(old_lines, old_start, old_end, new_lines, new_start, new_end, hunks)
+
+
+def apply_minimal_edits(_editor, edits, encoding=UTF16, text=None):
+    '''
+        Applies lsp TextEdits to _editor by replacing only the changed lines.
+        The hunks are applied in descending order within one undo action,
+        which keeps folding, markers and bookmarks of untouched lines intact.
+
+        Args:
+            _editor: the editor object (editor, editor1 or editor2)
+            edits: list of TextEdit dicts as sent by the server
+            encoding: the negotiated position encoding of the server
+            text: the current content of _editor if already known
+
+        Returns: number of replaced hunks
+        Raises: Nothing
+    '''
+    old_text = _editor.getText() if text is None else text
+    new_text = apply_text_edits(old_text, edits, encoding)
+    if new_text == old_text:
+        return 0
+
+    old_lines = split_lines(old_text)
+    new_lines = split_lines(new_text)
+    hunks = diff_lines(old_lines, new_lines)
+    log(f'{len(edits)} edit(s) reduced to {len(hunks)} hunk(s)')
+
+    _editor.beginUndoAction()
+    for old_start, old_end, new_start, new_end in reversed(hunks):
+        start = _editor.positionFromLine(old_start)
+        end = _editor.positionFromLine(old_end) if old_end < len(old_lines) else _editor.getTextLength()
+        if start == -1 or end == -1:
+            log(f'ABORTED - negative position found:{(old_start, old_end)}')
+            break
+        _editor.setTargetRange(start, end)
+        _editor.replaceTarget(''.join(new_lines[new_start:new_end]))
+    _editor.endUndoAction()
+    return len(hunks)
@@ -0,0 +1,162 @@
+'''
+    Runs lsp response handlers on the notepad++ gui thread, in batches
+
+    Responses are read by the PROCESS_MONITOR threads, calling editor or notepad
+    functions from there crosses into the gui thread call by call and races with
+    user input. Instead, handlers are queued and the queue is drained on the gui
+    thread, at most once per UPDATEUI notification or timer tick.
+
+    Handlers posted with the same key replace each other, only the last of
+    several hovers gets shown. Handlers posted for a document version which
+    is outdated when the queue gets drained are dropped.
+
+    The timer is started by the constructor. A timer without window belongs
+    to the thread creating it, the client is created on the thread of the
+    PythonScript script, so the timer gets created within a message sent to
+    the editor window, by a hook on its thread for the duration of the call.
+'''
+import time
+import ctypes
+import threading
+from Npp import editor
+import logging
+log = logging.info
+
+# the timer drains the queue when no UPDATEUI notification arrives, e.g. while the user doesn't type
+TIMER_INTERVAL_MS = 20
+WH_CALLWNDPROC = 4
+WM_NULL = 0
+SMTO_ABORTIFHUNG = 2
+# milliseconds the gui thread gets to create the timer
+START_TIMEOUT_MS = 1000
+
+
+class UI_DISPATCHER:
+    def __init__(self, metrics=None):
+        self.metrics = metrics
+        self.pending = dict()  # key -> (function, document, version, on_drop), insertion ordered
+        self.lock = threading.Lock()
+        self.sequence = 0
+        self.timer_id = 0
+        self.timer_proc = None
+        self.stopped = False
+        self._start_timer()
+
+
+    def post(self, function, key=None, document=None, version=None, on_drop=None):
+        '''
+            Queues function to be called on the gui thread
+
+            Args:
+                function: callable without arguments
+                key: a pending entry with the same key gets replaced, None never replaces
+                document: DOCUMENT_STATE the result belongs to
+                version: the document version the result has been requested for
+                on_drop: called instead of function if the entry gets replaced or dropped
+
+            Returns: None
+            Raises: Nothing
+        '''
+        with self.lock:
+            if key is None:
+                self.sequence += 1
+                key = self.sequence
+            replaced = self.pending.pop(key, None)
+            self.pending[key] = (function, document, version, on_drop)
+        if replaced is not None and replaced[3] is not None:
+            replaced[3]()
+
+
+    def drain(self):
+        '''
+            Runs the queued handlers, must be called on the gui thread
+
+            Returns: number of handlers run
+            Raises: Nothing, handler exceptions get logged
+        '''
+        if not self.timer_id and not self.stopped:
+            # the timer could not be started by the constructor
+            self._create_timer()
+        if not self.pending:
+            return 0
+        with self.lock:
+            batch = self.pending
+            self.pending = dict()
+
+        start_time = time.perf_counter()
+        handled = 0
+        for function, document, version, on_drop in batch.values():
+            if document is not None and version != document.version:
+                log(f'outdated result for {document.path} version {version} dropped')
+                if on_drop is not None:
+                    on_drop()
+                continue
+            try:
+                function()
+                handled += 1
+            except Exception as e:  # pylint: disable=W0703
+                log(f'ui handler failed: {e}')
+        if self.metrics is not None:
+            self.metrics.record('ui', 'dispatch batch', (time.perf_counter() - start_time) * 1000000)
+        return handled
+
+
+    def _start_timer(self):
+        ''' creates the timer on the gui thread, the thread of the editor window '''
+        if not hasattr(ctypes, 'windll'):
+            # headless, e.g. a replayed session, the driver drains the queue itself
+            self.timer_id = -1
+            return
+        user32 = ctypes.WinDLL('user32', use_last_error=True)
+        user32.GetWindowThreadProcessId.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        user32.SetWindowsHookExW.restype = ctypes.c_void_p
+        user32.SetWindowsHookExW.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint32]
+        user32.CallNextHookEx.restype = ctypes.c_ssize_t
+        user32.CallNextHookEx.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_size_t, ctypes.c_ssize_t]
+        user32.SendMessageTimeoutW.argtypes = [ctypes.c_void_p, ctypes.c_uint, ctypes.c_size_t, ctypes.c_ssize_t,
+                                               ctypes.c_uint, ctypes.c_uint, ctypes.c_void_p]
+        user32.UnhookWindowsHookEx.argtypes = [ctypes.c_void_p]
+        hwnd = editor.hwnd
+        gui_thread = user32.GetWindowThreadProcessId(hwnd, None)
+        if gui_thread == ctypes.windll.kernel32.GetCurrentThreadId():
+            self._create_timer()
+            return
+
+        def _hook(code, wparam, lparam):
+            if not self.timer_id:
+                self._create_timer()
+            return user32.CallNextHookEx(None, code, wparam, lparam)
+        HOOKPROC = ctypes.WINFUNCTYPE(ctypes.c_ssize_t, ctypes.c_int, ctypes.c_size_t, ctypes.c_ssize_t)
+        hook_proc = HOOKPROC(_hook)
+        hook = user32.SetWindowsHookExW(WH_CALLWNDPROC, hook_proc, None, gui_thread)
+        if not hook:
+            log(f'no hook on the gui thread, the timer starts with the first UPDATEUI: '
+                f'{ctypes.WinError(ctypes.get_last_error())}')
+            return
+        try:
+            user32.SendMessageTimeoutW(hwnd, WM_NULL, 0, 0, SMTO_ABORTIFHUNG, START_TIMEOUT_MS, None)
+        finally:
+            user32.UnhookWindowsHookEx(hook)
+
+
+    def _create_timer(self):
+        ''' must be called on the gui thread '''
+        # a timer created on the gui thread without window is serviced by the gui message loop
+        TIMERPROC = ctypes.WINFUNCTYPE(None, ctypes.c_void_p, ctypes.c_uint, ctypes.c_size_t, ctypes.c_ulong)
+        self.timer_proc = TIMERPROC(self._on_timer)
+        self.timer_id = ctypes.windll.user32.SetTimer(None, 0, TIMER_INTERVAL_MS, self.timer_proc)
+
+
+    def _on_timer(self, hwnd, message, timer_id, tick_count):
+        if self.stopped:
+            ctypes.windll.user32.KillTimer(None, timer_id)
+            self.timer_id = 0
+            return
+        self.drain()
+
+
+    def stop(self):
+        ''' drops everything pending, the timer kills itself on its next tick '''
+        self.stopped = True
+        with self.lock:
+            self.pending = dict()
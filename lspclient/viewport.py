@@ -0,0 +1,55 @@
+'''
+    Helpers for features which only need to care about the visible part of a document
+'''
+import threading
+from Npp import editor
+
+
+def visible_line_range(margin=0):
+    '''
+        Returns the first and last document line which are currently visible,
+        extended by margin lines in both directions
+    '''
+    first_visible_line = editor.getFirstVisibleLine()
+    first_line = editor.docLineFromVisible(first_visible_line)
+    last_line = editor.docLineFromVisible(first_visible_line + editor.linesOnScreen())
+    return max(0, first_line - margin), min(editor.getLineCount() - 1, last_line + margin)
+
+
+class DEBOUNCER:
+    '''
+        Calls function delay seconds after the last trigger call.
+        Every trigger call within this period restarts the timer.
+        The timer runs on a thread of its own, with post, e.g. UI_DISPATCHER.post,
+        function gets queued from there to run on the gui thread instead.
+    '''
+    def __init__(self, delay, function, post=None):
+        self.delay = delay
+        self.function = function
+        self.post = post
+        self.timer = None
+        self.lock = threading.Lock()
+
+
+    def trigger(self, *args):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+            self.timer = threading.Timer(self.delay, self._fire, args)
+            self.timer.daemon = True
+            self.timer.start()
+
+
+    def _fire(self, *args):
+        if self.post is None:
+            self.function(*args)
+        else:
+            # keyed by the debouncer, a firing still queued gets replaced
+            self.post(lambda: self.function(*args), self)
+
+
+    def cancel(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
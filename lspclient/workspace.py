@@ -0,0 +1,166 @@
+'''
+    Workspace roots and the server instances serving them
+
+    The root of a file is the nearest directory, walking up from the file,
+    which contains one of the project markers, e.g. .git or pyproject.toml,
+    the directory of the file if none does. The lookups are cached per
+    directory, all directories visited on the way up get the root too.
+
+    A server which supports workspace folders with change notifications
+    runs once per config, further roots are added to it with
+    workspace/didChangeWorkspaceFolders. Other servers get an instance per
+    root, keyed "server@root" beyond the first one, of which at most
+    "max_server_instances" per config are kept running, the least recently
+    used one is shut down when another one is needed.
+'''
+import os
+import ntpath
+from collections import OrderedDict
+from .document_state import path_to_uri
+import logging
+log = logging.info
+
+ROOT_MARKERS = ['.git', '.hg', '.svn', 'pyproject.toml', 'setup.py', 'Cargo.toml', 'package.json', 'go.mod']
+MAX_INSTANCES = 4
+# cached for directories outside of any project, a real root is a directory
+NO_ROOT = ''
+
+
+def workspace_folder(root):
+    ''' returns the lsp WorkspaceFolder of root '''
+    return {'uri': path_to_uri(root), 'name': ntpath.basename(root) or root}
+
+
+class ROOT_FINDER:
+    def __init__(self, markers=None, exists=os.path.exists):
+        self.markers = ROOT_MARKERS if markers is None else markers
+        self.exists = exists
+        self.roots = dict()  # directory -> root, NO_ROOT if neither it nor a parent has a marker
+        self.lookups = 0  # directories checked for markers, the cache hits are not counted
+
+
+    def root_of(self, path):
+        '''
+            Args:
+                path: full path of a file, with backslashes as notepad++ provides it
+
+            Returns: the directory of the project path belongs to, the directory of path if there is none
+            Raises: Nothing
+        '''
+        directory = ntpath.dirname(path)
+        root = self._lookup(directory)
+        # a directory outside of any project is its own root
+        return directory if root == NO_ROOT else root
+
+
+    def is_project(self, root):
+        ''' False for the directory of a file outside of any project, see root_of '''
+        return self._lookup(root) != NO_ROOT
+
+
+    def _lookup(self, directory):
+        ''' returns the root of directory, NO_ROOT if neither it nor a parent has a marker '''
+        visited = []
+        current = directory
+        while True:
+            root = self.roots.get(current)
+            if root is not None:
+                break
+            visited.append(current)
+            self.lookups += 1
+            if any(self.exists(ntpath.join(current, marker)) for marker in self.markers):
+                root = current
+                break
+            parent = ntpath.dirname(current)
+            if parent == current:
+                root = NO_ROOT
+                break
+            current = parent
+        for _directory in visited:
+            self.roots[_directory] = root
+        return root
+
+
+    def clear(self):
+        ''' forgets the roots, e.g. after a marker has been created '''
+        self.roots.clear()
+
+
+class WORKSPACE_POOL:
+    def __init__(self, max_instances=MAX_INSTANCES):
+        self.max_instances = max_instances
+        self.assigned = OrderedDict()  # (server, root) -> instance, least recently used first
+        self.folders = dict()  # instance -> roots it serves
+        self.configs = dict()  # instance -> key of its server config
+
+
+    def assign(self, server, root, multi_root):
+        '''
+            Returns the instance of server which serves root
+
+            Args:
+                server: key of the server config
+                root: workspace root, see ROOT_FINDER
+                multi_root: True if the server supports workspace folder changes,
+                            None if it isn't known yet, it gets an instance of its own then
+
+            Returns: (instance, added) added is True if root is a new folder of a running instance
+            Raises: Nothing
+        '''
+        key = (server, root)
+        instance = self.assigned.get(key)
+        if instance is not None:
+            self.assigned.move_to_end(key)
+            return instance, False
+        if multi_root and server in self.folders:
+            instance, added = server, True
+        else:
+            instance, added = (server if server not in self.configs else f'{server}@{root}'), False
+            self.configs[instance] = server
+        self.assigned[key] = instance
+        self.folders.setdefault(instance, []).append(root)
+        return instance, added
+
+
+    def instance_of(self, server, root):
+        ''' returns the instance of server serving root, None if there is none '''
+        return self.assigned.get((server, root))
+
+
+    def config_of(self, instance):
+        return self.configs.get(instance, instance)
+
+
+    def evict(self, server, keep):
+        '''
+            Removes the least recently used instances of server beyond max_instances
+
+            Args:
+                server: key of the server config
+                keep: instance which must not be removed, the one just assigned
+
+            Returns: list of (instance, roots) the instances to shut down
+            Raises: Nothing
+        '''
+        used = OrderedDict()  # instance -> None, ordered by its most recent use
+        for (_server, _root), instance in self.assigned.items():
+            if _server == server:
+                used.pop(instance, None)
+                used[instance] = None
+        running = list(used)
+        evicted = []
+        for instance in running:
+            if len(running) - len(evicted) <= self.max_instances:
+                break
+            if instance != keep:
+                evicted.append((instance, self.remove(instance)))
+        return evicted
+
+
+    def remove(self, instance):
+        ''' forgets instance, returns the roots it served '''
+        for key in [key for key, _instance in self.assigned.items() if _instance == instance]:
+            del self.assigned[key]
+        self.configs.pop(instance, None)
+        log(f'{instance} no longer serves {self.folders.get(instance)}')
+        return self.folders.pop(instance, [])